@@ -1,25 +1,54 @@
 from __future__ import annotations
 
 from typing import List, Optional, Dict
+from datetime import datetime, timedelta
+import json
+import os
+import time
+import numpy as np
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from prometheus_client import Histogram
 from pydantic import BaseModel
 from sqlalchemy import select
 
+from ...core.singleflight import SingleFlight, request_key
 from ...db.session import SessionLocal
 from ...db.models.embedding import Embedding
 from ...db.models.document import Document
-from ...services.rag.embeddings import from_bytes, cosine
+from ...services.rag.embeddings import DEFAULT_EMBED_MODEL
+from ...services.rag.local_embed import check_model_name
+from ...services.rag.metadata import epoch_day
+from ...services.rag.retriever import BACKENDS, DEFAULT_MODE, MODES, get_index
+from ...services.rag.shards import SHARDS, ShardUnavailable, get_shard_client
 from ...services.insights.llm_client import LLMClient
 
 
 router = APIRouter(prefix="/chat")
 
+CHAT_RESULT_TTL_SEC = float(os.getenv("CHAT_RESULT_TTL_SEC", "5"))
+_chat_flight = SingleFlight("chat", CHAT_RESULT_TTL_SEC, keep=lambda res: bool(res.reply))  # LLM failures give ""
+
+STREAM_TTFB = Histogram("chat_stream_ttfb_seconds", "Request start to the sources event of /chat/stream")
+STREAM_TTFT = Histogram(
+    "chat_stream_ttft_seconds", "Request start to the first LLM token of /chat/stream", ["provider"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64),
+)
+
 
 class ChatRequest(BaseModel):
     message: str
     top_k: int = 4
-    days: int = 30
-    tickers: Optional[List[str]] = None
+    days: int = 0  # only documents published in the last N days (0 = no limit; undated ones are kept)
+    tickers: Optional[List[str]] = None  # only documents annotated with these tickers
+    model: str = DEFAULT_EMBED_MODEL
+    backend: Optional[str] = None  # 'flat' (exact) or 'ivf' (approximate)
+    nlist: Optional[int] = None  # ivf: number of coarse lists
+    nprobe: Optional[int] = None  # ivf: lists scored per query
+    rerank: Optional[int] = None  # quantized vectors: float32 re-rank of top_k * rerank (0 = off)
+    mode: str = DEFAULT_MODE  # 'dense', 'lexical' (BM25), 'hybrid' (RRF) or 'two_stage'
+    use_cache: bool = True  # False: skip the LLM response cache lookup (the answer is still stored)
 
 
 class ChatResponse(BaseModel):
@@ -27,55 +56,201 @@ class ChatResponse(BaseModel):
     sources: List[Dict]
 
 
-def _retrieve(db, qvec: List[float], top_k: int, days: int, tickers: Optional[List[str]]):
-    # MVP: read embeddings and score in memory; for large data, switch to pgvector
-    rows = db.execute(select(Embedding.id, Embedding.vector, Embedding.document_id, Embedding.content)).all()
-    q = from_bytes(bytes(bytearray()) + b"".join([]))  # placeholder to keep types
-    import numpy as np
-    q = np.asarray(qvec, dtype=np.float32)
-    scored = []
-    for (_id, vec_b, doc_id, content) in rows:
-        v = from_bytes(vec_b)
-        if v.size != q.size:
-            continue
-        s = cosine(q, v)
-        scored.append((s, doc_id, content))
-    scored.sort(reverse=True, key=lambda x: x[0])
-    top = scored[:top_k]
-    doc_ids = [d for _, d, _ in top]
+class RetrieveRequest(BaseModel):
+    questions: List[str]
+    top_k: int = 4
+    days: int = 0
+    tickers: Optional[List[str]] = None
+    model: str = DEFAULT_EMBED_MODEL
+    backend: Optional[str] = None
+    nlist: Optional[int] = None
+    nprobe: Optional[int] = None
+    rerank: Optional[int] = None
+
+
+class RetrieveResponse(BaseModel):
+    results: List[List[Dict]]  # sources per question, in request order
+
+
+def _since_day(days: int) -> Optional[int]:
+    return epoch_day(datetime.utcnow() - timedelta(days=days)) if days and days > 0 else None
+
+
+def _sources(db, hits_lists) -> List[List[Dict]]:
+    """Resolve [(score, embedding_id, document_id)] lists to sources with two queries in total."""
+    row_ids = {r for hits in hits_lists for _, r, _ in hits}
+    doc_ids = {d for hits in hits_lists for _, _, d in hits}
+    if not row_ids:
+        return [[] for _ in hits_lists]
+    contents = dict(db.execute(select(Embedding.id, Embedding.content).where(Embedding.id.in_(row_ids))).all())
     docs = {d.id: d for d in db.query(Document).filter(Document.id.in_(doc_ids)).all()}
     out = []
-    for s, did, content in top:
-        d = docs.get(did)
-        if not d:
-            continue
-        out.append({"score": float(s), "title": d.title, "url": d.url, "content": content})
+    for hits in hits_lists:
+        sources = []
+        for s, rid, did in hits:
+            d = docs.get(did)
+            # segment rows whose Embedding insert was rolled back have no content row
+            if not d or rid not in contents:
+                continue
+            sources.append({"score": float(s), "title": d.title, "url": d.url, "content": contents.get(rid)})
+        out.append(sources)
     return out
 
 
-@router.post("", response_model=ChatResponse)
-def chat(req: ChatRequest):
+def _dense_many(db, qvecs, top_k, days, tickers, model, backend, nlist, nprobe, rerank):
+    """Dense top-k per query, scattered over the shard workers when RAG_SHARDS > 0."""
+    qs = np.asarray(qvecs, dtype=np.float32)
+    if SHARDS > 0:
+        try:
+            return get_shard_client(model, backend=backend, nlist=nlist).search_many(
+                qs, top_k, since_day=_since_day(days), tickers=tickers, nprobe=nprobe, rerank=rerank,
+            )
+        except ShardUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    index = get_index(model, backend=backend, nlist=nlist)
+    index.refresh(db)
+    return index.search_many(qs, top_k, since_day=_since_day(days), tickers=tickers, nprobe=nprobe, rerank=rerank)
+
+
+def _retrieve(
+    db,
+    qvec: List[float],
+    top_k: int,
+    days: int,
+    tickers: Optional[List[str]],
+    model: str = DEFAULT_EMBED_MODEL,
+    backend: Optional[str] = None,
+    nlist: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    rerank: Optional[int] = None,
+    mode: str = "dense",
+    query: Optional[str] = None,
+):
+    if mode == "dense":
+        hits = _dense_many(db, [qvec], top_k, days, tickers, model, backend, nlist, nprobe, rerank)
+        return _sources(db, hits)[0]
+    index = get_index(model, backend=backend, nlist=nlist)
+    index.enable_lexical(db)
+    index.refresh(db)
+    top = index.search(
+        np.asarray(qvec, dtype=np.float32), top_k, since_day=_since_day(days), tickers=tickers,
+        mode=mode, query=query, nprobe=nprobe, rerank=rerank,
+    )
+    return _sources(db, [top])[0]
+
+
+def _chat_client(req: ChatRequest) -> LLMClient:
     client = LLMClient.from_env()
     if client is None:
         raise HTTPException(status_code=400, detail="LLM provider not configured")
+    if req.backend and req.backend.lower() not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown vector backend: {req.backend}")
+    if req.mode not in MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown retrieval mode: {req.mode}")
+    _check_model(req.model)
+    return client
 
+
+def _check_model(model: str) -> None:
+    try:
+        check_model_name(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _chat_context(req: ChatRequest) -> List[Dict]:
     # Embed question with the same embedding model used for index
     from ...services.rag.embeddings import embed_texts
-    import numpy as np
 
-    qvec = embed_texts([req.message])[0]
+    qvec = embed_texts([req.message], model_name=req.model)[0]
 
     db = SessionLocal()
     try:
-        ctx = _retrieve(db, qvec.tolist(), req.top_k, req.days, req.tickers)
+        return _retrieve(
+            db, qvec.tolist(), req.top_k, req.days, req.tickers,
+            model=req.model, backend=req.backend, nlist=req.nlist, nprobe=req.nprobe, rerank=req.rerank,
+            mode=req.mode, query=req.message,
+        )
     finally:
         db.close()
 
+
+def _chat_messages(message: str, ctx: List[Dict]) -> List[Dict]:
     bullets = []
     for c in ctx:
         bullets.append(f"- {c['title']}: {c['url']}")
     system = "You are a financial assistant. Answer concisely with bullet points and cite sources."
-    user = f"Question: {req.message}\nContext:\n" + "\n".join(bullets)
-    messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
-    ans = client.summarize(messages, max_tokens=400) or ""
-    return ChatResponse(reply=ans, sources=ctx)
+    user = f"Question: {message}\nContext:\n" + "\n".join(bullets)
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
+@router.post("", response_model=ChatResponse)
+async def chat(req: ChatRequest):
+    client = _chat_client(req)
+
+    async def answer() -> ChatResponse:
+        # embedding and retrieval block; the LLM call is awaited without holding a worker thread
+        ctx = await run_in_threadpool(_chat_context, req)
+        ans = await client.asummarize(_chat_messages(req.message, ctx), max_tokens=400, use_cache=req.use_cache) or ""
+        return ChatResponse(reply=ans, sources=ctx)
+
+    # identical questions asked at the same time share one retrieval + LLM call
+    return await _chat_flight.do(request_key(req), answer, fresh=not req.use_cache)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(req: ChatRequest):
+    """`/chat` as Server-Sent Events: `sources` first, then `token` events, then `done`.
+
+    Failures after the stream has started are sent as an `error` event.
+    """
+    client = _chat_client(req)
+    started = time.perf_counter()
+
+    async def events():
+        try:
+            ctx = await run_in_threadpool(_chat_context, req)
+            yield _sse("sources", ctx)
+            STREAM_TTFB.observe(time.perf_counter() - started)
+            first = True
+            async for text in client.astream(_chat_messages(req.message, ctx), max_tokens=400, use_cache=req.use_cache):
+                if first:
+                    STREAM_TTFT.labels(client.provider).observe(time.perf_counter() - started)
+                    first = False
+                yield _sse("token", text)
+            yield _sse("done", {})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/retrieve", response_model=RetrieveResponse)
+def retrieve(req: RetrieveRequest):
+    """Top-k sources for many questions at once, without the LLM step.
+
+    Questions are embedded in one call and scored against the index with a
+    single matrix-matrix product, so the scan is shared by the whole batch.
+    """
+    if req.backend and req.backend.lower() not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown vector backend: {req.backend}")
+    _check_model(req.model)
+    if not req.questions:
+        return RetrieveResponse(results=[])
+    from ...services.rag.embeddings import embed_texts
+
+    qvecs = embed_texts(req.questions, model_name=req.model)
+    db = SessionLocal()
+    try:
+        hits = _dense_many(
+            db, qvecs, req.top_k, req.days, req.tickers, req.model, req.backend, req.nlist, req.nprobe, req.rerank,
+        )
+        return RetrieveResponse(results=_sources(db, hits))
+    finally:
+        db.close()
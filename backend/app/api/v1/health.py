@@ -1,7 +1,20 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from ...services.nlp.registry import get_model_registry
 
 router = APIRouter()
 
 @router.get("/health")
 def health():
-    return {"status": "healthy"}
+    registry = get_model_registry()
+    return {"status": "healthy", "ready": registry.ready, "models": registry.status()}
+
+
+@router.get("/health/ready")
+def ready():
+    """200 once every configured NLP model is loaded, 503 while loading or after a failed load."""
+    registry = get_model_registry()
+    return JSONResponse(
+        {"ready": registry.ready, "models": registry.status()}, status_code=200 if registry.ready else 503,
+    )
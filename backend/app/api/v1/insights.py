@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from datetime import date, datetime, timedelta
+import asyncio
+import os
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy import select, and_
 
@@ -19,6 +22,8 @@ except Exception:  # pragma: no cover
 
 router = APIRouter(prefix="/insights")
 
+SUMMARY_CONCURRENCY = int(os.getenv("INSIGHTS_SUMMARY_CONCURRENCY", "8"))  # parallel LLM calls per summarize job
+
 
 class SummarizeRequest(BaseModel):
     start: Optional[date] = None
@@ -27,6 +32,7 @@ class SummarizeRequest(BaseModel):
     tickers: Optional[List[str]] = None  # when scope=company
     max_tokens: int = 512
     async_run: bool = False
+    use_cache: bool = True  # False: skip the LLM response cache lookup (the summary is still stored)
 
 
 def _build_messages(scope: str, scope_key: Optional[str], items: List[Dict]) -> List[dict]:
@@ -63,61 +69,103 @@ def _gather_items(db, start: date, end: date, tickers: Optional[List[str]] = Non
     return items
 
 
-def _persist_summary(db, day: date, scope: str, scope_key: Optional[str], text: str, sources: List[str], model: Optional[str]):
-    row = DailySummary(date=day, scope=scope, scope_key=scope_key, summary=text, sources=sources, model=model)
-    db.add(row)
+def _partition_by_ticker(items: List[Dict], tickers: List[str]) -> Dict[str, List[Dict]]:
+    """Items of each wanted ticker, in their original order (a document may land in several)."""
+    wanted = set(tickers)
+    out: Dict[str, List[Dict]] = {t: [] for t in tickers}
+    for it in items:
+        for t in set(it["entities"].get("tickers", [])) & wanted:
+            out[t].append(it)
+    return out
+
+
+def _persist_summaries(db, rows: List[DailySummary]) -> List[int]:
+    db.add_all(rows)
     db.commit()
-    return row.id
+    return [r.id for r in rows]
+
+
+async def _run_summaries(
+    db,
+    client: LLMClient,
+    start: date,
+    end: date,
+    scope: str,
+    tickers: Optional[List[str]],
+    max_tokens: int,
+    use_cache: bool = True,
+    concurrency: int = SUMMARY_CONCURRENCY,
+) -> int:
+    """Summarize each scope of the period and persist the summaries in one commit.
+
+    The period's documents are read once and split per ticker in memory;
+    the per-scope LLM calls then run concurrently, at most `concurrency`
+    at a time. Returns the number of documents used.
+    """
+    items = await run_in_threadpool(_gather_items, db, start, end, None)
+    if scope == "global":
+        scopes: List[Tuple[str, Optional[str], List[Dict]]] = [("global", None, items)]
+    elif scope == "company":
+        scopes = [("company", t, its) for t, its in _partition_by_ticker(items, tickers or []).items()]
+    else:
+        scopes = []
+    scopes = [(sc, key, its[:100]) for sc, key, its in scopes if its]
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(sc: str, key: Optional[str], its: List[Dict]) -> str:
+        async with slots:
+            return await client.asummarize(_build_messages(sc, key, its), max_tokens=max_tokens, use_cache=use_cache) or ""
+
+    texts = await asyncio.gather(*[one(*s) for s in scopes])
+    rows = [
+        DailySummary(
+            date=start, scope=sc, scope_key=key, summary=text,
+            sources=[it["url"] for it in its[:20] if it.get("url")], model=client.model,
+        )
+        for (sc, key, its), text in zip(scopes, texts)
+    ]
+    if rows:
+        await run_in_threadpool(_persist_summaries, db, rows)
+    return sum(len(its) for _, _, its in scopes)
+
+
+def _log_run(start: date, model: str, scope: str, total_docs: int, dur: float) -> None:
+    if mlflow:
+        try:
+            mlflow.set_experiment("insights")
+            with mlflow.start_run(run_name=f"summarize_{start}"):
+                mlflow.log_param("model", model)
+                mlflow.log_param("scope", scope)
+                mlflow.log_metric("docs_used", total_docs)
+                mlflow.log_metric("duration_sec", dur)
+        except Exception:
+            pass
 
 
 @router.post("/summarize")
-def summarize(payload: SummarizeRequest, background_tasks: BackgroundTasks = None):
+async def summarize(payload: SummarizeRequest, background_tasks: BackgroundTasks = None):
     start = payload.start or date.today()
     end = payload.end or start
     client = LLMClient.from_env()
     if client is None:
         raise HTTPException(status_code=400, detail="LLM provider not configured")
 
-    def _job():
+    async def _job():
         db = SessionLocal()
         try:
             t0 = time.time()
-            total_docs = 0
-            scopes: List[Dict] = []
-            if payload.scope == "global":
-                scopes.append({"scope": "global", "key": None, "tickers": None})
-            elif payload.scope == "company":
-                tickers = payload.tickers or []
-                for t in tickers:
-                    scopes.append({"scope": "company", "key": t, "tickers": [t]})
-
-            for s in scopes:
-                items = _gather_items(db, start, end, tickers=s["tickers"])[:100]
-                if not items:
-                    continue
-                total_docs += len(items)
-                messages = _build_messages(s["scope"], s["key"], items)
-                text = client.summarize(messages, max_tokens=payload.max_tokens) or ""
-                sources = [it["url"] for it in items[:20] if it.get("url")]
-                _persist_summary(db, start, s["scope"], s["key"], text, sources, client.model)
+            total_docs = await _run_summaries(
+                db, client, start, end, payload.scope, payload.tickers, payload.max_tokens, use_cache=payload.use_cache,
+            )
             dur = time.time() - t0
-            if mlflow:
-                try:
-                    mlflow.set_experiment("insights")
-                    with mlflow.start_run(run_name=f"summarize_{start}"):
-                        mlflow.log_param("model", client.model)
-                        mlflow.log_param("scope", payload.scope)
-                        mlflow.log_metric("docs_used", total_docs)
-                        mlflow.log_metric("duration_sec", dur)
-                except Exception:
-                    pass
+            await run_in_threadpool(_log_run, start, client.model, payload.scope, total_docs, dur)
         finally:
             db.close()
 
     if payload.async_run and background_tasks is not None:
         background_tasks.add_task(_job)
         return {"status": "scheduled", "start": str(start), "end": str(end)}
-    _job()
+    await _job()
     return {"status": "done", "start": str(start), "end": str(end)}
 
 
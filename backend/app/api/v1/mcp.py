@@ -2,10 +2,13 @@ from __future__ import annotations
 
 from typing import Optional, List
 from datetime import datetime, timedelta
+import os
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy import select, and_
 
+from ...core.singleflight import SingleFlight, request_key
 from ...db.session import SessionLocal
 from ...db.models.market_series import MarketSeries
 from ...services.mcp.forecast import ema, ema_forecast, simple_recommendation
@@ -13,6 +16,9 @@ from ...services.mcp.forecast import ema, ema_forecast, simple_recommendation
 
 router = APIRouter(prefix="/mcp")
 
+FORECAST_RESULT_TTL_SEC = float(os.getenv("FORECAST_RESULT_TTL_SEC", "30"))
+_forecast_flight = SingleFlight("forecast", FORECAST_RESULT_TTL_SEC)
+
 
 class ForecastRequest(BaseModel):
     ticker: str
@@ -21,8 +27,7 @@ class ForecastRequest(BaseModel):
     since_days: int = 120
 
 
-@router.post("/forecast")
-def forecast(req: ForecastRequest):
+def _forecast(req: ForecastRequest):
     db = SessionLocal()
     try:
         cutoff = datetime.utcnow() - timedelta(days=req.since_days)
@@ -41,6 +46,12 @@ def forecast(req: ForecastRequest):
         db.close()
 
 
+@router.post("/forecast")
+async def forecast(req: ForecastRequest):
+    # concurrent identical requests share one query + forecast; results are kept FORECAST_RESULT_TTL_SEC
+    return await _forecast_flight.do(request_key(req), lambda: run_in_threadpool(_forecast, req))
+
+
 @router.get("/recommendation")
 def recommendation(ticker: str, window: int = 14, since_days: int = 120):
     db = SessionLocal()
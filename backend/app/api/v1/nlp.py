@@ -5,10 +5,10 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 from sqlalchemy import select
 
-from ...services.nlp.pipeline import run_nlp_pipeline
+from ...services.nlp.batching import NLP_BATCH_SIZE
+from ...services.nlp.pipeline import pending_ids, run_nlp_pipeline
 from ...db.session import SessionLocal
 from ...db.models.nlp_annotation import NLPAnnotation
-from ...db.models.document import Document
 
 router = APIRouter(prefix="/nlp")
 
@@ -17,15 +17,25 @@ class RunNLPRequest(BaseModel):
     limit: int = 100
     document_ids: Optional[List[int]] = None
     async_run: bool = False
+    batch_size: int = NLP_BATCH_SIZE  # texts per HF model call (FIN_NER_MODEL / FIN_SENTIMENT_MODEL)
+    workers: Optional[int] = None  # annotation processes (default NLP_WORKERS; 0/1 = in-process)
+    cursor: int = 0  # only documents with id > cursor (resume with the previous next_cursor)
+    use_cache: bool = True  # False: annotate every text again, ignoring the annotation cache
 
 
 @router.post("/run")
 def run_nlp(payload: RunNLPRequest | None = None, background_tasks: BackgroundTasks = None):
     payload = payload or RunNLPRequest()
     if payload.async_run and background_tasks is not None:
-        background_tasks.add_task(run_nlp_pipeline, limit=payload.limit, document_ids=payload.document_ids)
+        background_tasks.add_task(
+            run_nlp_pipeline, limit=payload.limit, document_ids=payload.document_ids, batch_size=payload.batch_size,
+            workers=payload.workers, cursor=payload.cursor, use_cache=payload.use_cache,
+        )
         return {"status": "scheduled", "limit": payload.limit, "document_ids": payload.document_ids or []}
-    res = run_nlp_pipeline(limit=payload.limit, document_ids=payload.document_ids)
+    res = run_nlp_pipeline(
+        limit=payload.limit, document_ids=payload.document_ids, batch_size=payload.batch_size, workers=payload.workers,
+        cursor=payload.cursor, use_cache=payload.use_cache,
+    )
     return res
 
 
@@ -49,11 +59,12 @@ def get_annotation(doc_id: int):
 
 
 @router.get("/pending")
-def list_pending(limit: int = 100):
+def list_pending(limit: int = 100, cursor: int = 0):
+    """Unannotated document ids after `cursor`, in id order; pass `next_cursor` back for the next page."""
     db = SessionLocal()
     try:
-        annotated_ids = {aid for (aid,) in db.query(NLPAnnotation.document_id).all()}
-        ids = [d.id for d in db.query(Document.id).all() if d.id not in annotated_ids][: limit]
-        return {"count": len(ids), "document_ids": ids}
+        ids = pending_ids(db, limit, after_id=cursor)
+        next_cursor = ids[-1] if ids and len(ids) >= limit else None
+        return {"count": len(ids), "document_ids": ids, "next_cursor": next_cursor}
     finally:
         db.close()
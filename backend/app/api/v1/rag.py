@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 from typing import Optional, List
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from sqlalchemy import select
 
 from ...db.session import SessionLocal
 from ...db.models.document import Document
-from ...db.models.embedding import Embedding
-from ...services.rag.chunk import simple_chunks
-from ...services.rag.embeddings import embed_texts, to_bytes
+from ...services.rag.compactor import compact_model
+from ...services.rag.embeddings import DEFAULT_EMBED_MODEL
+from ...services.rag.indexer import not_indexed, index_documents, run_incremental
+from ...services.rag.local_embed import check_model_name
+from ...services.rag.segments import get_segment_store
+from ...services.rag.retriever import BACKENDS, get_index, loaded_indexes
+from ...services.rag.vectorstore.quant import DTYPES
 
 
 router = APIRouter(prefix="/rag")
@@ -17,33 +21,72 @@ router = APIRouter(prefix="/rag")
 
 class IndexRequest(BaseModel):
     limit: int = 200
-    model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    model: str = DEFAULT_EMBED_MODEL
     document_ids: Optional[List[int]] = None
+    backend: Optional[str] = None  # also load/train this vector backend after indexing
+    nlist: Optional[int] = None
+    use_watermark: bool = True  # skip documents at or below the last run's cursor
+    reembed_changed: bool = False  # replace embeddings of documents whose text changed
+    dtype: Optional[str] = None  # vector storage for a new model: float32, float16 or int8
+    keep_float32: Optional[bool] = None  # quantized new model: also store float32 originals for re-ranking
 
 
 @router.post("/index")
 def index_docs(payload: IndexRequest):
+    if payload.backend and payload.backend.lower() not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown vector backend: {payload.backend}")
+    if payload.dtype and payload.dtype not in DTYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown vector dtype: {payload.dtype}")
+    try:
+        check_model_name(payload.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    segments = get_segment_store(payload.model)
+    stored = segments.stored_dtype()
+    if payload.dtype and stored and stored != payload.dtype:
+        raise HTTPException(status_code=400, detail=f"Model {payload.model} is already stored as {stored}")
+    if payload.dtype:
+        segments.dtype = payload.dtype
+    if payload.keep_float32 is not None:
+        segments.keep_float32 = payload.keep_float32
     db = SessionLocal()
-    created = 0
-    processed = 0
     try:
         if payload.document_ids:
-            docs = db.execute(select(Document).where(Document.id.in_(payload.document_ids))).scalars().all()
+            # explicit ids: skip the ones already indexed for this model
+            docs = db.execute(
+                select(Document).where(Document.id.in_(payload.document_ids), not_indexed(payload.model))
+            ).scalars().all()
+            res = {"processed": len(docs), "created": index_documents(db, docs, payload.model, segments)}
         else:
-            docs = db.execute(select(Document).order_by(Document.id.desc())).scalars().all()[: payload.limit]
-
-        for d in docs:
-            processed += 1
-            text = (d.content or d.summary or d.title or "").strip()
-            chunks = simple_chunks(text)
-            if not chunks:
-                continue
-            vecs = embed_texts(chunks, model_name=payload.model)
-            for chunk_text, vec in zip(chunks, vecs):
-                row = Embedding(document_id=d.id, model=payload.model, vector=to_bytes(vec), content=chunk_text)
-                db.add(row)
-                created += 1
-            db.commit()
+            res = run_incremental(
+                db,
+                payload.model,
+                segments,
+                limit=payload.limit,
+                use_watermark=payload.use_watermark,
+                reembed_changed=payload.reembed_changed,
+            )
+        # Only pull the new rows into indexes that are already resident;
+        # an unloaded one picks everything up on its first query.
+        for index in loaded_indexes(payload.model):
+            index.refresh(db)
+        if payload.backend:
+            get_index(payload.model, backend=payload.backend, nlist=payload.nlist).refresh(db)
+    finally:
+        db.close()
+    return {**res, "model": payload.model}
+
+
+class CompactRequest(BaseModel):
+    model: str = DEFAULT_EMBED_MODEL
+
+
+@router.post("/compact")
+def compact(payload: CompactRequest):
+    """Merge small segments into day partitions and drop rows of deleted documents now."""
+    db = SessionLocal()
+    try:
+        stats = compact_model(db, payload.model)
     finally:
         db.close()
-    return {"processed": processed, "created": created, "model": payload.model}
+    return {**stats, "model": payload.model}
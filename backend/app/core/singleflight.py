@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import time
+from prometheus_client import Counter
+from pydantic import BaseModel
+
+
+FLIGHT_CALLS = Counter(
+    "singleflight_calls_total", "Coalesced endpoint calls by outcome (leader, shared, cached)", ["name", "outcome"]
+)
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def request_key(body: BaseModel) -> str:
+    """Hash of a request body with whitespace-normalized strings and sorted keys."""
+    blob = json.dumps(_normalize(body.model_dump(mode="json")), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Shares one in-flight computation among concurrent identical calls.
+
+    The first caller for a key starts `fn()` as a task; callers arriving
+    while it runs await the same task (shielded, so one client going away
+    does not cancel it for the others). Successful results are then served
+    for `ttl` seconds, keeping at most `max_entries`; errors, and results
+    `keep(result)` rejects (e.g. a degraded answer), are not kept. State is
+    per event loop, i.e. per worker process.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 1024, keep: Optional[Callable[[Any], bool]] = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.keep = keep
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], fresh: bool = False) -> Any:
+        """Result of `fn()` for `key`; `fresh` skips the result cache but still joins an in-flight call."""
+        if not fresh:
+            hit = self._results.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                FLIGHT_CALLS.labels(self.name, "cached").inc()
+                return hit[1]
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is not asyncio.get_running_loop():
+            task = None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            FLIGHT_CALLS.labels(self.name, "leader").inc()
+        else:
+            FLIGHT_CALLS.labels(self.name, "shared").inc()
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None or self.ttl <= 0:
+            return
+        if self.keep is not None and not self.keep(task.result()):
+            return
+        self._results[key] = (time.monotonic() + self.ttl, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteLRU:
+    """Persistent key -> bytes map with an LRU size bound and an optional TTL.
+
+    Backed by a local SQLite file in WAL mode so every worker on the host
+    shares it. `used` is bumped on each hit; once a put takes the table past
+    `max_entries`, the least recently used rows are deleted. The row count
+    lives in a one-row table updated in the same transaction as the rows, so
+    the bound costs O(batch) per put instead of a table scan, and stays exact
+    across processes. With `ttl` > 0, entries older than `ttl` seconds are
+    misses and are deleted when read. `on_evict(n)` is told about every
+    eviction or expiry.
+    """
+
+    def __init__(self, path: str, table: str, max_entries: int, ttl: float = 0, on_evict=None):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last = 0.0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            t = self.table
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {t} ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL, used REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{t}_used ON {t} (used)")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {t}_count (id INTEGER PRIMARY KEY CHECK (id = 0), n INTEGER NOT NULL)")
+            conn.execute(f"INSERT OR IGNORE INTO {t}_count (id, n) SELECT 0, COUNT(*) FROM {t}")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _now(self) -> float:
+        # strictly increasing within the process, so LRU order survives a coarse clock
+        self._last = max(time.time(), self._last + 1e-6)
+        return self._last
+
+    def _removed(self, db: sqlite3.Connection, n: int) -> None:
+        if n > 0:
+            db.execute(f"UPDATE {self.table}_count SET n = n - ? WHERE id = 0", (n,))
+            if self.on_evict is not None:
+                self.on_evict(n)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        out: Dict[str, bytes] = {}
+        uniq = list(dict.fromkeys(keys))
+        t = self.table
+        with self._lock:
+            db = self._db()
+            now = self._now()
+            expired: List[str] = []
+            for i in range(0, len(uniq), 500):
+                part = uniq[i : i + 500]
+                marks = ",".join("?" * len(part))
+                for k, value, created in db.execute(f"SELECT key, value, created FROM {t} WHERE key IN ({marks})", part):
+                    if self.ttl > 0 and now - created > self.ttl:
+                        expired.append(k)
+                    else:
+                        out[k] = value
+            if expired:
+                cur = db.executemany(f"DELETE FROM {t} WHERE key = ?", [(k,) for k in expired])
+                self._removed(db, cur.rowcount)
+            if out:
+                db.executemany(f"UPDATE {t} SET used = ? WHERE key = ?", [(now, k) for k in out])
+            if out or expired:
+                db.commit()
+        return out
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        if not items:
+            return
+        t = self.table
+        keys = list(items)
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")  # the key lookup and the count update see the same rows
+            try:
+                now = self._now()
+                known = 0
+                for i in range(0, len(keys), 500):
+                    part = keys[i : i + 500]
+                    marks = ",".join("?" * len(part))
+                    (c,) = db.execute(f"SELECT COUNT(*) FROM {t} WHERE key IN ({marks})", part).fetchone()
+                    known += c
+                db.executemany(
+                    f"INSERT INTO {t} (key, value, created, used) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET value = excluded.value, created = excluded.created, used = excluded.used",
+                    [(k, v, now, now) for k, v in items.items()],
+                )
+                db.execute(f"UPDATE {t}_count SET n = n + ? WHERE id = 0", (len(keys) - known,))
+                (count,) = db.execute(f"SELECT n FROM {t}_count WHERE id = 0").fetchone()
+                excess = count - self.max_entries
+                if excess > 0:
+                    # walks ix_<table>_used: O(excess), not O(table)
+                    cur = db.execute(
+                        f"DELETE FROM {t} WHERE rowid IN (SELECT rowid FROM {t} ORDER BY used ASC LIMIT ?)", (excess,)
+                    )
+                    self._removed(db, cur.rowcount)
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+
+    def put(self, key: str, value: bytes) -> None:
+        self.put_many({key: value})
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._db().execute(f"SELECT n FROM {self.table}_count WHERE id = 0").fetchone()
+        return count
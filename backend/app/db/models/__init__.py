@@ -1,4 +1,42 @@
+import logging
+
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import DeclarativeBase
 
+log = logging.getLogger(__name__)
+
 class Base(DeclarativeBase):
     pass
+
+
+def ensure_columns(bind) -> None:
+    """Add declared nullable columns missing from tables that predate them (create_all never alters a table).
+
+    Idempotent; run at startup before `ensure_indexes`.
+    """
+    insp = inspect(bind)
+    existing_tables = set(insp.get_table_names())
+    prep = bind.dialect.identifier_preparer
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in have:
+                    continue
+                if not column.nullable or column.primary_key:
+                    log.warning("column %s.%s is missing and NOT NULL; add it with a migration", table.name, column.name)
+                    continue
+                conn.execute(text(
+                    f"ALTER TABLE {prep.format_table(table)} ADD COLUMN {prep.quote(column.name)} "
+                    f"{column.type.compile(dialect=bind.dialect)}"
+                ))
+                log.info("added column %s.%s", table.name, column.name)
+
+
+def ensure_indexes(bind) -> None:
+    """Create declared indexes missing from tables that predate them (create_all skips existing tables)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint, event
 from . import Base
 
 class Document(Base):
@@ -14,3 +14,17 @@ class Document(Base):
     summary = Column(Text)
     content = Column(Text)
     published_at = Column(DateTime)
+    content_hash = Column(String(64), nullable=True)  # hash of document_text, kept current on every ORM write
+
+
+def document_text(doc) -> str:
+    """Text that gets chunked and embedded: content, else summary, else title."""
+    return (doc.content or doc.summary or doc.title or "").strip()
+
+
+@event.listens_for(Document, "before_insert")
+@event.listens_for(Document, "before_update")
+def _hash_text(mapper, connection, target) -> None:
+    from ...services.rag.embed_cache import text_hash
+
+    target.content_hash = text_hash(document_text(target))
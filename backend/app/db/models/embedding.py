@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, ForeignKey, String, Text, LargeBinary
+from sqlalchemy import Column, Integer, ForeignKey, String, Text, LargeBinary, Index
 from . import Base
 
 class Embedding(Base):
     __tablename__ = 'embeddings'
+    __table_args__ = (
+        Index('ix_embeddings_document_model', 'document_id', 'model'),
+    )
     id = Column(Integer, primary_key=True)
     document_id = Column(Integer, ForeignKey('documents.id'))
     model = Column(String(100))
-    vector = Column(LargeBinary)
+    vector = Column(LargeBinary, nullable=True)  # legacy rows; new vectors live in segment files
+    segment = Column(String(64), nullable=True)
+    offset = Column(Integer, nullable=True)
     content = Column(Text)
+    content_hash = Column(String(64), nullable=True)  # hash of the document text the chunk came from
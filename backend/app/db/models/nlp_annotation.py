@@ -1,8 +1,11 @@
-from sqlalchemy import Column, Integer, ForeignKey, JSON
+from sqlalchemy import Column, Integer, ForeignKey, JSON, Index
 from . import Base
 
 class NLPAnnotation(Base):
     __tablename__ = 'nlp_annotations'
+    __table_args__ = (
+        Index('ix_nlp_annotations_document_id', 'document_id'),  # pending selection (NOT EXISTS)
+    )
     id = Column(Integer, primary_key=True)
     document_id = Column(Integer, ForeignKey('documents.id'))
     entities = Column(JSON)
@@ -0,0 +1,10 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+from . import Base
+
+
+class RagIndexState(Base):
+    __tablename__ = 'rag_index_state'
+    model = Column(String(100), primary_key=True)
+    last_document_id = Column(Integer, default=0)  # every document at or below was visited
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -8,8 +8,11 @@ from .api.v1.nlp import router as nlp_router
 from .api.v1.insights import router as insights_router
 from .api.v1.rag import router as rag_router
 from .api.v1.mcp import router as mcp_router
-from .db.models import Base
-from .db.session import engine
+from .db.models import Base, ensure_columns, ensure_indexes
+from .db.session import SessionLocal, engine
+from .services.rag.compactor import COMPACT_INTERVAL_SEC, Compactor
+from .services.insights.llm_client import aclose_llm_clients, close_llm_clients
+from .services.nlp.registry import MODEL_WARMUP, get_model_registry
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from fastapi import Response
 
@@ -41,6 +44,29 @@ def root():
 def on_startup():
     # Ensure DB tables exist (dev convenience)
     Base.metadata.create_all(bind=engine)
+    ensure_columns(engine)
+    ensure_indexes(engine)
+    if COMPACT_INTERVAL_SEC > 0:
+        app.state.compactor = Compactor(SessionLocal).start()
+    if MODEL_WARMUP:
+        # NLP models load off the startup path; /api/v1/health reports when they are ready
+        get_model_registry().warm_up()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    compactor = getattr(app.state, "compactor", None)
+    if compactor is not None:
+        compactor.stop()
+    close_llm_clients()
+    from .services.nlp.parallel import shutdown_annotation_pool
+
+    shutdown_annotation_pool()
+
+
+@app.on_event("shutdown")
+async def close_llm_pools():
+    await aclose_llm_clients()
 
 
 @app.get("/metrics")
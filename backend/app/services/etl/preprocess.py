@@ -4,6 +4,8 @@ from typing import List, Dict, Set
 import unicodedata
 import re
 
+from ..nlp.keywords import compile_keywords
+
 
 def normalize_utf8(text: str) -> str:
     if text is None:
@@ -43,8 +45,12 @@ def normalize_utf8(text: str) -> str:
 
 
 def simple_topic_filter(item: Dict, keywords: List[str]) -> bool:
-    blob = f"{item.get('title','')}\n{item.get('summary','')}\n{item.get('content','')}".lower()
-    return any(kw.lower() in blob for kw in keywords) if keywords else True
+    # case-insensitive, words starting with the keyword ("fed" -> "Federal", "merger" -> "mergers");
+    # the keyword matcher is compiled once per keyword list
+    if not keywords:
+        return True
+    blob = f"{item.get('title','')}\n{item.get('summary','')}\n{item.get('content','')}"
+    return compile_keywords(tuple(keywords), match="prefix").search(blob)
 
 
 def tokenize(text: str) -> List[str]:
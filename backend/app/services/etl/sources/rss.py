@@ -1,17 +1,19 @@
 from typing import List, Dict
-import feedparser
-from bs4 import BeautifulSoup
 from dateutil import parser as dateparser
 
 
 def _clean_html(html: str) -> str:
     if not html:
         return ""
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "lxml")
     return soup.get_text(separator=" ", strip=True)
 
 
 def fetch_rss(urls: List[str]) -> List[Dict]:
+    import feedparser
+
     items: List[Dict] = []
     for url in urls:
         feed = feedparser.parse(url)
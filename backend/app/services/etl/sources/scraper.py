@@ -2,7 +2,6 @@ from __future__ import annotations
 
 from typing import Dict
 import httpx
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 
 
@@ -22,6 +21,8 @@ def scrape_url(url: str) -> Dict:
     except Exception:
         return {"source": source, "title": title, "url": url, "summary": "", "content": "", "published_at": None}
 
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "lxml")
     # Title
     if soup.title and soup.title.string:
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from typing import List, Optional
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from prometheus_client import Counter
+
+from ...core.sqlite_lru import SQLiteLRU
+
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./data/llm_cache.sqlite")
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", "86400"))  # 0 disables the cache
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+LLM_CACHE_HITS = Counter("llm_cache_hits_total", "LLM responses served from the response cache", ["provider"])
+LLM_CACHE_MISSES = Counter("llm_cache_misses_total", "LLM calls not found in the response cache", ["provider"])
+LLM_CACHE_EVICTIONS = Counter("llm_cache_evictions_total", "Entries evicted or expired from the LLM response cache")
+
+
+def _norm(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+def response_key(provider: str, model: str, messages: List[dict], max_tokens: int) -> str:
+    """Hash of (provider, model, messages, max_tokens) after Unicode and whitespace normalization."""
+    msgs = [[_norm(m.get("role", "")).lower(), _norm(m.get("content", ""))] for m in messages]
+    blob = json.dumps([provider, model, msgs, int(max_tokens)], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Persistent prompt -> completion cache with a TTL and LRU size bound (`SQLiteLRU`)."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: int = LLM_CACHE_TTL_SEC, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.lru = SQLiteLRU(path, "llm_cache", max_entries, ttl=ttl, on_evict=LLM_CACHE_EVICTIONS.inc)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.lru.get(key)
+        return None if value is None else value.decode("utf-8")
+
+    def put(self, key: str, response: str) -> None:
+        self.lru.put(key, response.encode("utf-8"))
+
+    def __len__(self) -> int:
+        return len(self.lru)
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Shared cache, or None when LLM_CACHE_TTL_SEC is 0."""
+    global _cache
+    if LLM_CACHE_TTL_SEC <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
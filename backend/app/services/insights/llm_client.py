@@ -1,16 +1,156 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import json
+import logging
 import os
+import random
+import threading
+import time
+import weakref
 import httpx
 
+from .llm_cache import LLM_CACHE_HITS, LLM_CACHE_MISSES, LLMCache, get_llm_cache, response_key
+
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+HF_INFERENCE_URL = os.getenv("HF_INFERENCE_URL", "https://api-inference.huggingface.co/models")
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))  # in-flight requests per provider endpoint
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SEC = float(os.getenv("LLM_BACKOFF_SEC", "0.5"))
+LLM_CONNECT_TIMEOUT_SEC = float(os.getenv("LLM_CONNECT_TIMEOUT_SEC", "5"))
+LLM_READ_TIMEOUT_SEC = float(os.getenv("LLM_READ_TIMEOUT_SEC", "120"))
+LLM_DEADLINE_SEC = float(os.getenv("LLM_DEADLINE_SEC", "180"))  # whole call, retries and backoff included
+LLM_KEEPALIVE_SEC = float(os.getenv("LLM_KEEPALIVE_SEC", "60"))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+log = logging.getLogger(__name__)
+
+
+class SSEParser:
+    """Incremental Server-Sent Events parser: feed lines, get each event's `data` payload."""
+
+    def __init__(self):
+        self._buf: List[str] = []
+
+    def feed(self, line: str) -> Optional[str]:
+        if not line:
+            return self.flush()
+        if line.startswith("data:"):
+            self._buf.append(line[6:] if line.startswith("data: ") else line[5:])
+        return None
+
+    def flush(self) -> Optional[str]:
+        if not self._buf:
+            return None
+        data, self._buf = "\n".join(self._buf), []
+        return data
+
+
+def sse_data(lines: Iterator[str]) -> Iterator[str]:
+    """Payloads of the `data:` fields of a Server-Sent Events stream, one per event."""
+    parser = SSEParser()
+    for line in lines:
+        data = parser.feed(line)
+        if data is not None:
+            yield data
+    data = parser.flush()
+    if data is not None:
+        yield data
+
+
+# Connection pools shared by every LLMClient, keyed by endpoint base URL. httpx.AsyncClient
+# and asyncio.Semaphore belong to one event loop, so async pools are kept per loop.
+_sync_pools: Dict[str, Tuple[httpx.Client, threading.BoundedSemaphore]] = {}
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Tuple[httpx.AsyncClient, asyncio.Semaphore]]]" = (
+    weakref.WeakKeyDictionary()
+)
+_pools_lock = threading.Lock()
+
+
+def _pool_options(concurrency: int) -> Dict:
+    return {
+        "timeout": httpx.Timeout(LLM_READ_TIMEOUT_SEC, connect=LLM_CONNECT_TIMEOUT_SEC),
+        "limits": httpx.Limits(
+            max_connections=concurrency, max_keepalive_connections=concurrency, keepalive_expiry=LLM_KEEPALIVE_SEC,
+        ),
+    }
+
+
+def _sync_pool(base_url: str, concurrency: int) -> Tuple[httpx.Client, threading.BoundedSemaphore]:
+    with _pools_lock:
+        pool = _sync_pools.get(base_url)
+        if pool is None:
+            pool = _sync_pools[base_url] = (httpx.Client(**_pool_options(concurrency)), threading.BoundedSemaphore(concurrency))
+        return pool
+
+
+def _async_pool(base_url: str, concurrency: int) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    with _pools_lock:
+        pools = _async_pools.setdefault(loop, {})
+        pool = pools.get(base_url)
+        if pool is None:
+            pool = pools[base_url] = (httpx.AsyncClient(**_pool_options(concurrency)), asyncio.Semaphore(concurrency))
+        return pool
+
+
+async def aclose_llm_clients() -> None:
+    """Close the pooled connections of the running event loop (app shutdown)."""
+    with _pools_lock:
+        pools = _async_pools.pop(asyncio.get_running_loop(), {})
+    for client, _ in pools.values():
+        await client.aclose()
+
+
+def close_llm_clients() -> None:
+    with _pools_lock:
+        pools = list(_sync_pools.values())
+        _sync_pools.clear()
+    for client, _ in pools:
+        client.close()
+
+
+_DONE = object()
+
 
 class LLMClient:
-    def __init__(self, provider: str, model: str, api_key: Optional[str] = None, hf_api_token: Optional[str] = None):
+    """Chat completion client for OpenAI-compatible and HF inference endpoints.
+
+    Requests go through long-lived keep-alive pools shared per endpoint, at
+    most `concurrency` at a time, and are retried with jittered exponential
+    backoff (honouring `Retry-After`) on 429/5xx and transport errors, within
+    an overall `deadline` in seconds. `summarize`, `asummarize` and `astream`
+    go through the response cache (`cache`, else the shared one) unless
+    called with `use_cache=False`, which skips the lookup but stores the
+    fresh answer.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        api_key: Optional[str] = None,
+        hf_api_token: Optional[str] = None,
+        base_url: Optional[str] = None,
+        concurrency: int = LLM_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff: float = LLM_BACKOFF_SEC,
+        deadline: float = LLM_DEADLINE_SEC,
+        cache: Optional[LLMCache] = None,
+    ):
         self.provider = provider
         self.model = model
         self.api_key = api_key
         self.hf_api_token = hf_api_token
+        self.base_url = (base_url or (OPENAI_BASE_URL if provider == "openai" else HF_INFERENCE_URL)).rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.cache = cache
 
     @classmethod
     def from_env(cls) -> "LLMClient | None":
@@ -29,34 +169,193 @@ class LLMClient:
             return cls(provider="hf", model=model, hf_api_token=token)
         return None
 
-    def summarize(self, messages: List[dict], max_tokens: int = 512) -> Optional[str]:
-        """messages: [{'role':'system'|'user'|'assistant', 'content':'...'}]"""
-        try:
-            if self.provider == "openai":
-                # Use OpenAI Responses API via REST (avoid heavy SDK use)
-                headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-                payload = {
-                    "model": self.model,
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": 0.3,
-                }
-                with httpx.Client(timeout=60) as client:
-                    r = client.post("https://api.openai.com/v1/chat/completions", json=payload, headers=headers)
+    def _request(self, messages: List[dict], max_tokens: int, stream: bool = False) -> Tuple[str, dict, dict]:
+        """(url, payload, headers) of a completion call for this provider."""
+        if self.provider == "openai":
+            # Chat Completions via REST (avoid heavy SDK use)
+            headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+            payload = {
+                "model": self.model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": 0.3,
+            }
+        elif self.provider == "hf":
+            headers = {"Authorization": f"Bearer {self.hf_api_token}", "Content-Type": "application/json"}
+            prompt = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in messages])
+            payload = {"inputs": prompt, "parameters": {"max_new_tokens": max_tokens, "temperature": 0.3}}
+        else:
+            raise ValueError(f"Unknown LLM provider: {self.provider}")
+        if stream:
+            payload["stream"] = True
+            headers["Accept"] = "text/event-stream"
+        url = f"{self.base_url}/chat/completions" if self.provider == "openai" else f"{self.base_url}/{self.model}"
+        return url, payload, headers
+
+    def _text(self, data) -> str:
+        if self.provider == "openai":
+            return data["choices"][0]["message"]["content"].strip()
+        # HF returns list of dicts with 'generated_text'
+        return data[0].get("generated_text", "").strip()
+
+    def _piece(self, data: str):
+        """Text carried by one streamed event, None for none, `_DONE` at the end marker."""
+        if data.strip() == "[DONE]":
+            return _DONE
+        event = json.loads(data)
+        if self.provider == "openai":
+            choices = event.get("choices") or [{}]
+            return (choices[0].get("delta") or {}).get("content")
+        token = event.get("token") or {}
+        return None if token.get("special") else token.get("text")
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str], deadline: float) -> Optional[float]:
+        """Seconds to wait before retry `attempt + 1`, or None when retries or time are used up."""
+        if attempt >= self.max_retries:
+            return None
+        delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                pass
+        if time.monotonic() + delay > deadline:
+            return None
+        return delay
+
+    def complete(self, messages: List[dict], max_tokens: int = 512) -> str:
+        """Blocking completion; raises once retries are exhausted."""
+        url, payload, headers = self._request(messages, max_tokens)
+        client, slots = _sync_pool(self.base_url, self.concurrency)
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                with slots:
+                    r = client.post(url, json=payload, headers=headers)
+            except httpx.TransportError:
+                delay = self._retry_delay(attempt, None, deadline)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(attempt, r.headers.get("retry-after"), deadline) if r.status_code in RETRY_STATUS else None
+                if delay is None:
                     r.raise_for_status()
-                    data = r.json()
-                    return data["choices"][0]["message"]["content"].strip()
-            elif self.provider == "hf":
-                headers = {"Authorization": f"Bearer {self.hf_api_token}", "Content-Type": "application/json"}
-                prompt = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in messages])
-                payload = {"inputs": prompt, "parameters": {"max_new_tokens": max_tokens, "temperature": 0.3}}
-                with httpx.Client(timeout=120) as client:
-                    r = client.post(f"https://api-inference.huggingface.co/models/{self.model}", json=payload, headers=headers)
+                    return self._text(r.json())
+            time.sleep(delay)
+            attempt += 1
+
+    async def acomplete(self, messages: List[dict], max_tokens: int = 512) -> str:
+        """`complete` on the event loop; waiting for a slot or a retry does not hold a thread."""
+        url, payload, headers = self._request(messages, max_tokens)
+        client, slots = _async_pool(self.base_url, self.concurrency)
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                async with slots:
+                    r = await client.post(url, json=payload, headers=headers)
+            except httpx.TransportError:
+                delay = self._retry_delay(attempt, None, deadline)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(attempt, r.headers.get("retry-after"), deadline) if r.status_code in RETRY_STATUS else None
+                if delay is None:
                     r.raise_for_status()
-                    data = r.json()
-                    # HF returns list of dicts with 'generated_text'
-                    text = data[0].get("generated_text", "").strip()
-                    return text
+                    return self._text(r.json())
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _cached(self, messages: List[dict], max_tokens: int, use_cache: bool) -> Tuple[Optional[LLMCache], str, Optional[str]]:
+        """(cache, key, cached response or None); the cache is None when disabled."""
+        cache = self.cache if self.cache is not None else get_llm_cache()
+        if cache is None:
+            return None, "", None
+        key = response_key(self.provider, self.model, messages, max_tokens)
+        hit = cache.get(key) if use_cache else None
+        (LLM_CACHE_HITS if hit is not None else LLM_CACHE_MISSES).labels(self.provider).inc()
+        return cache, key, hit
+
+    def summarize(self, messages: List[dict], max_tokens: int = 512, use_cache: bool = True) -> Optional[str]:
+        """messages: [{'role':'system'|'user'|'assistant', 'content':'...'}]; None on failure."""
+        cache, key, hit = self._cached(messages, max_tokens, use_cache)
+        if hit is not None:
+            return hit
+        try:
+            text = self.complete(messages, max_tokens)
         except Exception:
+            log.exception("%s completion failed", self.provider)
             return None
-        return None
+        if cache is not None and text:
+            cache.put(key, text)
+        return text
+
+    async def asummarize(self, messages: List[dict], max_tokens: int = 512, use_cache: bool = True) -> Optional[str]:
+        cache, key, hit = await asyncio.to_thread(self._cached, messages, max_tokens, use_cache)
+        if hit is not None:
+            return hit
+        try:
+            text = await self.acomplete(messages, max_tokens)
+        except Exception:
+            log.exception("%s completion failed", self.provider)
+            return None
+        if cache is not None and text:
+            await asyncio.to_thread(cache.put, key, text)
+        return text
+
+    async def astream(self, messages: List[dict], max_tokens: int = 512, use_cache: bool = True) -> AsyncIterator[str]:
+        """Yield completion text pieces as the provider streams them.
+
+        OpenAI sends `choices[0].delta.content` chunks ending with `[DONE]`;
+        HF text-generation-inference sends `token.text` (special tokens are
+        skipped). Opening the stream is retried like `acomplete`; errors
+        after the first piece are raised, not swallowed, so callers can
+        report them. A cached answer is yielded as a single piece.
+        """
+        cache, key, hit = await asyncio.to_thread(self._cached, messages, max_tokens, use_cache)
+        if hit is not None:
+            yield hit
+            return
+        pieces: List[str] = []
+        async for piece in self._astream(messages, max_tokens):
+            pieces.append(piece)
+            yield piece
+        text = "".join(pieces).strip()
+        if cache is not None and text:
+            await asyncio.to_thread(cache.put, key, text)
+
+    async def _astream(self, messages: List[dict], max_tokens: int) -> AsyncIterator[str]:
+        url, payload, headers = self._request(messages, max_tokens, stream=True)
+        client, slots = _async_pool(self.base_url, self.concurrency)
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        async with slots:
+            while True:
+                yielded = False
+                try:
+                    async with client.stream("POST", url, json=payload, headers=headers) as r:
+                        retry = r.status_code in RETRY_STATUS
+                        delay = self._retry_delay(attempt, r.headers.get("retry-after"), deadline) if retry else None
+                        if delay is None:
+                            r.raise_for_status()
+                            parser = SSEParser()
+                            async for line in r.aiter_lines():
+                                data = parser.feed(line)
+                                piece = None if data is None else self._piece(data)
+                                if piece is _DONE:
+                                    return
+                                if piece:
+                                    yielded = True
+                                    yield piece
+                            data = parser.flush()
+                            piece = None if data is None else self._piece(data)
+                            if piece and piece is not _DONE:
+                                yield piece
+                            return
+                except httpx.TransportError:
+                    delay = None if yielded else self._retry_delay(attempt, None, deadline)
+                    if delay is None:
+                        raise
+                await asyncio.sleep(delay)
+                attempt += 1
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from prometheus_client import Counter
+
+from ...core.sqlite_lru import SQLiteLRU
+
+
+ANNOTATION_CACHE_PATH = os.getenv("NLP_ANNOTATION_CACHE_PATH", "./data/nlp_annotation_cache.sqlite")
+ANNOTATION_CACHE_MAX_ENTRIES = int(os.getenv("NLP_ANNOTATION_CACHE_MAX_ENTRIES", "500000"))  # 0 disables the cache
+ANNOTATOR_VERSION = "2"  # bump when heuristic NER / event / sentiment output changes
+
+ANNOTATION_CACHE_HITS = Counter("nlp_annotation_cache_hits_total", "Documents whose annotation was reused (cache or duplicate text)")
+ANNOTATION_CACHE_MISSES = Counter("nlp_annotation_cache_misses_total", "Documents that had to be annotated")
+ANNOTATION_CACHE_EVICTIONS = Counter("nlp_annotation_cache_evictions_total", "Entries evicted from the annotation cache")
+
+
+def model_config() -> str:
+    """Annotator identity: NER and sentiment models as configured now, plus ANNOTATOR_VERSION."""
+    return "|".join([ANNOTATOR_VERSION, os.getenv("FIN_NER_MODEL", ""), os.getenv("FIN_SENTIMENT_MODEL", "")])
+
+
+def annotation_key(text: str, config: Optional[str] = None) -> str:
+    """Hash of the model config and the text after Unicode and whitespace normalization.
+
+    Changing FIN_NER_MODEL / FIN_SENTIMENT_MODEL changes every key, so entries
+    from the previous configuration are never served (they age out via LRU).
+    """
+    norm = " ".join(unicodedata.normalize("NFC", text or "").split())
+    blob = (config if config is not None else model_config()) + "\x00" + norm
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class AnnotationCache:
+    """Persistent text key -> annotation cache with LRU eviction (`SQLiteLRU`), kept across runs."""
+
+    def __init__(self, path: str = ANNOTATION_CACHE_PATH, max_entries: int = ANNOTATION_CACHE_MAX_ENTRIES):
+        self.lru = SQLiteLRU(path, "annotation_cache", max_entries, on_evict=ANNOTATION_CACHE_EVICTIONS.inc)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict]:
+        return {k: json.loads(v) for k, v in self.lru.get_many(keys).items()}
+
+    def put_many(self, items: Dict[str, Dict]) -> None:
+        self.lru.put_many({k: json.dumps(a, ensure_ascii=False).encode("utf-8") for k, a in items.items()})
+
+    def __len__(self) -> int:
+        return len(self.lru)
+
+
+_cache: Optional[AnnotationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_annotation_cache() -> Optional[AnnotationCache]:
+    """Shared cache, or None when NLP_ANNOTATION_CACHE_MAX_ENTRIES is 0."""
+    global _cache
+    if ANNOTATION_CACHE_MAX_ENTRIES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnnotationCache()
+        return _cache
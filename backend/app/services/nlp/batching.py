@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from typing import List
+import os
+
+
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "16"))  # texts per transformer forward pass
+
+
+def length_batches(texts: List[str], batch_size: int = NLP_BATCH_SIZE) -> List[List[int]]:
+    """Indices of the non-empty `texts`, sorted by length and cut into `batch_size` groups.
+
+    Similar lengths in a batch keep padding (wasted compute) small.
+    """
+    order = sorted((i for i, t in enumerate(texts) if t), key=lambda i: len(texts[i]))
+    size = max(1, batch_size)
+    return [order[i : i + size] for i in range(0, len(order), size)]
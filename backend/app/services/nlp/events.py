@@ -4,22 +4,30 @@ from __future__ import annotations
 
 from typing import Dict, List, Any
 
+from .keywords import gazetteer_hits
 
+
+# The gazetteer also matches the last word with a trailing "s"/"es" ("mergers",
+# "acquires", "partnerships"); other inflections are listed explicitly.
 KEYWORDS = {
     "merger_acquisition": [
-        "merger", "acquisition", "acquire", "acquired", "acquiring", "m&a", "takeover"
+        "merger", "acquisition", "acquire", "acquired", "acquiring", "m&a", "takeover", "merged with"
     ],
     "earnings": [
         "earnings", "q1", "q2", "q3", "q4", "quarterly results", "eps", "revenue", "guidance"
     ],
     "layoffs": [
-        "layoff", "layoffs", "job cuts", "reduce workforce", "redundancies"
+        "layoff", "job cuts", "reduce workforce", "redundancies"
     ],
     "partnership": [
-        "partnership", "partners with", "collaboration", "strategic alliance"
+        "partnership", "partners with", "partnered with", "collaboration", "strategic alliance"
     ],
 }
 
+# output order follows KEYWORDS, as when each keyword was scanned in turn
+_LABEL_RANK = {label: i for i, label in enumerate(KEYWORDS)}
+_KEYWORD_RANK = {(label, kw): i for label, kws in KEYWORDS.items() for i, kw in enumerate(kws)}
+
 
 def extract_events(text: str) -> Dict[str, Any]:
     """Return a richer schema:
@@ -32,10 +40,10 @@ def extract_events(text: str) -> Dict[str, Any]:
     """
     if not text:
         return {"events": []}
-    low = text.lower()
+    found = gazetteer_hits(text)  # one pass over the text for all keywords
     events: List[Dict[str, Any]] = []
-    for label, kws in KEYWORDS.items():
-        hits = [kw for kw in kws if kw in low]
+    for label in sorted((lbl for kind, lbl in found if kind == "event"), key=_LABEL_RANK.get):
+        hits = sorted(found[("event", label)], key=lambda kw: _KEYWORD_RANK[label, kw])
         if hits:
             # crude confidence: min(0.5 + 0.1*#hits, 0.95)
             conf = min(0.5 + 0.1 * len(hits), 0.95)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+import re
+import threading
+
+
+# Words and single punctuation marks: "S&P 500" -> ["s", "&", "p", "500"]
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def keyword_tokens(text: str) -> List[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+# How a term's last token may match a text token: exactly, with a plural or
+# third-person "s"/"es" ("merger" ~ "mergers", "acquire" ~ "acquires"), or as
+# a prefix ("fed" ~ "federal", "crypto" ~ "cryptocurrency").
+MATCH_MODES = ("word", "plural", "prefix")
+
+
+def _last_token_keys(tok: str, match: str) -> List[str]:
+    """Term last tokens that a text token `tok` satisfies under `match`."""
+    if match == "prefix":
+        return [tok[:k] for k in range(1, len(tok) + 1)]
+    keys = [tok]
+    if len(tok) > 1 and tok.endswith("s"):
+        keys.append(tok[:-1])
+        if len(tok) > 2 and tok.endswith("es"):
+            keys.append(tok[:-2])
+    return keys
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over word tokens.
+
+    Terms are lowercased and tokenized like the text, so a term only
+    matches whole words ("eps" is not found in "steps") and multi-word or
+    punctuated terms ("job cuts", "s&p 500") match across spacing. One
+    pass over the text's tokens reports every occurrence of every term,
+    overlapping ones included, whatever the number of terms.
+
+    With `match="plural"` or `"prefix"` (see `MATCH_MODES`) the last token
+    of a term is looked up among the keys `_last_token_keys` derives from
+    each text token, instead of being a transition of the automaton.
+    """
+
+    def __init__(self, terms: Iterable[Tuple[str, Hashable]], match: str = "word"):
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unknown keyword match mode: {match}")
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[Tuple[str, Hashable]]] = [[]]
+        # state -> last token -> terms ending there (non-"word" modes only)
+        last: List[Dict[str, List[Tuple[str, Hashable]]]] = [{}]
+        size = 0
+        for term, payload in terms:
+            toks = keyword_tokens(term)
+            if not toks:
+                continue
+            if match != "word":
+                toks, tail = toks[:-1], toks[-1]
+            state = 0
+            for tok in toks:
+                nxt = goto[state].get(tok)
+                if nxt is None:
+                    nxt = goto[state][tok] = len(goto)
+                    goto.append({})
+                    out.append([])
+                    last.append({})
+                state = nxt
+            ends = out[state] if match == "word" else last[state].setdefault(tail, [])
+            if (term, payload) not in ends:
+                ends.append((term, payload))
+                size += 1
+        # failure links by breadth-first search; outputs inherit those of their failure state
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for tok, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and tok not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(tok, 0) if state else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+                merged = {t: list(o) for t, o in last[fail[nxt]].items()}
+                for t, o in last[nxt].items():
+                    merged[t] = o + merged.get(t, [])
+                last[nxt] = merged
+        self.match = match
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+        self._last = last
+        self._size = size
+
+    def __len__(self) -> int:
+        """Number of distinct (term, payload) pairs."""
+        return self._size
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str, Hashable]]:
+        """(index of the term's last token, term, payload) for every occurrence, in text order."""
+        goto, fail, out, last, match = self._goto, self._fail, self._out, self._last, self.match
+        state = 0
+        for i, tok in enumerate(keyword_tokens(text)):
+            if match != "word":
+                # terms whose leading tokens end at the previous token
+                ends = last[state]
+                for key in _last_token_keys(tok, match):
+                    for term, payload in ends.get(key, ()):
+                        yield i, term, payload
+            while state and tok not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(tok, 0)
+            for term, payload in out[state]:
+                yield i, term, payload
+
+    def hits(self, text: str) -> Dict[Hashable, List[str]]:
+        """payload -> distinct matched terms, in order of first occurrence."""
+        found: Dict[Hashable, List[str]] = {}
+        for _, term, payload in self.finditer(text):
+            terms = found.setdefault(payload, [])
+            if term not in terms:
+                terms.append(term)
+        return found
+
+    def search(self, text: str) -> bool:
+        return next(self.finditer(text), None) is not None
+
+
+@lru_cache(maxsize=64)
+def compile_keywords(keywords: Tuple[str, ...], match: str = "word") -> KeywordMatcher:
+    """Matcher whose payload is the keyword itself; cached per keyword list and mode."""
+    return KeywordMatcher(((kw, kw) for kw in keywords), match=match)
+
+
+_gazetteer: Optional[KeywordMatcher] = None
+_gazetteer_lock = threading.Lock()
+
+
+def gazetteer() -> KeywordMatcher:
+    """One matcher for all annotation gazetteers; payloads are ("event" | "index", label).
+
+    Plural and "s"-inflected forms of the last word match ("mergers", "acquires").
+    """
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            from .events import KEYWORDS
+            from .ner import INDEX_KEYWORDS
+
+            terms = [(kw, ("event", label)) for label, kws in KEYWORDS.items() for kw in kws]
+            terms += [(kw, ("index", label)) for label, kws in INDEX_KEYWORDS.items() for kw in kws]
+            _gazetteer = KeywordMatcher(terms, match="plural")
+        return _gazetteer
+
+
+@lru_cache(maxsize=32)
+def gazetteer_hits(text: str) -> Dict[Hashable, List[str]]:
+    """`gazetteer().hits(text)`, remembered briefly since NER and events scan the same text.
+
+    Callers must not modify the result.
+    """
+    return gazetteer().hits(text)
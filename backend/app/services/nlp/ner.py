@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
 import re
 import os
 
+from .batching import NLP_BATCH_SIZE, length_batches
+from .keywords import gazetteer_hits
+from .registry import get_model_registry
+
 
 TICKER_RE = re.compile(r"\b[A-Z]{2,5}\b")
 CURRENCY_PAIR_RE = re.compile(r"\b[A-Z]{3}/[A-Z]{3}\b")
@@ -19,23 +23,22 @@ INDEX_KEYWORDS = {
 }
 
 
-_hf_ner = None  # lazy
+_hf_ner = None  # set to use a given pipeline instead of the registry's
 
 
-def _get_hf_ner():
-    global _hf_ner
-    if _hf_ner is not None:
-        return _hf_ner
+def load_hf_ner():
     model_name = os.getenv("FIN_NER_MODEL", "")  # e.g., "dslim/bert-base-NER" or finance-specific
     if not model_name:
         return None
-    try:
-        from transformers import pipeline  # type: ignore
+    from transformers import pipeline  # type: ignore
+
+    return pipeline("ner", model=model_name, tokenizer=model_name, aggregation_strategy="simple")
 
-        _hf_ner = pipeline("ner", model=model_name, tokenizer=model_name, aggregation_strategy="simple")
+
+def _get_hf_ner():
+    if _hf_ner is not None:
         return _hf_ner
-    except Exception:
-        return None
+    return get_model_registry().get("ner")
 
 
 def _extract_entities_heuristic(text: str) -> Dict[str, List[str]]:
@@ -60,12 +63,8 @@ def _extract_entities_heuristic(text: str) -> Dict[str, List[str]]:
                 continue
             orgs.add(cand)
 
-    # Indices by keyword presence
-    indices: Set[str] = set()
-    low = s.lower()
-    for label, kws in INDEX_KEYWORDS.items():
-        if any(k in low for k in kws):
-            indices.add(label)
+    # Indices by keyword presence (shared single-pass matcher)
+    indices: Set[str] = {label for kind, label in gazetteer_hits(s) if kind == "index"}
 
     return {
         "tickers": sorted(tickers),
@@ -75,30 +74,33 @@ def _extract_entities_heuristic(text: str) -> Dict[str, List[str]]:
     }
 
 
+def _hf_entities(ents) -> Dict[str, List[str]]:
+    orgs: Set[str] = set()
+    tickers: Set[str] = set()
+    # Map labels to our buckets simply
+    for e in ents:
+        label = (e.get("entity_group") or e.get("entity") or "").upper()
+        word = e.get("word") or e.get("text") or ""
+        if not word:
+            continue
+        if label in {"ORG", "COMPANY"}:
+            orgs.add(word)
+        elif label in {"TICKER", "SYM", "MISC"} and TICKER_RE.fullmatch(word):
+            tickers.add(word)
+    return {
+        "tickers": sorted(tickers),
+        "orgs": sorted(orgs),
+        "indices": [],
+        "products": [],
+    }
+
+
 def _extract_entities_hf(text: str) -> Dict[str, List[str]] | None:
     clf = _get_hf_ner()
     if clf is None:
         return None
     try:
-        ents = clf(text)  # list of aggregated entities
-        orgs: Set[str] = set()
-        tickers: Set[str] = set()
-        # Map labels to our buckets simply
-        for e in ents:
-            label = (e.get("entity_group") or e.get("entity") or "").upper()
-            word = e.get("word") or e.get("text") or ""
-            if not word:
-                continue
-            if label in {"ORG", "COMPANY"}:
-                orgs.add(word)
-            elif label in {"TICKER", "SYM", "MISC"} and TICKER_RE.fullmatch(word):
-                tickers.add(word)
-        return {
-            "tickers": sorted(tickers),
-            "orgs": sorted(orgs),
-            "indices": [],
-            "products": [],
-        }
+        return _hf_entities(clf(text))  # list of aggregated entities
     except Exception:
         return None
 
@@ -110,3 +112,18 @@ def extract_entities(text: str) -> Dict[str, List[str]]:
         if hf is not None:
             return hf
     return _extract_entities_heuristic(text)
+
+
+def extract_entities_many(texts: List[str], batch_size: int = NLP_BATCH_SIZE) -> List[Dict[str, List[str]]]:
+    """`extract_entities` for many texts; the HF model runs on length-sorted batches."""
+    out: List[Optional[Dict[str, List[str]]]] = [None] * len(texts)
+    clf = _get_hf_ner()
+    if clf is not None:
+        for batch in length_batches(texts, batch_size):
+            try:
+                results = clf([texts[i] for i in batch], batch_size=len(batch))
+            except Exception:
+                continue  # this batch falls back to the heuristic
+            for i, ents in zip(batch, results):
+                out[i] = _hf_entities(ents)
+    return [o if o is not None else _extract_entities_heuristic(t) for o, t in zip(out, texts)]
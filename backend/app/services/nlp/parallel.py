@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import multiprocessing as mp
+import os
+import threading
+
+from .batching import NLP_BATCH_SIZE
+from .pipeline import annotate_texts
+from .registry import get_model_registry
+
+
+NLP_WORKERS = int(os.getenv("NLP_WORKERS", "0"))  # 0/1 = annotate in the calling process
+NLP_WORKER_CHUNK = int(os.getenv("NLP_WORKER_CHUNK", "64"))  # documents per task sent to a worker
+
+
+def _init_worker() -> None:
+    # load the configured models once per worker, before its first chunk
+    registry = get_model_registry()
+    for name in registry.slots:
+        registry.get(name)
+
+
+def _annotate_chunk(items: List[Tuple[int, str]], batch_size: int) -> List[Tuple[int, Dict]]:
+    ids = [i for i, _ in items]
+    return list(zip(ids, annotate_texts([t for _, t in items], batch_size)))
+
+
+class AnnotationPool:
+    """Process pool annotating (id, text) pairs in chunks.
+
+    Workers are spawned once and keep their models loaded between runs.
+    `annotate` reads its input lazily and yields results as chunks finish,
+    keeping at most `2 * workers` chunks in flight, so the caller can
+    persist while the workers annotate and memory stays bounded.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.broken = False
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=mp.get_context("spawn"), initializer=_init_worker,
+        )
+
+    def annotate(
+        self,
+        items: Iterable[Tuple[int, str]],
+        chunk_size: int = NLP_WORKER_CHUNK,
+        batch_size: int = NLP_BATCH_SIZE,
+    ) -> Iterator[Tuple[int, Dict]]:
+        it = iter(items)
+        pending: Set[Future] = set()
+
+        def submit() -> bool:
+            chunk = list(islice(it, max(1, chunk_size)))
+            if chunk:
+                pending.add(self._executor.submit(_annotate_chunk, chunk, batch_size))
+            return bool(chunk)
+
+        try:
+            for _ in range(2 * self.workers):
+                if not submit():
+                    break
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield from fut.result()
+                    submit()
+        except BrokenProcessPool:
+            self.broken = True  # a worker died; the next get_annotation_pool starts a new pool
+            raise
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: Optional[AnnotationPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_annotation_pool(workers: int = NLP_WORKERS) -> AnnotationPool:
+    """Shared pool of `workers` processes, recreated if the size changes or it broke."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and (_pool.broken or _pool.workers != workers):
+            _pool.shutdown()
+            _pool = None
+        if _pool is None:
+            _pool = AnnotationPool(workers)
+        return _pool
+
+
+def shutdown_annotation_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
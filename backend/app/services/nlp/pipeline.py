@@ -1,14 +1,25 @@
 from __future__ import annotations
 
-from typing import List, Optional, Dict
-from sqlalchemy import select
+from collections import deque
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+from sqlalchemy import and_, exists, select
 
 from ...db.session import SessionLocal
 from ...db.models.document import Document
 from ...db.models.nlp_annotation import NLPAnnotation
-from .ner import extract_entities
+from .annotation_cache import (
+    ANNOTATION_CACHE_HITS, ANNOTATION_CACHE_MISSES, AnnotationCache, annotation_key, get_annotation_cache, model_config,
+)
+from .batching import NLP_BATCH_SIZE
+from .ner import extract_entities, extract_entities_many
 from .events import extract_events
-from .sentiment import analyze_sentiment
+from .sentiment import analyze_sentiment, analyze_sentiment_many
+from .writer import WRITE_BATCH, AnnotationWriter
+
+
+ANNOTATE_CHUNK = int(os.getenv("NLP_ANNOTATE_CHUNK", "256"))  # documents annotated (and held) at a time
 
 
 def annotate_text(text: str) -> Dict:
@@ -18,40 +29,188 @@ def annotate_text(text: str) -> Dict:
     return {"entities": entities, "events": events, "sentiment": sentiment}
 
 
-def run_nlp_pipeline(limit: int = 100, document_ids: Optional[List[int]] = None) -> Dict:
+def annotate_texts(texts: List[str], batch_size: int = NLP_BATCH_SIZE) -> List[Dict]:
+    """`annotate_text` for many texts, running the HF models `batch_size` texts at a time."""
+    entities = extract_entities_many(texts, batch_size)
+    sentiments = analyze_sentiment_many(texts, batch_size)
+    return [
+        {"entities": ent, "events": extract_events(text), "sentiment": sent}
+        for text, ent, sent in zip(texts, entities, sentiments)
+    ]
+
+
+def document_text(doc) -> str:
+    return (doc.content or doc.summary or doc.title or "").strip()
+
+
+def annotate_stream(items: Iterable[Tuple[int, str]], batch_size: int = NLP_BATCH_SIZE) -> Iterator[Tuple[int, Dict]]:
+    """Yield (id, annotation) for (id, text) pairs, annotating `ANNOTATE_CHUNK` at a time in-process."""
+    it = iter(items)
+    while True:
+        chunk = [x for _, x in zip(range(ANNOTATE_CHUNK), it)]
+        if not chunk:
+            return
+        yield from zip([i for i, _ in chunk], annotate_texts([t for _, t in chunk], batch_size))
+
+
+def cached_stream(
+    items: Iterable[Tuple[int, str]],
+    annotate: Callable[[Iterable[Tuple[int, str]]], Iterator[Tuple[int, Dict]]],
+    cache: AnnotationCache,
+) -> Iterator[Tuple[int, Dict]]:
+    """Yield (id, annotation) for (id, text) pairs, sending only unseen texts to `annotate`.
+
+    Texts are looked up `ANNOTATE_CHUNK` at a time by `annotation_key`; hits
+    are yielded without annotation, and a text repeated within the run is
+    annotated once and its result reused. New results are added to the cache.
+    """
+    config = model_config()
+    hits: deque = deque()
+    waiting: Dict[str, List[int]] = {}  # key -> ids sharing the annotation in flight
+    owner: Dict[int, str] = {}
+    fresh: Dict[str, Dict] = {}  # annotated this run, not yet in the cache
+    flushed: Dict[str, Dict] = {}  # written to the cache since the last lookup
+
+    def misses() -> Iterator[Tuple[int, str]]:
+        it = iter(items)
+        while True:
+            chunk = [x for _, x in zip(range(ANNOTATE_CHUNK), it)]
+            if not chunk:
+                return
+            keys = [annotation_key(t, config) for _, t in chunk]
+            flushed.clear()
+            found = cache.get_many([k for k in keys if k not in waiting and k not in fresh])
+            for (doc_id, text), k in zip(chunk, keys):
+                # results can land while the chunk is handed out, so check this run's first
+                ann = fresh.get(k) or flushed.get(k) or found.get(k)
+                if ann is not None:
+                    ANNOTATION_CACHE_HITS.inc()
+                    hits.append((doc_id, ann))
+                elif k in waiting:
+                    waiting[k].append(doc_id)
+                else:
+                    waiting[k] = [doc_id]
+                    owner[doc_id] = k
+                    yield doc_id, text
+
+    def drain() -> Iterator[Tuple[int, Dict]]:
+        while hits:
+            yield hits.popleft()
+
+    for doc_id, ann in annotate(misses()):
+        yield from drain()
+        k = owner.pop(doc_id)
+        ids = waiting.pop(k)
+        ANNOTATION_CACHE_MISSES.inc()
+        ANNOTATION_CACHE_HITS.inc(len(ids) - 1)
+        fresh[k] = ann
+        if len(fresh) >= ANNOTATE_CHUNK:
+            cache.put_many(fresh)
+            flushed.update(fresh)
+            fresh.clear()
+        for i in ids:
+            yield i, ann
+    yield from drain()
+    cache.put_many(fresh)
+
+
+def pending_filter(after_id: int = 0):
+    """Documents after `after_id` without an annotation: an anti-join on ix_nlp_annotations_document_id."""
+    return and_(Document.id > after_id, ~exists().where(NLPAnnotation.document_id == Document.id))
+
+
+def pending_ids(db, limit: int, after_id: int = 0) -> List[int]:
+    return db.scalars(
+        select(Document.id).where(pending_filter(after_id)).order_by(Document.id.asc()).limit(limit)
+    ).all()
+
+
+def _pending_texts(db, limit: int, after_id: int, cursor: List[int]) -> Iterator[Tuple[int, str]]:
+    """(id, text) of up to `limit` pending documents, read in keyset pages; `cursor[0]` tracks the last id."""
+    left = limit
+    while left > 0:
+        page = min(left, ANNOTATE_CHUNK)
+        rows = db.execute(
+            select(Document.id, Document.content, Document.summary, Document.title)
+            .where(pending_filter(cursor[0]))
+            .order_by(Document.id.asc())
+            .limit(page)
+        ).all()
+        for row in rows:
+            cursor[0] = row.id
+            yield row.id, document_text(row)
+        left -= len(rows)
+        if len(rows) < page:
+            return
+
+
+def _flushing(items: Iterable[Tuple[int, str]], writer: AnnotationWriter) -> Iterator[Tuple[int, str]]:
+    """Pass `items` through, flushing due annotations whenever the annotator asks for more input."""
+    for item in items:
+        writer.flush_if_due()
+        yield item
+
+
+def run_nlp_pipeline(
+    limit: int = 100,
+    document_ids: Optional[List[int]] = None,
+    batch_size: int = NLP_BATCH_SIZE,
+    workers: Optional[int] = None,
+    cursor: int = 0,
+    write_batch: int = WRITE_BATCH,
+    use_cache: bool = True,
+) -> Dict:
     """Annotate documents and persist results.
 
     - If document_ids provided, only process those
-    - Else, process up to `limit` documents without existing annotation
+    - Else, process up to `limit` documents without existing annotation, in id
+      order after `cursor`; `next_cursor` resumes after the last one (None when
+      no pending documents were left), or just before the first document whose
+      annotation could not be written, so it is retried
+    - Documents are annotated `ANNOTATE_CHUNK` at a time, models in `batch_size` batches
+    - With `workers` > 1 (default `NLP_WORKERS`), chunks go to a process pool and
+      results are persisted as they come back
+    - Annotations are written `write_batch` rows per transaction (`AnnotationWriter`);
+      rows buffered longer than `NLP_WRITE_FLUSH_MS` are flushed before the next
+      chunk is annotated
+    - With `use_cache`, texts already annotated under the current model config
+      (this run or an earlier one) are not annotated again (`cached_stream`)
     """
+    from .parallel import NLP_WORKERS, get_annotation_pool
+
+    workers = NLP_WORKERS if workers is None else workers
     db = SessionLocal()
     processed = 0
-    created = 0
+    last = [cursor]
     try:
         if document_ids:
-            docs = db.execute(
-                select(Document).where(Document.id.in_(document_ids))
-            ).scalars().all()
+            rows = db.execute(
+                select(Document.id, Document.content, Document.summary, Document.title)
+                .where(Document.id.in_(document_ids))
+            ).all()
+            items = ((r.id, document_text(r)) for r in rows)
+        else:
+            items = _pending_texts(db, limit, cursor, last)
+
+        if workers > 1:
+            annotate = partial(get_annotation_pool(workers).annotate, batch_size=batch_size)
         else:
-            # select docs with no NLPAnnotation yet (simple heuristic)
-            annotated_ids = {aid for (aid,) in db.query(NLPAnnotation.document_id).all()}
-            q = db.execute(select(Document)).scalars()
-            docs = [d for d in q if d.id not in annotated_ids][:limit]
-
-        for doc in docs:
-            text = (doc.content or doc.summary or doc.title or "").strip()
-            ann = annotate_text(text)
-            row = NLPAnnotation(
-                document_id=doc.id,
-                entities=ann["entities"],
-                sentiment=ann["sentiment"],
-                events=ann["events"],
-            )
-            db.add(row)
-            db.commit()
-            created += 1
-            processed += 1
+            annotate = partial(annotate_stream, batch_size=batch_size)
+        cache = get_annotation_cache() if use_cache else None
+        with AnnotationWriter(db, batch_rows=write_batch) as writer:
+            items = _flushing(items, writer)
+            results = cached_stream(items, annotate, cache) if cache is not None else annotate(items)
+            for doc_id, ann in results:
+                writer.add(doc_id, ann)
+                processed += 1
+        created = writer.written
     finally:
         db.close()
 
-    return {"processed": processed, "created": created}
+    if document_ids:
+        return {"processed": processed, "created": created}
+    if writer.failed_ids:
+        next_cursor: Optional[int] = min(writer.failed_ids) - 1
+    else:
+        next_cursor = last[0] if processed >= limit else None
+    return {"processed": processed, "created": created, "next_cursor": next_cursor}
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import os
+import threading
+import time
+
+
+MODEL_WARMUP = os.getenv("NLP_MODEL_WARMUP", "1") == "1"  # load models in the background at startup
+MODEL_RETRY_SEC = float(os.getenv("NLP_MODEL_RETRY_SEC", "30"))  # wait after a failed load, doubled per failure
+MODEL_RETRY_MAX_SEC = float(os.getenv("NLP_MODEL_RETRY_MAX_SEC", "900"))
+
+log = logging.getLogger(__name__)
+
+
+class ModelSlot:
+    """One model behind a loader, loaded at most once at a time.
+
+    The loader returns the model, or None when it is not configured
+    (`disabled`). A loader that raises puts the slot in `failed`: `get`
+    returns None without retrying until the backoff has passed. Callers
+    arriving during a load wait for it rather than silently falling back,
+    so a configured model is used from the first annotation it can be.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], retry: float = MODEL_RETRY_SEC, retry_max: float = MODEL_RETRY_MAX_SEC,
+                 clock=time.monotonic):
+        self.name = name
+        self.loader = loader
+        self.retry = retry
+        self.retry_max = retry_max
+        self.clock = clock
+        self.state = "pending"
+        self.value: Any = None
+        self.error: Optional[str] = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.load_sec: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if self.state in ("ready", "disabled"):
+            return self.value
+        with self._lock:
+            if self.state in ("ready", "disabled"):
+                return self.value
+            if self.state == "failed" and self.clock() < self.retry_at:
+                return None
+            self.state = "loading"
+            t0 = self.clock()
+            try:
+                value = self.loader()
+            except Exception as e:
+                self.failures += 1
+                self.error = f"{type(e).__name__}: {e}"
+                self.retry_at = self.clock() + min(self.retry_max, self.retry * 2 ** (self.failures - 1))
+                self.state = "failed"
+                log.warning("loading model %s failed (attempt %d): %s", self.name, self.failures, self.error)
+                return None
+            self.value, self.error, self.load_sec = value, None, round(self.clock() - t0, 3)
+            self.state = "ready" if value is not None else "disabled"
+            return value
+
+    def status(self) -> Dict:
+        out: Dict[str, Any] = {"state": self.state}
+        if self.load_sec is not None:
+            out["load_sec"] = self.load_sec
+        if self.state == "failed":
+            out.update(error=self.error, failures=self.failures, retry_in_sec=round(max(0.0, self.retry_at - self.clock()), 1))
+        return out
+
+
+class ModelRegistry:
+    """Named model slots plus a background warm-up thread."""
+
+    def __init__(self):
+        self.slots: Dict[str, ModelSlot] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any], **kwargs) -> ModelSlot:
+        slot = self.slots[name] = ModelSlot(name, loader, **kwargs)
+        return slot
+
+    def get(self, name: str) -> Any:
+        return self.slots[name].get()
+
+    def warm_up(self, names: Optional[List[str]] = None) -> threading.Thread:
+        """Load `names` (default: all) one after another on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+
+        def run() -> None:
+            for name in names or list(self.slots):
+                self.get(name)
+
+        self._thread = threading.Thread(target=run, name="nlp-model-warmup", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    @property
+    def ready(self) -> bool:
+        return all(s.state in ("ready", "disabled") for s in self.slots.values())
+
+    def status(self) -> Dict[str, Dict]:
+        return {name: slot.status() for name, slot in self.slots.items()}
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Process-wide registry of the annotation models (VADER, FIN_SENTIMENT_MODEL, FIN_NER_MODEL)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            from .ner import load_hf_ner
+            from .sentiment import load_finbert, load_vader
+
+            registry = ModelRegistry()
+            registry.register("vader", load_vader)
+            registry.register("sentiment", load_finbert)
+            registry.register("ner", load_hf_ner)
+            _registry = registry
+        return _registry
@@ -1,35 +1,42 @@
 from __future__ import annotations
 
-from typing import Dict
+from typing import Dict, List, Optional
 import os
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-_vader = SentimentIntensityAnalyzer()
-_finbert_pipeline = None  # lazy
+from .batching import NLP_BATCH_SIZE, length_batches
+from .registry import get_model_registry
 
+_finbert_pipeline = None  # set to use a given pipeline instead of the registry's
 
-def _get_finbert():
-    global _finbert_pipeline
-    if _finbert_pipeline is not None:
-        return _finbert_pipeline
+
+def load_vader():
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+    return SentimentIntensityAnalyzer()
+
+
+def load_finbert():
     model_name = os.getenv("FIN_SENTIMENT_MODEL", "")  # e.g., "ProsusAI/finbert"
     if not model_name:
         return None
-    try:
-        from transformers import pipeline  # type: ignore
+    from transformers import pipeline  # type: ignore
+
+    return pipeline("text-classification", model=model_name, tokenizer=model_name, truncation=True)
 
-        _finbert_pipeline = pipeline(
-            "text-classification", model=model_name, tokenizer=model_name, truncation=True
-        )
+
+def _get_finbert():
+    if _finbert_pipeline is not None:
         return _finbert_pipeline
-    except Exception:
-        return None
+    return get_model_registry().get("sentiment")
 
 
 def _analyze_vader(text: str) -> Dict:
     if not text:
         return {"compound": 0.0, "neg": 0.0, "neu": 1.0, "pos": 0.0, "label": "neutral"}
-    scores = _vader.polarity_scores(text)
+    vader = get_model_registry().get("vader")
+    if vader is None:
+        raise RuntimeError("VADER sentiment analyzer unavailable")
+    scores = vader.polarity_scores(text)
     comp = scores.get("compound", 0.0)
     if comp >= 0.05:
         label = "positive"
@@ -41,22 +48,27 @@ def _analyze_vader(text: str) -> Dict:
     return scores
 
 
+def _finbert_result(res) -> Dict | None:
+    # transformers pipeline returns list of dicts with label/score
+    if isinstance(res, dict):
+        res = [res]
+    if isinstance(res, list) and res:
+        # Choose max score label
+        best = max(res, key=lambda x: x.get("score", 0.0))
+        label = best.get("label", "neutral").lower()
+        # Map to pos/neu/neg; FinBERT labels often: "positive", "neutral", "negative"
+        return {"compound": best.get("score", 0.0), "neg": 0.0, "neu": 0.0, "pos": 0.0, "label": label}
+    return None
+
+
 def _analyze_finbert(text: str) -> Dict | None:
     clf = _get_finbert()
     if clf is None:
         return None
     try:
-        res = clf(text, top_k=None)
-        # transformers pipeline returns list of dicts with label/score
-        if isinstance(res, list) and res:
-            # Choose max score label
-            best = max(res, key=lambda x: x.get("score", 0.0))
-            label = best.get("label", "neutral").lower()
-            # Map to pos/neu/neg; FinBERT labels often: "positive", "neutral", "negative"
-            return {"compound": best.get("score", 0.0), "neg": 0.0, "neu": 0.0, "pos": 0.0, "label": label}
+        return _finbert_result(clf(text, top_k=None))
     except Exception:
         return None
-    return None
 
 
 def analyze_sentiment(text: str) -> Dict:
@@ -66,3 +78,18 @@ def analyze_sentiment(text: str) -> Dict:
         if fb is not None:
             return fb
     return _analyze_vader(text)
+
+
+def analyze_sentiment_many(texts: List[str], batch_size: int = NLP_BATCH_SIZE) -> List[Dict]:
+    """`analyze_sentiment` for many texts; FinBERT runs on length-sorted batches."""
+    out: List[Optional[Dict]] = [None] * len(texts)
+    clf = _get_finbert()
+    if clf is not None:
+        for batch in length_batches(texts, batch_size):
+            try:
+                results = clf([texts[i] for i in batch], top_k=None, batch_size=len(batch))
+            except Exception:
+                continue  # this batch falls back to VADER
+            for i, res in zip(batch, results):
+                out[i] = _finbert_result(res)
+    return [o if o is not None else _analyze_vader(t) for o, t in zip(out, texts)]
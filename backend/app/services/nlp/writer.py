@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import time
+from sqlalchemy import insert
+
+from ...db.models.nlp_annotation import NLPAnnotation
+
+
+WRITE_BATCH = int(os.getenv("NLP_WRITE_BATCH", "500"))  # rows per bulk insert
+WRITE_FLUSH_MS = int(os.getenv("NLP_WRITE_FLUSH_MS", "1000"))  # oldest buffered row waits at most this long
+
+COLUMNS = ("document_id", "entities", "sentiment", "events")
+
+log = logging.getLogger(__name__)
+
+
+class AnnotationWriter:
+    """Buffers NLPAnnotation rows and writes them in one transaction per batch.
+
+    A batch is flushed once it holds `batch_rows` rows or its oldest row is
+    `flush_ms` old (checked on `add` and by `flush_if_due`, which callers
+    run while waiting for more rows; `close` flushes the rest). Batches go
+    through COPY on PostgreSQL (psycopg) and a multi-row INSERT elsewhere; if
+    one fails it is rolled back and retried row by row, and rows that still
+    fail are logged and skipped: their document ids are kept in
+    `failed_ids` so callers do not move a cursor past them (they stay
+    pending for the next run).
+    """
+
+    def __init__(self, db, batch_rows: int = WRITE_BATCH, flush_ms: int = WRITE_FLUSH_MS, clock=time.monotonic):
+        self.db = db
+        self.batch_rows = max(1, batch_rows)
+        self.flush_ms = flush_ms
+        self.clock = clock
+        self.written = 0
+        self.failed = 0
+        self.failed_ids: List[int] = []
+        self.flushes = 0
+        self._rows: List[Dict] = []
+        self._since: Optional[float] = None
+
+    def __enter__(self) -> "AnnotationWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add(self, document_id: int, ann: Dict) -> None:
+        if not self._rows:
+            self._since = self.clock()
+        self._rows.append({
+            "document_id": document_id,
+            "entities": ann["entities"],
+            "sentiment": ann["sentiment"],
+            "events": ann["events"],
+        })
+        if len(self._rows) >= self.batch_rows:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self) -> int:
+        """Flush if the oldest buffered row has waited `flush_ms`; returns how many were persisted."""
+        if self._rows and (self.clock() - self._since) * 1000 >= self.flush_ms:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        """Write the buffered rows; returns how many were persisted."""
+        rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        self.flushes += 1
+        try:
+            if self._use_copy():
+                self._copy(rows)
+            else:
+                self.db.execute(insert(NLPAnnotation), rows)
+            self.db.commit()
+            self.written += len(rows)
+            return len(rows)
+        except Exception:
+            self.db.rollback()
+            log.warning("bulk insert of %d annotations failed, retrying row by row", len(rows), exc_info=True)
+        done = 0
+        for row in rows:
+            try:
+                self.db.execute(insert(NLPAnnotation), [row])
+                self.db.commit()
+                done += 1
+            except Exception:
+                self.db.rollback()
+                self.failed += 1
+                self.failed_ids.append(row["document_id"])
+                log.exception("annotation for document %s not saved", row["document_id"])
+        self.written += done
+        return done
+
+    def close(self) -> None:
+        self.flush()
+
+    def _use_copy(self) -> bool:
+        dialect = self.db.get_bind().dialect
+        return dialect.name == "postgresql" and dialect.driver == "psycopg"
+
+    def _copy(self, rows: List[Dict]) -> None:
+        cols = ", ".join(COLUMNS)
+        raw = self.db.connection().connection  # same transaction as the session
+        with raw.cursor() as cur:
+            with cur.copy(f"COPY {NLPAnnotation.__tablename__} ({cols}) FROM STDIN") as copy:
+                for r in rows:
+                    copy.write_row([r["document_id"]] + [json.dumps(r[c]) for c in COLUMNS[1:]])
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import os
+import random
+import threading
+import time
+import httpx
+import numpy as np
+
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+BATCH_MAX_ITEMS = int(os.getenv("RAG_EMBED_BATCH_ITEMS", "256"))
+BATCH_MAX_TOKENS = int(os.getenv("RAG_EMBED_BATCH_TOKENS", "100000"))
+CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("RAG_EMBED_MAX_RETRIES", "5"))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English BPE vocabularies
+    return max(1, len(text) // 4)
+
+
+def plan_batches(texts: List[str], max_items: int = BATCH_MAX_ITEMS, max_tokens: int = BATCH_MAX_TOKENS) -> List[List[int]]:
+    """Group text indices into requests bounded by item count and estimated tokens."""
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0
+    for i, t in enumerate(texts):
+        n = estimate_tokens(t)
+        if cur and (len(cur) >= max_items or cur_tokens + n > max_tokens):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+class EmbeddingClient:
+    """Long-lived OpenAI-compatible embeddings client.
+
+    One pooled keep-alive `httpx.Client` is shared by up to `concurrency`
+    worker threads; each request is retried on 429/5xx and transport errors
+    with exponential backoff (honouring `Retry-After`).
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = OPENAI_BASE_URL,
+        concurrency: int = CONCURRENCY,
+        max_items: int = BATCH_MAX_ITEMS,
+        max_tokens: int = BATCH_MAX_TOKENS,
+        max_retries: int = MAX_RETRIES,
+        backoff: float = 0.5,
+        timeout: float = 60.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._http = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+
+    def close(self) -> None:
+        self._http.close()
+
+    def _post(self, texts: List[str], model: str) -> np.ndarray:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        payload = {"model": model, "input": texts}
+        for attempt in range(self.max_retries + 1):
+            try:
+                r = self._http.post(f"{self.base_url}/embeddings", json=payload, headers=headers)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._delay(attempt, None))
+                continue
+            if r.status_code in RETRY_STATUS and attempt < self.max_retries:
+                time.sleep(self._delay(attempt, r.headers.get("retry-after")))
+                continue
+            r.raise_for_status()
+            data = sorted(r.json().get("data", []), key=lambda item: item.get("index", 0))
+            return np.asarray([item["embedding"] for item in data], dtype=np.float32)
+        raise RuntimeError("unreachable")
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def embed(self, texts: List[str], model: str) -> np.ndarray:
+        """Embed `texts` in budgeted batches, `concurrency` requests at a time, keeping order."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = plan_batches(texts, self.max_items, self.max_tokens)
+        if len(batches) == 1 or self.concurrency == 1:
+            parts = [self._post([texts[i] for i in b], model) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                parts = list(pool.map(lambda b: self._post([texts[i] for i in b], model), batches))
+        return np.vstack(parts)
+
+
+_client: Optional[EmbeddingClient] = None
+_client_lock = threading.Lock()
+
+
+def get_embedding_client() -> EmbeddingClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("OPENAI_API_KEY not set for embeddings")
+            _client = EmbeddingClient(api_key=api_key)
+        return _client
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+import logging
+import os
+import threading
+import numpy as np
+from sqlalchemy import select, update
+
+from ...db.models.document import Document
+from ...db.models.embedding import Embedding
+from .segments import SegmentStore, get_segment_store
+
+
+COMPACT_INTERVAL_SEC = int(os.getenv("RAG_COMPACT_INTERVAL_SEC", "3600"))  # 0 disables the background thread
+UPDATE_BATCH = 5000
+
+log = logging.getLogger(__name__)
+
+
+def live_embedding_ids(db, model: str) -> np.ndarray:
+    """Sorted ids of `model` embeddings whose document still exists."""
+    ids = db.scalars(
+        select(Embedding.id)
+        .join(Document, Document.id == Embedding.document_id)
+        .where(Embedding.model == model)
+        .order_by(Embedding.id.asc())
+    ).all()
+    return np.asarray(ids, dtype=np.int64)
+
+
+def compact_model(db, model: str, segments: Optional[SegmentStore] = None) -> Dict:
+    """Compact `model`'s segments, dropping rows of deleted embeddings/documents.
+
+    Live ids are read under the store lock, so no row appended (and
+    committed, see `index_documents`) in between can be mistaken for dead.
+    Rewritten rows get their new (segment, offset) recorded on `Embedding`.
+    """
+    segments = segments or get_segment_store(model)
+    seen: List[np.ndarray] = []
+
+    def live() -> np.ndarray:
+        seen.append(live_embedding_ids(db, model))
+        return seen[-1]
+
+    stats = segments.compact(live=live)
+    moves = stats.pop("moves")
+    if not moves:
+        return stats
+    # rows kept because their id is above the snapshot have no Embedding to update
+    known = np.isin(np.asarray([m[0] for m in moves], dtype=np.int64), seen[-1])
+    moves = [m for m, ok in zip(moves, known) if ok]
+    for i in range(0, len(moves), UPDATE_BATCH):
+        db.execute(
+            update(Embedding),
+            [{"id": rid, "segment": seg, "offset": off} for rid, seg, off in moves[i : i + UPDATE_BATCH]],
+        )
+        db.commit()
+    return stats
+
+
+def compact_all(db) -> Dict[str, Dict]:
+    models: List[str] = db.scalars(
+        select(Embedding.model).where(Embedding.segment.isnot(None)).distinct()
+    ).all()
+    return {m: compact_model(db, m) for m in models}
+
+
+class Compactor:
+    """Daemon thread running `compact_all` every `interval` seconds."""
+
+    def __init__(self, session_factory, interval: int = COMPACT_INTERVAL_SEC):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rag-compactor", daemon=True)
+
+    def start(self) -> "Compactor":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            db = self.session_factory()
+            try:
+                for model, stats in compact_all(db).items():
+                    if stats["segments_in"]:
+                        log.info("compacted %s: %s", model, stats)
+            except Exception:
+                log.exception("segment compaction failed")
+            finally:
+                db.close()
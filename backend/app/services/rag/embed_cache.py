@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+import hashlib
+import os
+import threading
+import unicodedata
+import numpy as np
+from prometheus_client import Counter
+
+from ...core.sqlite_lru import SQLiteLRU
+from .chunk import clean_text
+
+
+CACHE_PATH = os.getenv("RAG_EMBED_CACHE_PATH", "./data/embed_cache.sqlite")
+CACHE_MAX_ENTRIES = int(os.getenv("RAG_EMBED_CACHE_MAX_ENTRIES", "1000000"))
+
+CACHE_HITS = Counter("rag_embedding_cache_hits_total", "Chunks served from the embedding cache", ["model"])
+CACHE_MISSES = Counter("rag_embedding_cache_misses_total", "Chunks that had to be embedded", ["model"])
+CACHE_EVICTIONS = Counter("rag_embedding_cache_evictions_total", "Entries evicted from the embedding cache")
+
+
+def text_hash(text: str) -> str:
+    """Hash of the chunk after Unicode and whitespace normalization."""
+    norm = clean_text(unicodedata.normalize("NFC", text or ""))
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent (model, chunk hash) -> vector cache with LRU eviction (`SQLiteLRU`)."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.lru = SQLiteLRU(path, "embed_cache", max_entries, on_evict=CACHE_EVICTIONS.inc)
+
+    @staticmethod
+    def _key(model: str, h: str) -> str:
+        return f"{model}\x00{h}"
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = self.lru.get_many(self._key(model, h) for h in hashes)
+        prefix = len(model) + 1
+        return {k[prefix:]: np.frombuffer(v, dtype=np.float32) for k, v in found.items()}
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        self.lru.put_many({self._key(model, h): np.asarray(v, dtype=np.float32).tobytes() for h, v in items.items()})
+
+    def __len__(self) -> int:
+        return len(self.lru)
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
@@ -1,31 +1,57 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 import os
 import numpy as np
-import httpx
 
+from .batcher import get_embedding_client
+from .embed_cache import CACHE_HITS, CACHE_MISSES, get_embedding_cache, text_hash
+from .local_embed import get_local_embedder
 
-def embed_texts(texts: List[str], model_name: str = "text-embedding-3-small") -> np.ndarray:
-    """Return numpy array of shape (n, d) using OpenAI Embeddings API.
-    Requires OPENAI_API_KEY. model_name defaults to text-embedding-3-small.
+# Shared by /rag/index and /chat so questions are embedded like the index.
+DEFAULT_EMBED_MODEL = os.getenv("RAG_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+
+def embed_texts(texts: List[str], model_name: str = DEFAULT_EMBED_MODEL, use_cache: bool = True) -> np.ndarray:
+    """Return numpy array of shape (n, d) for `texts`.
+
+    Local model names ("sentence-transformers/...", "local/...", "hashing-<dim>")
+    run in-process; other names go to the OpenAI-compatible provider. Chunks
+    already embedded under `model_name` are served from the persistent
+    content-hash cache; only the misses (deduplicated) are computed.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set for embeddings")
-    # OpenAI embeddings endpoint
-    url = "https://api.openai.com/v1/embeddings"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {"model": model_name, "input": texts}
-    with httpx.Client(timeout=60) as client:
-        r = client.post(url, json=payload, headers=headers)
-        r.raise_for_status()
-        data = r.json()
-        vecs = [np.array(item["embedding"], dtype=np.float32) for item in data.get("data", [])]
-    # stack
-    if not vecs:
-        return np.zeros((0, 0), dtype=np.float32)
-    return np.vstack(vecs)
+    local = get_local_embedder(model_name)
+    if local is not None and not local.cacheable:
+        return local.embed(texts)
+    if not use_cache or not texts:
+        return _embed(texts, model_name)
+    cache = get_embedding_cache()
+    hashes = [text_hash(t) for t in texts]
+    found = cache.get_many(model_name, hashes)
+    missing: Dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        if h not in found:
+            missing.setdefault(h, t)
+    CACHE_HITS.labels(model=model_name).inc(sum(1 for h in hashes if h in found))
+    CACHE_MISSES.labels(model=model_name).inc(len(missing))
+    if missing:
+        vecs = _embed(list(missing.values()), model_name)
+        fresh = dict(zip(missing.keys(), vecs))
+        cache.put_many(model_name, fresh)
+        found.update(fresh)
+    return np.vstack([found[h] for h in hashes])
+
+
+def _embed(texts: List[str], model_name: str) -> np.ndarray:
+    local = get_local_embedder(model_name)
+    if local is not None:
+        return local.embed(texts)
+    return _embed_openai(texts, model_name)
+
+
+def _embed_openai(texts: List[str], model_name: str) -> np.ndarray:
+    """Embed via the OpenAI Embeddings API (batched, pooled). Requires OPENAI_API_KEY."""
+    return get_embedding_client().embed(texts, model_name)
 
 
 def to_bytes(vec: np.ndarray) -> bytes:
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Sequence, Tuple
+import os
+from sqlalchemy import delete, insert, select, update
+
+from ...db.models.document import Document, document_text
+from ...db.models.embedding import Embedding
+from ...db.models.rag_state import RagIndexState
+from .chunk import simple_chunks
+from .embed_cache import text_hash
+from .embeddings import embed_texts
+from .metadata import epoch_day
+from .segments import SegmentStore
+
+
+DOC_BATCH = int(os.getenv("RAG_INDEX_DOC_BATCH", "500"))
+PAGE_SIZE = int(os.getenv("RAG_INDEX_PAGE_SIZE", "1000"))
+
+
+def index_documents(db, docs: Sequence[Document], model: str, segments: SegmentStore, replace: bool = False) -> int:
+    """Chunk, embed and persist `docs`; returns the number of Embedding rows created.
+
+    Chunks from up to `DOC_BATCH` documents go through a single `embed_texts`
+    call (which packs them into budgeted, concurrent provider requests), and
+    the resulting rows are bulk-inserted and committed once per group.
+
+    With `replace`, the documents' existing `model` rows are deleted in the
+    same transaction as the new rows are inserted, only once embedding has
+    succeeded: a failed re-embed leaves the old rows (and the document still
+    detected as changed) in place.
+    """
+    # Read everything up front: committing a group expires the ORM instances.
+    items = [(d.id, document_text(d), epoch_day(d.published_at)) for d in docs]
+    created = 0
+    for i in range(0, len(items), DOC_BATCH):
+        chunks: List[str] = []
+        owners: List[int] = []
+        hashes: List[str] = []
+        days: List[int] = []
+        for doc_id, text, day in items[i : i + DOC_BATCH]:
+            h = text_hash(text)
+            for c in simple_chunks(text):
+                chunks.append(c)
+                owners.append(doc_id)
+                hashes.append(h)
+                days.append(day)
+        old_ids: List[int] = []
+        if replace:
+            group = [doc_id for doc_id, _, _ in items[i : i + DOC_BATCH]]
+            old = (Embedding.model == model) & Embedding.document_id.in_(group)
+        if not chunks:
+            if replace:
+                old_ids = db.scalars(select(Embedding.id).where(old)).all()
+                db.execute(delete(Embedding).where(Embedding.id.in_(old_ids)))
+                db.commit()
+                segments.tombstone(old_ids)
+            continue
+        vecs = embed_texts(chunks, model_name=model)
+        if replace:
+            old_ids = db.scalars(select(Embedding.id).where(old)).all()
+        ids = db.scalars(
+            insert(Embedding).returning(Embedding.id, sort_by_parameter_order=True),
+            [
+                {"document_id": o, "model": model, "content": c, "content_hash": h}
+                for o, c, h in zip(owners, chunks, hashes)
+            ],
+        ).all()
+
+        def commit(offsets: List[Tuple[str, int]]) -> None:
+            # under the segment lock: compaction never sees these rows uncommitted
+            db.execute(
+                update(Embedding),
+                [{"id": rid, "segment": seg, "offset": off} for rid, (seg, off) in zip(ids, offsets)],
+            )
+            if old_ids:
+                db.execute(delete(Embedding).where(Embedding.id.in_(old_ids)))
+            db.commit()
+
+        segments.append(list(ids), owners, vecs, days, on_written=commit)
+        # replaced rows stay in the segments (and loaded indexes) until compaction
+        segments.tombstone(old_ids)
+        created += len(ids)
+    return created
+
+
+def not_indexed(model: str):
+    return ~(
+        select(Embedding.id)
+        .where(Embedding.document_id == Document.id, Embedding.model == model)
+        .exists()
+    )
+
+
+def pending_documents(db, model: str, after_id: int = 0, limit: int = PAGE_SIZE) -> List[Document]:
+    """Keyset page of documents with no embeddings for `model` (NOT EXISTS anti-join)."""
+    return db.execute(
+        select(Document)
+        .where(Document.id > after_id, not_indexed(model))
+        .order_by(Document.id.asc())
+        .limit(limit)
+    ).scalars().all()
+
+
+def hash_documents(db, batch_size: int = PAGE_SIZE) -> int:
+    """Fill `Document.content_hash` for rows written before it existed; returns how many.
+
+    ORM writes keep the hash current, so each row is hashed here at most once.
+    """
+    done = 0
+    while True:
+        docs = db.scalars(
+            select(Document).where(Document.content_hash.is_(None)).order_by(Document.id.asc()).limit(batch_size)
+        ).all()
+        if not docs:
+            return done
+        for d in docs:
+            d.content_hash = text_hash(document_text(d))
+        db.commit()
+        done += len(docs)
+
+
+def changed_documents(db, model: str, after_id: int = 0, limit: int = PAGE_SIZE) -> List[Document]:
+    """Keyset page of indexed documents whose stored text hash differs from the embedded one.
+
+    The comparison runs in SQL on `Document.content_hash`, so unchanged
+    documents are never loaded. Rows embedded before hashes were recorded
+    are left alone.
+    """
+    stale = (
+        select(Embedding.id)
+        .where(
+            Embedding.document_id == Document.id,
+            Embedding.model == model,
+            Embedding.content_hash.isnot(None),
+            Embedding.content_hash != Document.content_hash,
+        )
+        .exists()
+    )
+    return db.scalars(
+        select(Document).where(Document.id > after_id, stale).order_by(Document.id.asc()).limit(limit)
+    ).all()
+
+
+def get_watermark(db, model: str) -> int:
+    state = db.get(RagIndexState, model)
+    return state.last_document_id if state else 0
+
+
+def set_watermark(db, model: str, last_document_id: int) -> None:
+    state = db.get(RagIndexState, model)
+    if state is None:
+        state = RagIndexState(model=model, last_document_id=0)
+        db.add(state)
+    state.last_document_id = max(state.last_document_id or 0, last_document_id)
+    state.updated_at = datetime.utcnow()
+    db.commit()
+
+
+def run_incremental(
+    db,
+    model: str,
+    segments: SegmentStore,
+    limit: int,
+    use_watermark: bool = True,
+    reembed_changed: bool = False,
+    page_size: int = PAGE_SIZE,
+) -> Dict:
+    """Index up to `limit` documents that have no embeddings for `model` yet.
+
+    Pages through pending documents by id above the persisted watermark, so a
+    scheduled run never rescans history, then advances the watermark to the
+    last document visited. With `reembed_changed`, up to another `limit`
+    indexed documents whose text hash changed get their embeddings replaced.
+    """
+    start = get_watermark(db, model) if use_watermark else 0
+    cursor = start
+    processed = created = 0
+    while processed < limit:
+        docs = pending_documents(db, model, cursor, min(page_size, limit - processed))
+        if not docs:
+            break
+        cursor = docs[-1].id
+        processed += len(docs)
+        created += index_documents(db, docs, model, segments)
+    if use_watermark and cursor > start:
+        set_watermark(db, model, cursor)
+
+    reembedded = 0
+    if reembed_changed:
+        hash_documents(db, page_size)
+        after = 0
+        while reembedded < limit:
+            docs = changed_documents(db, model, after, min(page_size, limit - reembedded))
+            if not docs:
+                break
+            after = docs[-1].id
+            processed += len(docs)
+            reembedded += len(docs)
+            created += index_documents(db, docs, model, segments, replace=True)
+    return {"processed": processed, "created": created, "reembedded": reembedded, "cursor": cursor}
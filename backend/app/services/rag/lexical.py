@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+import re
+import threading
+import numpy as np
+
+
+# Keeps tickers, ISINs, "S&P", "10-K", "3.5%" style tokens in one piece.
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9&.%\-]*[a-z0-9%]|[a-z0-9]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Incremental in-process inverted index with BM25 scoring.
+
+    Documents (here: embedding chunks, keyed by `Embedding.id`) get a dense
+    ordinal; each term's postings are two typed arrays (ordinals, term
+    frequencies) that grow in place and are scored with NumPy views.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids = array("q")  # ordinal -> embedding id
+        self._lens = array("i")  # ordinal -> token count
+        self._total_len = 0
+        self._post_docs: Dict[str, array] = {}
+        self._post_tf: Dict[str, array] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, row_ids: Sequence[int], texts: Sequence[str]) -> None:
+        with self._lock:
+            for rid, text in zip(row_ids, texts):
+                toks = tokenize(text)
+                ordinal = len(self._ids)
+                self._ids.append(int(rid))
+                self._lens.append(len(toks))
+                self._total_len += len(toks)
+                for term, tf in Counter(toks).items():
+                    docs = self._post_docs.get(term)
+                    if docs is None:
+                        docs = self._post_docs[term] = array("q")
+                        self._post_tf[term] = array("i")
+                    docs.append(ordinal)
+                    self._post_tf[term].append(tf)
+
+    def search(
+        self, query: str, top_k: int, allowed_ids: Optional[np.ndarray] = None, excluded_ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, int]]:
+        """Return [(bm25 score, embedding id)] best first.
+
+        `allowed_ids` (sorted) restricts results, e.g. to a metadata slice;
+        `excluded_ids` (sorted) are dropped, e.g. deleted embeddings.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            n = len(self._ids)
+            if not n or not terms or top_k <= 0:
+                return []
+            lens = np.frombuffer(self._lens, dtype=np.int32)
+            avgdl = self._total_len / n or 1.0
+            parts_doc, parts_score = [], []
+            for term in terms:
+                docs_arr = self._post_docs.get(term)
+                if docs_arr is None:
+                    continue
+                docs = np.frombuffer(docs_arr, dtype=np.int64)
+                tf = np.frombuffer(self._post_tf[term], dtype=np.int32).astype(np.float32)
+                df = docs.size
+                idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * lens[docs] / avgdl)
+                parts_doc.append(docs.copy())
+                parts_score.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+            ids = np.frombuffer(self._ids, dtype=np.int64)
+            if not parts_doc:
+                return []
+            uniq, inv = np.unique(np.concatenate(parts_doc), return_inverse=True)
+            scores = np.bincount(inv, weights=np.concatenate(parts_score))
+            cand_ids = ids[uniq]
+            del lens, docs, ids
+        if allowed_ids is not None:
+            keep = np.isin(cand_ids, allowed_ids, assume_unique=True)
+            cand_ids, scores = cand_ids[keep], scores[keep]
+        if excluded_ids is not None and excluded_ids.size:
+            keep = ~np.isin(cand_ids, excluded_ids, assume_unique=True)
+            cand_ids, scores = cand_ids[keep], scores[keep]
+        k = min(top_k, scores.size)
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if k < scores.size else np.arange(scores.size)
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(cand_ids[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[float, int]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, rid in enumerate(ranking, start=1):
+            fused[rid] = fused.get(rid, 0.0) + 1.0 / (k + rank)
+    return sorted(((s, rid) for rid, s in fused.items()), key=lambda x: -x[0])
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import math
+import os
+import re
+import threading
+import numpy as np
+
+from .lexical import tokenize
+
+
+LOCAL_BATCH = int(os.getenv("RAG_LOCAL_EMBED_BATCH", "64"))
+LOCAL_WORKERS = int(os.getenv("RAG_LOCAL_EMBED_WORKERS", "2"))
+ST_DEVICE = os.getenv("RAG_LOCAL_EMBED_DEVICE", "cpu")
+
+# "hashing" / "hashing-512" / "local/hashing-512": dependency-free embedder.
+HASHING_RE = re.compile(r"^(?:local/)?hashing(?:-(\d+))?$")
+HASHING_DIM = 384
+# Everything else under these prefixes is loaded with sentence-transformers.
+ST_PREFIXES = ("sentence-transformers/", "local/")
+
+
+class LocalEmbedder:
+    """In-process embedder: splits input into `batch_size` batches run on a thread pool.
+
+    Subclasses implement `_encode(batch)`; `cacheable` says whether results
+    are worth storing in the persistent embedding cache.
+    """
+
+    cacheable = True
+
+    def __init__(self, batch_size: int = LOCAL_BATCH, workers: int = LOCAL_WORKERS):
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _encode(self, batch: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed")
+            return self._pool
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.workers == 1:
+            parts = [self._encode(b) for b in batches]
+        else:
+            parts = list(self._executor().map(self._encode, batches))
+        return np.vstack(parts).astype(np.float32, copy=False)
+
+
+@lru_cache(maxsize=200_000)
+def _feature(token: str, dim: int) -> Tuple[int, float]:
+    # blake2b rather than hash(): stable across processes and PYTHONHASHSEED
+    h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, 1.0 if (h >> 63) & 1 else -1.0
+
+
+class HashingEmbedder(LocalEmbedder):
+    """Signed feature hashing of unigrams and bigrams (a sparse random projection).
+
+    Needs no model download or network, so it serves air-gapped setups and
+    tests. Texts sharing vocabulary get high cosine similarity; there is no
+    semantic generalisation beyond that.
+    """
+
+    cacheable = False  # recomputing is cheaper than a cache round trip
+
+    def __init__(self, dim: int = HASHING_DIM, **kw):
+        if dim < 1:
+            raise ValueError(f"Hashing embedder dim must be >= 1, got {dim}")
+        super().__init__(**kw)
+        self.dim = dim
+
+    def _encode(self, batch: List[str]) -> np.ndarray:
+        rows: List[int] = []
+        cols: List[int] = []
+        vals: List[float] = []
+        for i, text in enumerate(batch):
+            toks = tokenize(text)
+            counts: Dict[str, int] = {}
+            for t in toks + [a + " " + b for a, b in zip(toks, toks[1:])]:
+                counts[t] = counts.get(t, 0) + 1
+            for t, c in counts.items():
+                col, sign = _feature(t, self.dim)
+                rows.append(i)
+                cols.append(col)
+                vals.append(sign * (1.0 + math.log(c)))
+        out = np.zeros((len(batch), self.dim), dtype=np.float32)
+        np.add.at(out, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), vals)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class SentenceTransformerEmbedder(LocalEmbedder):
+    """sentence-transformers model loaded once and run on CPU (or `RAG_LOCAL_EMBED_DEVICE`)."""
+
+    def __init__(self, model_name: str, device: str = ST_DEVICE, **kw):
+        super().__init__(**kw)
+        try:
+            from sentence_transformers import SentenceTransformer  # type: ignore
+        except ImportError as e:
+            raise RuntimeError(f"sentence-transformers is required for local model {model_name}") from e
+        name = model_name[len("local/"):] if model_name.startswith("local/") else model_name
+        self._model = SentenceTransformer(name, device=device)
+
+    def _encode(self, batch: List[str]) -> np.ndarray:
+        return self._model.encode(batch, batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False)
+
+
+def is_local_model(model_name: str) -> bool:
+    return bool(HASHING_RE.match(model_name)) or model_name.startswith(ST_PREFIXES)
+
+
+def check_model_name(model_name: str) -> None:
+    """Raise ValueError for a local model name no embedder can serve (e.g. "hashing-0").
+
+    Cheap enough for request validation: nothing is loaded.
+    """
+    m = HASHING_RE.match(model_name)
+    if m and m.group(1) is not None and int(m.group(1)) < 1:
+        raise ValueError(f"Invalid embedding model {model_name!r}: hashing dim must be >= 1")
+
+
+_embedders: Dict[str, LocalEmbedder] = {}
+_model_locks: Dict[str, threading.Lock] = {}
+_embedders_lock = threading.Lock()  # guards the two dicts only, never held while loading
+
+
+def get_local_embedder(model_name: str) -> Optional[LocalEmbedder]:
+    """Shared embedder for a local model name, or None for provider (HTTP) models.
+
+    A model is loaded under its own lock, so a slow sentence-transformers
+    load (or download) does not block callers of other models.
+    """
+    if not is_local_model(model_name):
+        return None
+    with _embedders_lock:
+        emb = _embedders.get(model_name)
+        if emb is not None:
+            return emb
+        lock = _model_locks.setdefault(model_name, threading.Lock())
+    with lock:
+        emb = _embedders.get(model_name)
+        if emb is None:
+            m = HASHING_RE.match(model_name)
+            if m:
+                emb = HashingEmbedder(int(m.group(1) or HASHING_DIM))
+            else:
+                emb = SentenceTransformerEmbedder(model_name)
+            with _embedders_lock:
+                _embedders[model_name] = emb
+        return emb
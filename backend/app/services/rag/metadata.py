@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+import threading
+import numpy as np
+
+
+NO_DAY = -1  # rows whose document has no published_at
+_EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_day(ts: Optional[datetime]) -> int:
+    """Days since 1970-01-01 (UTC; naive timestamps are taken as UTC)."""
+    if ts is None:
+        return NO_DAY
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return (ts - _EPOCH).days
+
+
+class MetadataIndex:
+    """Compact per-row metadata used to restrict the candidate set before scoring.
+
+    Rows are identified by an int64 position chosen by the caller. Per row we
+    keep the embedding id, the document id and the published day; per ticker
+    a postings list of document ids. Lookups are sorted-array operations (searchsorted,
+    intersect) on column arrays that are rebuilt lazily after appends, so a
+    narrow filter costs time proportional to the slice, not the corpus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []  # (positions, doc_ids, days, row_ids) appended since last build
+        self._pos = np.zeros(0, dtype=np.int64)
+        self._rid = np.zeros(0, dtype=np.int64)
+        self._doc = np.zeros(0, dtype=np.int64)
+        self._day = np.zeros(0, dtype=np.int32)
+        self._by_day: Optional[np.ndarray] = None  # row order sorted by day
+        self._by_doc: Optional[np.ndarray] = None  # row order sorted by doc id
+        self._by_rid: Optional[np.ndarray] = None  # row order sorted by embedding id
+        self._rid_sorted = np.zeros(0, dtype=np.int64)
+        self._day_sorted = np.zeros(0, dtype=np.int32)
+        self._doc_sorted = np.zeros(0, dtype=np.int64)
+        self._ticker_docs: Dict[str, List[int]] = {}
+        self._ticker_arrays: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._pos.size + sum(p[0].size for p in self._pending)
+
+    def add_rows(self, positions: np.ndarray, doc_ids: np.ndarray, days: np.ndarray, row_ids: np.ndarray) -> None:
+        if len(positions) == 0:
+            return
+        with self._lock:
+            self._pending.append((
+                np.asarray(positions, dtype=np.int64),
+                np.asarray(doc_ids, dtype=np.int64),
+                np.asarray(days, dtype=np.int32),
+                np.asarray(row_ids, dtype=np.int64),
+            ))
+
+    def add_doc_tickers(self, doc_id: int, tickers: Iterable[str]) -> None:
+        with self._lock:
+            for t in set(tickers or []):
+                self._ticker_docs.setdefault(t.upper(), []).append(int(doc_id))
+                self._ticker_arrays.pop(t.upper(), None)
+
+    def adopt_tickers(self, other: "MetadataIndex") -> None:
+        """Take over `other`'s ticker postings (they are keyed by document, not by row)."""
+        with other._lock:
+            docs = {t: list(d) for t, d in other._ticker_docs.items()}
+        with self._lock:
+            self._ticker_docs = docs
+            self._ticker_arrays = {}
+
+    def _build(self) -> None:
+        if self._pending:
+            self._pos = np.concatenate([self._pos] + [p[0] for p in self._pending])
+            self._doc = np.concatenate([self._doc] + [p[1] for p in self._pending])
+            self._day = np.concatenate([self._day] + [p[2] for p in self._pending])
+            self._rid = np.concatenate([self._rid] + [p[3] for p in self._pending])
+            self._pending = []
+            self._by_day = self._by_doc = self._by_rid = None
+        if self._by_day is None:
+            self._by_day = np.argsort(self._day, kind="stable")
+            self._day_sorted = self._day[self._by_day]
+        if self._by_doc is None:
+            self._by_doc = np.argsort(self._doc, kind="stable")
+            self._doc_sorted = self._doc[self._by_doc]
+        if self._by_rid is None:
+            self._by_rid = np.argsort(self._rid, kind="stable")
+            self._rid_sorted = self._rid[self._by_rid]
+
+    def _ticker_array(self, ticker: str) -> np.ndarray:
+        arr = self._ticker_arrays.get(ticker)
+        if arr is None:
+            arr = np.unique(np.asarray(self._ticker_docs.get(ticker, []), dtype=np.int64))
+            self._ticker_arrays[ticker] = arr
+        return arr
+
+    def candidates(self, since_day: Optional[int] = None, tickers: Optional[List[str]] = None) -> Optional[np.ndarray]:
+        """Sorted positions matching every given filter, or None when unfiltered."""
+        with self._lock:
+            rows = self._candidate_rows(since_day, tickers)
+            return None if rows is None else np.sort(self._pos[rows])
+
+    def candidate_ids(self, since_day: Optional[int] = None, tickers: Optional[List[str]] = None) -> Optional[np.ndarray]:
+        """Sorted embedding ids matching every given filter, or None when unfiltered."""
+        with self._lock:
+            rows = self._candidate_rows(since_day, tickers)
+            return None if rows is None else np.sort(self._rid[rows])
+
+    def positions_for_ids(self, row_ids: np.ndarray) -> np.ndarray:
+        """Positions of the given embedding ids, in the same order; unknown ids are dropped."""
+        ids = np.asarray(row_ids, dtype=np.int64)
+        with self._lock:
+            self._build()
+            if self._rid_sorted.size == 0:
+                return np.zeros(0, dtype=np.int64)
+            at = np.minimum(np.searchsorted(self._rid_sorted, ids), self._rid_sorted.size - 1)
+            found = self._rid_sorted[at] == ids
+            return self._pos[self._by_rid[at[found]]]
+
+    def _candidate_rows(self, since_day: Optional[int], tickers: Optional[List[str]]) -> Optional[np.ndarray]:
+        if since_day is None and not tickers:
+            return None
+        self._build()
+        rows: Optional[np.ndarray] = None
+        if since_day is not None:
+            lo = np.searchsorted(self._day_sorted, since_day, side="left")
+            rows = np.sort(self._by_day[lo:])
+        if tickers:
+            docs = np.unique(np.concatenate([self._ticker_array(t.upper()) for t in tickers]))
+            lo = np.searchsorted(self._doc_sorted, docs, side="left")
+            hi = np.searchsorted(self._doc_sorted, docs, side="right")
+            parts = [self._by_doc[a:b] for a, b in zip(lo, hi) if b > a]
+            trows = np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+            rows = trows if rows is None else np.intersect1d(rows, trows, assume_unique=True)
+        return rows
@@ -1 +1,471 @@
-# Placeholder retriever
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+import os
+import re
+import threading
+import zlib
+import numpy as np
+from sqlalchemy import select
+
+from ...db.models.document import Document
+from ...db.models.embedding import Embedding
+from ...db.models.nlp_annotation import NLPAnnotation
+from .embeddings import from_bytes
+from .lexical import BM25Index, reciprocal_rank_fusion
+from .metadata import NO_DAY, MetadataIndex, epoch_day
+from .segments import SegmentStore, get_segment_store
+from .vectorstore.base import Block, GrowableRows, Hit, VectorStore, normalize
+from .vectorstore.flat import SCORE_BUDGET, FlatStore
+from .vectorstore.ivf import IVFStore
+
+
+BACKENDS = ("flat", "ivf")
+DEFAULT_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "flat")
+DEFAULT_NLIST = int(os.getenv("RAG_IVF_NLIST", "256"))
+DEFAULT_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+# dense | lexical | hybrid (RRF of both) | two_stage (BM25 candidates, dense re-score)
+MODES = ("dense", "lexical", "hybrid", "two_stage")
+DEFAULT_MODE = os.getenv("RAG_RETRIEVAL_MODE", "dense")
+FUSION_FANOUT = int(os.getenv("RAG_FUSION_FANOUT", "5"))
+LEXICAL_CANDIDATES = int(os.getenv("RAG_LEXICAL_CANDIDATES", "200"))
+# Quantized segments: re-score the best top_k * factor candidates in float32 (0 = off)
+RERANK_FACTOR = int(os.getenv("RAG_RERANK_FACTOR", "4"))
+
+
+def create_store(backend: str, dim: int, nlist: Optional[int] = None) -> VectorStore:
+    if backend == "ivf":
+        return IVFStore(dim, nlist=nlist or DEFAULT_NLIST, nprobe=DEFAULT_NPROBE)
+    return FlatStore(dim, rerank=RERANK_FACTOR)
+
+
+LEGACY_BLOCK = "__blobs__"
+BLOCK_SHIFT = 32  # position = block index << 32 | row within block
+_SEG_SEQ = re.compile(r"^seg-(\d+)$")
+
+
+def shard_of(segment: str, count: int) -> int:
+    """Shard owning a segment: round-robin on its sequence number (names are seg-<seq>)."""
+    m = _SEG_SEQ.match(segment)
+    return (int(m.group(1)) if m else zlib.crc32(segment.encode("utf-8"))) % count
+
+
+class EmbeddingIndex:
+    """Process-resident vector store for one embedding model.
+
+    Vectors come from the model's memory-mapped segment files, which are
+    attached as they grow. Legacy rows that still carry a `vector` BLOB are
+    read from the table in `Embedding.id` order; only rows newer than the last
+    id seen are fetched, so the table is scanned in full at most once.
+
+    Every row also gets a stable position (block, row) registered in a
+    `MetadataIndex` with its published day and document tickers, so
+    filtered queries score only the matching slice. A BM25 index over the
+    chunk texts is built on the first lexical query and then kept up to
+    date by `refresh`.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        backend: str = "flat",
+        nlist: Optional[int] = None,
+        segments: Optional[SegmentStore] = None,
+        shard: Optional[Tuple[int, int]] = None,
+    ):
+        self.model = model
+        self.backend = backend
+        self.nlist = nlist
+        self.segments = segments or get_segment_store(model)
+        self.shard = shard  # (index, count): only own this slice of segments / legacy rows
+        self.store: Optional[VectorStore] = None
+        self.meta = MetadataIndex()
+        self.loaded = False
+        self._last_id = 0
+        self._last_ann_id = 0
+        self.lexical: Optional[BM25Index] = None
+        self._last_lex_id = 0
+        self._legacy: Optional[GrowableRows] = None
+        self._legacy_days: List[int] = []
+        self._block_ids: Dict[str, int] = {}
+        self._blocks: List[Block] = []
+        self._block_days: List[np.ndarray] = []
+        self._block_span: List[Tuple[int, int]] = []  # (min, max) published day per block
+        self._generation: Optional[int] = None
+        self._dead = np.zeros(0, dtype=np.int64)  # tombstoned embedding ids (sorted), skipped by every search
+        self._tombstones_seen = 0
+        self._block_dead: Dict[int, np.ndarray] = {}  # block -> sorted rows of tombstoned ids
+        self._masked = (0, 0)  # (tombstones, indexed rows) the masks were built for
+        self.stale = False  # segments were compacted; `get_index` swaps in a fresh index
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.store) if self.store is not None else 0
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.store.dim if self.store is not None else None
+
+    def _ensure_store(self, dim: int) -> bool:
+        if self.store is None:
+            self.store = create_store(self.backend, dim, self.nlist)
+        return self.store.dim == dim
+
+    def _attach(self, name: str, block: Block, days: np.ndarray, span: Optional[Tuple[int, int]] = None) -> int:
+        """(Re-)register block `name` with more rows; returns how many are new."""
+        b = self._block_ids.setdefault(name, len(self._block_ids))
+        seen = self._blocks[b].rows if b < len(self._blocks) else 0
+        n = block.rows
+        if n <= seen:
+            return 0
+        span = span or (int(np.min(days)), int(np.max(days)))
+        if b == len(self._blocks):
+            self._blocks.append(block)
+            self._block_days.append(days)
+            self._block_span.append(span)
+        else:
+            self._blocks[b] = block
+            self._block_days[b] = days
+            self._block_span[b] = span
+        self.store.attach(name, block)
+        self.meta.add_rows(
+            (b << BLOCK_SHIFT) + np.arange(seen, n, dtype=np.int64),
+            block.doc_ids[seen:n],
+            days[seen:n],
+            block.row_ids[seen:n],
+        )
+        return n - seen
+
+    def add(self, row_ids: List[int], doc_ids: List[int], vecs: List[np.ndarray], days: Optional[List[int]] = None) -> int:
+        """Append legacy vectors; rows whose dimension disagrees with the index are skipped."""
+        if row_ids:
+            self._last_id = max(self._last_id, max(row_ids))
+        if not vecs:
+            return 0
+        self._ensure_store(int(vecs[0].size))
+        keep = [i for i, v in enumerate(vecs) if v.size == self.store.dim]
+        if not keep:
+            return 0
+        if self._legacy is None:
+            self._legacy = GrowableRows(self.store.dim)
+        self._legacy.append(
+            normalize(np.vstack([vecs[i] for i in keep])),
+            np.asarray([row_ids[i] for i in keep], dtype=np.int64),
+            np.asarray([doc_ids[i] or 0 for i in keep], dtype=np.int64),
+        )
+        self._legacy_days.extend((days[i] if days else NO_DAY) for i in keep)
+        return self._attach(LEGACY_BLOCK, Block(*self._legacy.view()), np.asarray(self._legacy_days, dtype=np.int32))
+
+    def successor(self) -> "EmbeddingIndex":
+        """Empty index for the compacted segments, seeded with what compaction does not move.
+
+        Legacy BLOB rows, document tickers and the BM25 index are keyed by
+        embedding / document id, so they are carried over rather than read
+        from the database again; the next `refresh` only maps the segments.
+        """
+        fresh = EmbeddingIndex(self.model, backend=self.backend, nlist=self.nlist, segments=self.segments, shard=self.shard)
+        with self._lock:
+            if self._legacy is not None and self._legacy.size:
+                mat, row_ids, doc_ids = self._legacy.view()
+                fresh.add(row_ids.tolist(), doc_ids.tolist(), list(mat), list(self._legacy_days))
+            fresh._last_id = self._last_id
+            fresh.meta.adopt_tickers(self.meta)
+            fresh._last_ann_id = self._last_ann_id
+            fresh.lexical, fresh._last_lex_id = self.lexical, self._last_lex_id
+        return fresh
+
+    def refresh(self, db, batch_size: int = 5000) -> int:
+        """Attach new segment rows, pull newer legacy BLOB rows and new document tickers.
+
+        Once the segments have been compacted (new manifest generation) the
+        index keeps serving its current, still-mapped blocks and is marked
+        `stale`; `get_index` then builds a replacement.
+        """
+        with self._lock:
+            if self.stale:
+                return 0
+            added = self._refresh_blobs(db, batch_size)
+            try:
+                added += self._refresh_segments()
+            except FileNotFoundError:  # compacted away between manifest read and open
+                self.stale = True
+            self._refresh_tickers(db, batch_size)
+            if self.lexical is not None:
+                self._refresh_lexical(db, batch_size)
+            self.loaded = True
+        return added
+
+    def _refresh_segments(self) -> int:
+        manifest = self.segments.read_manifest()
+        generation = manifest.get("generation", 0)
+        if self._generation is not None and generation != self._generation:
+            self.stale = True
+            return 0
+        self._generation = generation
+        dead = self.segments.read_tombstones(self._tombstones_seen, manifest)
+        if dead.size:
+            self._tombstones_seen += dead.size
+            self._dead = np.union1d(self._dead, dead)
+        if manifest["dim"] is None or not self._ensure_store(int(manifest["dim"])):
+            return 0
+        known = {name: self._blocks[b].rows for name, b in self._block_ids.items()}
+        grown = [
+            s for s in manifest["segments"]
+            if s["rows"] > known.get(s["name"], 0) and (self.shard is None or shard_of(s["name"], self.shard[1]) == self.shard[0])
+        ]
+        if not grown:
+            return 0
+        spans = {s["name"]: (s["min_day"], s["max_day"]) for s in grown if "min_day" in s}
+        added = 0
+        for seg in self.segments.open_segments({**manifest, "segments": grown}):
+            added += self._attach(seg.name, seg.block(), seg.days, spans.get(seg.name))
+        return added
+
+    def _refresh_blobs(self, db, batch_size: int) -> int:
+        added = 0
+        query = (
+            select(Embedding.id, Embedding.document_id, Embedding.vector, Document.published_at)
+            .join(Document, Document.id == Embedding.document_id, isouter=True)
+            .where(Embedding.model == self.model, Embedding.vector.isnot(None))
+            .order_by(Embedding.id.asc())
+            .limit(batch_size)
+        )
+        if self.shard is not None:
+            query = query.where((Embedding.id % self.shard[1]) == self.shard[0])
+        while True:
+            rows = db.execute(query.where(Embedding.id > self._last_id)).all()
+            if not rows:
+                break
+            added += self.add(
+                [r[0] for r in rows],
+                [r[1] for r in rows],
+                [from_bytes(r[2]) for r in rows],
+                [epoch_day(r[3]) for r in rows],
+            )
+            if len(rows) < batch_size:
+                break
+        return added
+
+    def _refresh_tickers(self, db, batch_size: int) -> None:
+        while True:
+            rows = db.execute(
+                select(NLPAnnotation.id, NLPAnnotation.document_id, NLPAnnotation.entities)
+                .where(NLPAnnotation.id > self._last_ann_id)
+                .order_by(NLPAnnotation.id.asc())
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for ann_id, doc_id, entities in rows:
+                self.meta.add_doc_tickers(doc_id, (entities or {}).get("tickers", []))
+            self._last_ann_id = rows[-1][0]
+            if len(rows) < batch_size:
+                break
+
+    def enable_lexical(self, db, batch_size: int = 5000) -> None:
+        with self._lock:
+            if self.lexical is None:
+                self.lexical = BM25Index()
+                self._refresh_lexical(db, batch_size)
+
+    def _refresh_lexical(self, db, batch_size: int) -> None:
+        while True:
+            rows = db.execute(
+                select(Embedding.id, Embedding.content)
+                .where(Embedding.model == self.model, Embedding.id > self._last_lex_id)
+                .order_by(Embedding.id.asc())
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            self.lexical.add([r[0] for r in rows], [r[1] or "" for r in rows])
+            self._last_lex_id = rows[-1][0]
+            if len(rows) < batch_size:
+                break
+
+    def _dead_rows(self) -> Dict[int, np.ndarray]:
+        """Per-block rows of tombstoned ids, rebuilt when tombstones or rows were added."""
+        dead = self._dead
+        state = (dead.size, len(self.meta))
+        if state != self._masked:
+            positions = np.sort(self.meta.positions_for_ids(dead))
+            blocks = positions >> BLOCK_SHIFT
+            local = positions & ((1 << BLOCK_SHIFT) - 1)
+            bounds = np.flatnonzero(np.diff(blocks)) + 1
+            self._block_dead = {int(blocks[sel[0]]): local[sel] for sel in np.split(np.arange(positions.size), bounds) if sel.size}
+            self._masked = state
+        return self._block_dead
+
+    def search(
+        self,
+        qvec: Optional[np.ndarray],
+        top_k: int,
+        since_day: Optional[int] = None,
+        tickers: Optional[List[str]] = None,
+        mode: str = "dense",
+        query: Optional[str] = None,
+        **params,
+    ) -> List[Hit]:
+        """Return [(score, embedding_id, document_id)] best first.
+
+        With `since_day` and/or `tickers`, only rows of matching documents are
+        considered. `mode` picks dense cosine, lexical BM25 over `query`, their
+        reciprocal-rank fusion (`hybrid`), or BM25 candidates re-scored densely
+        (`two_stage`); lexical modes need `enable_lexical` first. Extra keyword
+        arguments (e.g. `nprobe`) are forwarded to the dense backend.
+
+        Rows of deleted embeddings (tombstones) still sit in the segments until
+        compaction; they are masked out of the scores before the top-k cut,
+        so they never take a slot.
+        """
+        if self.store is None or top_k <= 0:
+            return []
+        q = None if qvec is None else normalize(np.asarray(qvec, dtype=np.float32).ravel())
+        if q is not None and q.size != self.store.dim:
+            return []
+        if mode == "dense" or self.lexical is None or not query:
+            return self._dense(q, top_k, since_day, tickers, **params) if q is not None else []
+        allowed = self.meta.candidate_ids(since_day, tickers)
+        if mode == "lexical" or q is None:
+            lex = self.lexical.search(query, top_k, allowed_ids=allowed, excluded_ids=self._dead)
+            return self._hits_for_ids([s for s, _ in lex], [r for _, r in lex])
+        if mode == "two_stage":
+            lex = self.lexical.search(query, max(top_k, LEXICAL_CANDIDATES), allowed_ids=allowed, excluded_ids=self._dead)
+            positions = np.sort(self.meta.positions_for_ids(np.asarray([r for _, r in lex], dtype=np.int64)))
+            return self._score_positions(q, positions, top_k, params.get("rerank"))
+        # hybrid
+        depth = top_k * FUSION_FANOUT
+        dense = self._dense(q, depth, since_day, tickers, **params)
+        lex = self.lexical.search(query, depth, allowed_ids=allowed, excluded_ids=self._dead)
+        fused = reciprocal_rank_fusion([[r for _, r, _ in dense], [r for _, r in lex]])[:top_k]
+        return self._hits_for_ids([s for s, _ in fused], [r for _, r in fused])
+
+    def search_many(
+        self,
+        qvecs: np.ndarray,
+        top_k: int,
+        since_day: Optional[int] = None,
+        tickers: Optional[List[str]] = None,
+        **params,
+    ) -> List[List[Hit]]:
+        """Dense `search` for each row of `qvecs`, sharing one scan of the index.
+
+        The filter is resolved once for the whole batch; the matching rows
+        are then scored against all questions with a matrix-matrix product.
+        """
+        qs = np.atleast_2d(np.asarray(qvecs, dtype=np.float32))
+        if self.store is None or top_k <= 0 or qs.shape[1] != self.store.dim:
+            return [[] for _ in range(qs.shape[0])]
+        qs = normalize(qs)
+        if since_day is not None and not tickers:
+            return self._score_window(qs, since_day, top_k, params.get("rerank"))
+        cand = self.meta.candidates(since_day, tickers)
+        if cand is None:
+            return self._scan_all(qs, top_k, **params)
+        return self._score_positions_many(qs, cand, top_k, params.get("rerank"))
+
+    def _dense(self, q: np.ndarray, top_k: int, since_day, tickers, **params) -> List[Hit]:
+        if since_day is not None and not tickers:
+            return self._score_window(q[None, :], since_day, top_k, params.get("rerank"))[0]
+        cand = self.meta.candidates(since_day, tickers)
+        if cand is None:
+            return self._scan_all(q[None, :], top_k, **params)[0]
+        return self._score_positions(q, cand, top_k, params.get("rerank"))
+
+    def _scan_all(self, qs: np.ndarray, top_k: int, **params) -> List[List[Hit]]:
+        """Unfiltered top-k through the backend; with tombstones, flat scans mask them per block."""
+        if not self._dead.size:
+            return self.store.search_many(qs, top_k, **params)
+        if isinstance(self.store, FlatStore):
+            plan = [(b, None) for b in range(len(self._blocks))]
+            return self._score_blocks(qs, plan, top_k, params.get("rerank"))
+        return self.store.search_many(qs, top_k, exclude_ids=self._dead, **params)
+
+    def _hits_for_ids(self, scores: List[float], row_ids: List[int]) -> List[Hit]:
+        """Attach document ids to (score, embedding id) pairs, keeping their order."""
+        out: List[Hit] = []
+        for score, rid in zip(scores, row_ids):
+            pos = self.meta.positions_for_ids(np.asarray([rid], dtype=np.int64))
+            if pos.size:
+                block = self._blocks[int(pos[0] >> BLOCK_SHIFT)]
+                out.append((float(score), int(rid), int(block.doc_ids[int(pos[0] & ((1 << BLOCK_SHIFT) - 1))])))
+        return out
+
+    def _score_positions(self, q: np.ndarray, positions: np.ndarray, top_k: int, rerank: Optional[int] = None) -> List[Hit]:
+        return self._score_positions_many(q[None, :], positions, top_k, rerank)[0]
+
+    def _score_positions_many(
+        self, qs: np.ndarray, positions: np.ndarray, top_k: int, rerank: Optional[int] = None
+    ) -> List[List[Hit]]:
+        if positions.size == 0:
+            return [[] for _ in range(qs.shape[0])]
+        blocks = positions >> BLOCK_SHIFT
+        local = positions & ((1 << BLOCK_SHIFT) - 1)
+        bounds = np.flatnonzero(np.diff(blocks)) + 1
+        plan = []
+        for sel in np.split(np.arange(positions.size), bounds):
+            b = int(blocks[sel[0]])
+            plan.append((b, None if sel.size == self._blocks[b].rows else local[sel]))
+        return self._score_blocks(qs, plan, top_k, rerank)
+
+    def _score_window(self, qs: np.ndarray, since_day: int, top_k: int, rerank: Optional[int] = None) -> List[List[Hit]]:
+        """Score rows published on or after `since_day`, using each block's day range.
+
+        Blocks entirely before the window are skipped and blocks entirely
+        inside it are scanned whole; only blocks straddling the boundary
+        (the head, a partition edge) need a row filter.
+        """
+        plan = []
+        for b, (lo, hi) in enumerate(list(self._block_span)):
+            if hi < since_day:
+                continue
+            if lo >= since_day:
+                plan.append((b, None))
+                continue
+            rows = np.flatnonzero(np.asarray(self._block_days[b]) >= since_day)
+            if rows.size:
+                plan.append((b, rows))
+        return self._score_blocks(qs, plan, top_k, rerank)
+
+    def _score_blocks(self, qs: np.ndarray, plan, top_k: int, rerank: Optional[int]) -> List[List[Hit]]:
+        """Top-k per query over [(block index, row indices or None for all rows)]."""
+        rerank = RERANK_FACTOR if rerank is None else rerank
+        dead = self._dead_rows() if self._dead.size else {}
+        out: List[List[Hit]] = [[] for _ in range(qs.shape[0])]
+        for b, rows in plan:
+            block = self._blocks[b]
+            if not block.rows:
+                continue
+            step = max(1, SCORE_BUDGET // (block.rows if rows is None else rows.size))
+            for start in range(0, qs.shape[0], step):
+                hits_many = block.top_many(qs[start : start + step], top_k, rows=rows, rerank=rerank, dead=dead.get(b))
+                for j, hits in enumerate(hits_many, start):
+                    out[j].extend(hits)
+        if len(plan) > 1:
+            out = [sorted(hits, key=lambda h: -h[0])[:top_k] for hits in out]
+        return out
+
+
+_indexes: Dict[Tuple[str, str, Optional[int]], EmbeddingIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(model: str, backend: Optional[str] = None, nlist: Optional[int] = None) -> EmbeddingIndex:
+    """Return the shared index for (model, backend, nlist), creating it on first use."""
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector backend: {backend}")
+    nlist = (nlist or DEFAULT_NLIST) if backend == "ivf" else None
+    key = (model, backend, nlist)
+    with _indexes_lock:
+        idx = _indexes.get(key)
+        if idx is None:
+            idx = _indexes[key] = EmbeddingIndex(model, backend=backend, nlist=nlist)
+        elif idx.stale:
+            idx = _indexes[key] = idx.successor()
+        return idx
+
+
+def loaded_indexes(model: str) -> List[EmbeddingIndex]:
+    with _indexes_lock:
+        return [idx for (m, _, _), idx in _indexes.items() if m == model and idx.loaded]
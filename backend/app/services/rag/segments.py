@@ -0,0 +1,467 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Optional, Tuple
+import fcntl
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+from .metadata import NO_DAY
+from .vectorstore.base import Block, normalize
+from .vectorstore.quant import DTYPES, quantize
+
+
+VECTOR_DIR = os.getenv("RAG_VECTOR_DIR", "./data/vectors")
+SEGMENT_ROWS = int(os.getenv("RAG_SEGMENT_ROWS", "100000"))
+# Storage format of new models' vectors (float32 | float16 | int8), and whether
+# quantized models also keep float32 originals on disk for re-ranking.
+DEFAULT_DTYPE = os.getenv("RAG_VECTOR_DTYPE", "float32")
+# Compaction: sealed segments below COMPACT_MIN_ROWS are merged, rows are
+# regrouped into PARTITION_DAYS-wide partitions of at most COMPACT_TARGET_ROWS,
+# and segments whose share of dead rows reaches COMPACT_DEAD_RATIO are rewritten.
+COMPACT_MIN_ROWS = int(os.getenv("RAG_COMPACT_MIN_ROWS", "50000"))
+COMPACT_TARGET_ROWS = int(os.getenv("RAG_COMPACT_TARGET_ROWS", "1000000"))
+COMPACT_DEAD_RATIO = float(os.getenv("RAG_COMPACT_DEAD_RATIO", "0.05"))
+PARTITION_DAYS = int(os.getenv("RAG_PARTITION_DAYS", "7"))
+KEEP_FLOAT32 = os.getenv("RAG_KEEP_FLOAT32", "false").lower() in ("1", "true", "yes")
+
+# Per segment: <name>.f32 holds rows*dim float32 (unit-normalized), <name>.f16
+# or <name>.i8 + <name>.scl (float32 per-row scale) the quantized codes, and
+# <name>.ids holds rows*3 int64 (embedding_id, document_id, published epoch day).
+VEC_SUFFIX = ".f32"
+CODE_SUFFIX = {"float16": ".f16", "int8": ".i8"}
+SCALE_SUFFIX = ".scl"
+IDS_SUFFIX = ".ids"
+IDS_COLS = 3
+# int64 embedding ids deleted from the table whose rows are still in segment files;
+# the manifest's "deleted" count says how many are committed.
+TOMBSTONE_FILE = "deleted.ids"
+
+
+def model_slug(model: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+
+
+class Segment:
+    """Read-only memory-mapped view of the first `rows` rows of a segment.
+
+    `vectors` are the codes in the model's storage dtype; for quantized
+    models `scales` (int8 only) and `exact` (float32 originals, if kept)
+    come alongside.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        scales: Optional[np.ndarray] = None,
+        exact: Optional[np.ndarray] = None,
+    ):
+        self.name = name
+        self.vectors = vectors
+        self.ids = ids
+        self.scales = scales
+        self.exact = exact
+
+    @property
+    def rows(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def row_ids(self) -> np.ndarray:
+        return self.ids[:, 0]
+
+    @property
+    def doc_ids(self) -> np.ndarray:
+        return self.ids[:, 1]
+
+    @property
+    def days(self) -> np.ndarray:
+        return self.ids[:, 2]
+
+    def block(self) -> Block:
+        return Block(self.vectors, self.row_ids, self.doc_ids, scales=self.scales, exact=self.exact)
+
+
+class SegmentStore:
+    """Segment files for one embedding model: a mutable head plus immutable segments.
+
+    `manifest.json` lists the segments, how many rows of each are committed
+    and their published-day range. Writers append to the head segment (the
+    last one, until it holds `segment_rows` rows) and publish the new row
+    count in the manifest last, under an exclusive file lock, so readers in
+    other processes never see a row that is not fully written. Readers
+    `np.memmap` the files, so every worker shares the page cache.
+
+    `compact` rewrites sealed segments into day-partitioned ones under new
+    names and bumps the manifest `generation`; old files are unlinked, which
+    leaves existing memory maps valid.
+
+    The storage dtype is fixed per model by the first append (`dtype`, else
+    `RAG_VECTOR_DTYPE`) and recorded in the manifest.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        root: Optional[str] = None,
+        segment_rows: int = SEGMENT_ROWS,
+        dtype: Optional[str] = None,
+        keep_float32: bool = KEEP_FLOAT32,
+    ):
+        if dtype is not None and dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype}")
+        self.model = model
+        self.dir = os.path.join(root or VECTOR_DIR, model_slug(model))
+        self.segment_rows = segment_rows
+        self.dtype = dtype
+        self.keep_float32 = keep_float32
+        self._manifest_path = os.path.join(self.dir, "manifest.json")
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.dir, name + suffix)
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(os.path.join(self.dir, ".lock"), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def read_manifest(self) -> Dict:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"model": self.model, "dim": None, "segments": []}
+
+    def stored_dtype(self, manifest: Optional[Dict] = None) -> Optional[str]:
+        """dtype recorded for this model, or None before the first append."""
+        manifest = manifest or self.read_manifest()
+        if manifest["dim"] is None:
+            return None
+        return manifest.get("dtype", "float32")
+
+    def _write_manifest(self, manifest: Dict) -> None:
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path)
+
+    def append(
+        self,
+        row_ids: List[int],
+        doc_ids: List[int],
+        vecs: np.ndarray,
+        days: Optional[List[int]] = None,
+        on_written: Optional[Callable[[List[Tuple[str, int]]], None]] = None,
+    ) -> List[Tuple[str, int]]:
+        """Append vectors and return the (segment, offset) of each row.
+
+        `days` is the published epoch day of each row's document (see
+        `metadata.epoch_day`), kept beside the ids for pre-filtering.
+        `on_written(offsets)` runs before the store lock is released, so the
+        caller can commit the matching `Embedding` rows before `compact` can
+        see the new segment rows.
+        """
+        vecs = normalize(np.atleast_2d(vecs))
+        ids = np.column_stack([
+            np.asarray(row_ids, dtype=np.int64),
+            np.asarray([d or 0 for d in doc_ids], dtype=np.int64),
+            np.asarray(days if days is not None else [NO_DAY] * len(row_ids), dtype=np.int64),
+        ])
+        out: List[Tuple[str, int]] = []
+        with self._locked():
+            manifest = self.read_manifest()
+            if manifest["dim"] is None:
+                manifest["dim"] = int(vecs.shape[1])
+                manifest["dtype"] = self.dtype or DEFAULT_DTYPE
+                manifest["float32"] = manifest["dtype"] == "float32" or self.keep_float32
+            elif vecs.shape[1] != manifest["dim"]:
+                raise ValueError(f"Vector dim {vecs.shape[1]} != {manifest['dim']} for model {self.model}")
+            elif self.dtype and self.dtype != self.stored_dtype(manifest):
+                raise ValueError(f"Model {self.model} is stored as {self.stored_dtype(manifest)}, not {self.dtype}")
+            segs = manifest["segments"]
+            start = 0
+            while start < vecs.shape[0]:
+                if not segs or self._sealed(segs[-1]):
+                    segs.append(self._new_entry(manifest))
+                seg = segs[-1]
+                take = min(self.segment_rows - seg["rows"], vecs.shape[0] - start)
+                part = ids[start : start + take]
+                self._write_rows(seg, self._encode(manifest, vecs[start : start + take], part))
+                out.extend((seg["name"], seg["rows"] + i) for i in range(take))
+                seg["rows"] += take
+                self._widen_days(seg, part[:, 2])
+                start += take
+            self._write_manifest(manifest)
+            if on_written is not None:
+                on_written(out)
+        return out
+
+    def tombstone(self, row_ids: List[int]) -> None:
+        """Record deleted embedding ids so readers skip their rows until compaction drops them."""
+        ids = np.asarray(row_ids, dtype=np.int64)
+        if not ids.size:
+            return
+        with self._locked():
+            manifest = self.read_manifest()
+            kept = self.read_tombstones(manifest=manifest)
+            self._write_tombstones(manifest, np.concatenate([kept, ids]))
+            self._write_manifest(manifest)
+
+    def read_tombstones(self, start: int = 0, manifest: Optional[Dict] = None) -> np.ndarray:
+        """Committed tombstones from position `start` on."""
+        manifest = manifest or self.read_manifest()
+        count = manifest.get("deleted", 0)
+        if count <= start:
+            return np.zeros(0, dtype=np.int64)
+        try:
+            with open(os.path.join(self.dir, TOMBSTONE_FILE), "rb") as f:
+                f.seek(start * 8)
+                data = f.read((count - start) * 8)
+        except FileNotFoundError:  # rewritten by compaction; the next manifest read has the new count
+            return np.zeros(0, dtype=np.int64)
+        return np.frombuffer(data[: len(data) // 8 * 8], dtype=np.int64)
+
+    def _write_tombstones(self, manifest: Dict, ids: np.ndarray) -> None:
+        path = os.path.join(self.dir, TOMBSTONE_FILE)
+        tmp = path + ".tmp"
+        np.asarray(ids, dtype=np.int64).tofile(tmp)
+        os.replace(tmp, path)
+        manifest["deleted"] = int(ids.size)
+
+    def _sealed(self, seg: Dict) -> bool:
+        return bool(seg.get("sealed")) or seg["rows"] >= self.segment_rows
+
+    @staticmethod
+    def _new_entry(manifest: Dict) -> Dict:
+        seq = manifest.get("next_seq", len(manifest["segments"]))
+        manifest["next_seq"] = seq + 1
+        return {"name": f"seg-{seq:06d}", "rows": 0}
+
+    @staticmethod
+    def _widen_days(seg: Dict, days: np.ndarray) -> None:
+        if days.size:
+            seg["min_day"] = min(int(days.min()), seg.get("min_day", int(days.min())))
+            seg["max_day"] = max(int(days.max()), seg.get("max_day", int(days.max())))
+
+    def _layout(self, manifest: Dict) -> List[Tuple[str, np.dtype, int]]:
+        """(suffix, dtype, columns; 0 for 1-D) of every file of a segment."""
+        dim = manifest["dim"]
+        dtype = manifest.get("dtype", "float32")
+        out = [(IDS_SUFFIX, np.dtype(np.int64), IDS_COLS)]
+        if manifest.get("float32", True):
+            out.append((VEC_SUFFIX, np.dtype(np.float32), dim))
+        if dtype != "float32":
+            out.append((CODE_SUFFIX[dtype], np.dtype(dtype), dim))
+            if dtype == "int8":
+                out.append((SCALE_SUFFIX, np.dtype(np.float32), 0))
+        return out
+
+    def _encode(self, manifest: Dict, vecs: np.ndarray, ids: np.ndarray) -> Dict[str, np.ndarray]:
+        dtype = manifest.get("dtype", "float32")
+        arrays = {IDS_SUFFIX: ids}
+        if manifest.get("float32", True):
+            arrays[VEC_SUFFIX] = vecs
+        if dtype != "float32":
+            codes, scales = quantize(vecs, dtype)
+            arrays[CODE_SUFFIX[dtype]] = codes
+            if scales is not None:
+                arrays[SCALE_SUFFIX] = scales
+        return arrays
+
+    def _files(self, manifest: Dict, seg: Dict) -> Dict[str, np.ndarray]:
+        rows = seg["rows"]
+        return {
+            suffix: self._map(seg["name"], suffix, dt, (rows, cols) if cols else (rows,))
+            for suffix, dt, cols in self._layout(manifest)
+        }
+
+    def _write_rows(self, seg: Dict, arrays: Dict[str, np.ndarray]) -> None:
+        # Truncate to the committed length first so a crashed writer's tail is overwritten.
+        for suffix, arr in arrays.items():
+            width = arr.itemsize * (arr.shape[1] if arr.ndim == 2 else 1)
+            path = self._path(seg["name"], suffix)
+            with open(path, "ab") as f:
+                f.truncate(seg["rows"] * width)
+                f.write(np.ascontiguousarray(arr).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _map(self, name: str, suffix: str, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        return np.memmap(self._path(name, suffix), dtype=dtype, mode="r", shape=shape)
+
+    def open_segments(self, manifest: Optional[Dict] = None) -> List[Segment]:
+        manifest = manifest or self.read_manifest()
+        dtype = manifest.get("dtype", "float32")
+        out: List[Segment] = []
+        for seg in manifest["segments"]:
+            if not seg["rows"]:
+                continue
+            files = self._files(manifest, seg)
+            if dtype == "float32":
+                out.append(Segment(seg["name"], files[VEC_SUFFIX], files[IDS_SUFFIX]))
+                continue
+            out.append(Segment(
+                seg["name"],
+                files[CODE_SUFFIX[dtype]],
+                files[IDS_SUFFIX],
+                scales=files.get(SCALE_SUFFIX),
+                exact=files.get(VEC_SUFFIX),
+            ))
+        return out
+
+    def compact(
+        self,
+        live_ids: Optional[np.ndarray] = None,
+        live: Optional[Callable[[], np.ndarray]] = None,
+        min_rows: int = COMPACT_MIN_ROWS,
+        target_rows: int = COMPACT_TARGET_ROWS,
+        partition_days: int = PARTITION_DAYS,
+        dead_ratio: float = COMPACT_DEAD_RATIO,
+    ) -> Dict:
+        """Merge small / multi-partition sealed segments and drop dead rows.
+
+        `live_ids` (sorted) are the embedding ids that still exist; rows with
+        other ids up to `live_ids.max()` are dropped (higher ids may belong
+        to an index run that has not committed yet). Pass `live` instead to
+        read them under the store lock, after every appended row has been
+        committed (see `append(on_written=...)`). Only sealed segments are
+        rewritten; the head is never touched. Returns counts plus `moves`:
+        (embedding_id, segment, offset) for every rewritten row.
+        """
+        stats = {"segments_in": 0, "segments_out": 0, "rows_in": 0, "rows_out": 0, "moves": []}
+        with self._locked():
+            if live is not None:
+                live_ids = live()
+            manifest = self.read_manifest()
+            segs = manifest["segments"]
+            if manifest["dim"] is None or not segs:
+                return stats
+            head = None if self._sealed(segs[-1]) else segs[-1]
+            picks = self._pick(manifest, [s for s in segs if s is not head], live_ids, min_rows, partition_days, dead_ratio)
+            if not picks:
+                return stats
+            merged: Dict[str, List[np.ndarray]] = {suffix: [] for suffix, _, _ in self._layout(manifest)}
+            dropped: List[np.ndarray] = []
+            for seg in picks:
+                files = self._files(manifest, seg)
+                keep = self._alive(files[IDS_SUFFIX][:, 0], live_ids)
+                dropped.append(np.asarray(files[IDS_SUFFIX][~keep, 0]))
+                for suffix, arr in files.items():
+                    merged[suffix].append(np.asarray(arr[keep]))
+            arrays = {suffix: np.concatenate(parts) for suffix, parts in merged.items()}
+            ids = arrays[IDS_SUFFIX]
+            order = np.lexsort((ids[:, 0], ids[:, 2]))
+            arrays = {suffix: arr[order] for suffix, arr in arrays.items()}
+            ids = arrays[IDS_SUFFIX]
+
+            part = ids[:, 2] // max(1, partition_days)
+            cuts = [0]
+            for b in list(np.flatnonzero(np.diff(part)) + 1) + [ids.shape[0]]:
+                cuts.extend(range(cuts[-1] + target_rows, int(b), target_rows))
+                cuts.append(int(b))
+            fresh: List[Dict] = []
+            for a, b in zip(cuts, cuts[1:]):
+                if b <= a:
+                    continue
+                entry = self._new_entry(manifest)
+                entry["sealed"] = True
+                self._write_rows(entry, {suffix: arr[a:b] for suffix, arr in arrays.items()})
+                entry["rows"] = b - a
+                self._widen_days(entry, ids[a:b, 2])
+                stats["moves"].extend(zip(ids[a:b, 0].tolist(), [entry["name"]] * (b - a), range(b - a)))
+                fresh.append(entry)
+
+            picked = {s["name"] for s in picks}
+            manifest["segments"] = [s for s in segs if s["name"] not in picked and s is not head] + fresh
+            if head is not None:
+                manifest["segments"].append(head)
+            manifest["generation"] = manifest.get("generation", 0) + 1
+            tombstones = self.read_tombstones(manifest=manifest)
+            if tombstones.size:
+                # rows dropped here no longer need one
+                self._write_tombstones(manifest, tombstones[~np.isin(tombstones, np.concatenate(dropped))])
+            self._write_manifest(manifest)
+            for seg in picks:
+                for suffix, _, _ in self._layout(manifest):
+                    try:
+                        os.remove(self._path(seg["name"], suffix))
+                    except FileNotFoundError:
+                        pass
+        stats.update(
+            segments_in=len(picks),
+            segments_out=len(fresh),
+            rows_in=sum(s["rows"] for s in picks),
+            rows_out=int(ids.shape[0]),
+        )
+        return stats
+
+    @staticmethod
+    def _alive(row_ids: np.ndarray, live_ids: Optional[np.ndarray]) -> np.ndarray:
+        row_ids = np.asarray(row_ids)
+        if live_ids is None or live_ids.size == 0:
+            return np.ones(row_ids.shape[0], dtype=bool)
+        return np.isin(row_ids, live_ids) | (row_ids > live_ids[-1])
+
+    def _pick(
+        self,
+        manifest: Dict,
+        sealed: List[Dict],
+        live_ids: Optional[np.ndarray],
+        min_rows: int,
+        partition_days: int,
+        dead_ratio: float,
+    ) -> List[Dict]:
+        """Sealed segments worth rewriting.
+
+        Picked: segments spanning several partitions (sealed heads), segments
+        with too many dead rows, and small segments that share a partition
+        with another pick or another small segment.
+        """
+        width = max(1, partition_days)
+        picks, small = [], []
+        for seg in sealed:
+            if not seg["rows"]:
+                continue
+            if "min_day" not in seg:
+                self._widen_days(seg, np.asarray(self._files(manifest, seg)[IDS_SUFFIX][:, 2]))
+            lo, hi = seg["min_day"] // width, seg["max_day"] // width
+            if lo != hi:
+                picks.append(seg)
+            elif live_ids is not None and dead_ratio > 0:
+                ids = self._files(manifest, seg)[IDS_SUFFIX][:, 0]
+                dead = ids.shape[0] - int(self._alive(ids, live_ids).sum())
+                (picks if dead and dead >= dead_ratio * ids.shape[0] else small).append(seg)
+            else:
+                small.append(seg)
+        small = [s for s in small if s["rows"] < min_rows]
+        covered = set()
+        for seg in picks:
+            covered.update(range(seg["min_day"] // width, seg["max_day"] // width + 1))
+        per_part: Dict[int, int] = {}
+        for seg in small:
+            per_part[seg["min_day"] // width] = per_part.get(seg["min_day"] // width, 0) + 1
+        picks.extend(s for s in small if s["min_day"] // width in covered or per_part[s["min_day"] // width] > 1)
+        return picks
+
+
+_stores: Dict[str, SegmentStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_segment_store(model: str) -> SegmentStore:
+    with _stores_lock:
+        store = _stores.get(model)
+        if store is None:
+            store = SegmentStore(model)
+            _stores[model] = store
+        return store
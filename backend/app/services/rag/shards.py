@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import fcntl
+import logging
+import multiprocessing as mp
+import os
+import queue
+import secrets
+import threading
+import time
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .retriever import BACKENDS, DEFAULT_BACKEND, DEFAULT_NLIST, EmbeddingIndex
+from .segments import SegmentStore, model_slug
+from .vectorstore.base import Hit
+
+
+SHARDS = int(os.getenv("RAG_SHARDS", "0"))  # 0 = score inside the API process
+SHARD_DIR = os.getenv("RAG_SHARD_DIR", "./data/shards")
+SHARD_TIMEOUT = float(os.getenv("RAG_SHARD_TIMEOUT_SEC", "30"))
+SHARD_REFRESH_SEC = float(os.getenv("RAG_SHARD_REFRESH_SEC", "2"))
+AUTHKEY = os.getenv("RAG_SHARD_AUTHKEY", "")  # empty: random key kept in the shard directory
+AUTHKEY_FILE = ".authkey"
+
+log = logging.getLogger(__name__)
+
+
+class ShardUnavailable(RuntimeError):
+    pass
+
+
+class ShardError(ShardUnavailable):
+    """A shard answered the request with an error."""
+
+
+def shard_addresses(model: str, backend: str, nlist: Optional[int], shards: int, root: Optional[str] = None) -> List[str]:
+    """Unix socket of each shard; one directory per (model, backend, nlist)."""
+    base = os.path.abspath(os.path.join(root or SHARD_DIR, f"{model_slug(model)}-{backend}{nlist or ''}"))
+    return [os.path.join(base, f"shard-{i}.sock") for i in range(shards)]
+
+
+def shard_authkey(base: str) -> bytes:
+    """Key authenticating connections to the shards under `base`.
+
+    Connections exchange pickles, so the key must not be guessable:
+    RAG_SHARD_AUTHKEY when set, otherwise 32 random bytes created once in
+    `base/.authkey` (mode 0600) and read by every process of the deployment.
+    """
+    if AUTHKEY:
+        return AUTHKEY.encode("utf-8")
+    path = os.path.join(base, AUTHKEY_FILE)
+    if not os.path.exists(path):
+        os.makedirs(base, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(secrets.token_bytes(32))
+        try:
+            os.link(tmp, path)  # atomic and never overwrites: the first writer's key wins
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+class _ShardServer:
+    """Serves one shard's `EmbeddingIndex` to any number of client connections."""
+
+    def __init__(self, make_index: Callable[[], EmbeddingIndex], session_factory, refresh_sec: float):
+        self.make_index = make_index
+        self.session_factory = session_factory
+        self.refresh_sec = refresh_sec
+        self.index = make_index()
+        self._refreshed = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed < self.refresh_sec:
+                return
+            db = self.session_factory()
+            try:
+                self.index.refresh(db)
+                if self.index.stale:  # segments were compacted: re-map this shard's segments only
+                    fresh = self.index.successor()
+                    fresh.refresh(db)
+                    self.index = fresh
+            finally:
+                db.close()
+            self._refreshed = time.monotonic()
+
+    def handle(self, conn: Connection) -> None:
+        with conn:
+            while True:
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if msg[0] == "search":
+                        _, qs, top_k, since_day, tickers, params = msg
+                        self.refresh()
+                        reply = self.index.search_many(qs, top_k, since_day=since_day, tickers=tickers, **params)
+                    elif msg[0] == "ping":
+                        self.refresh(force=True)
+                        reply = len(self.index)
+                    else:
+                        raise ValueError(f"unknown shard op {msg[0]!r}")
+                    conn.send(("ok", reply))
+                except Exception as e:  # report to the caller, keep serving
+                    conn.send(("err", repr(e)))
+
+
+def serve_shard(
+    address: str,
+    shard: int,
+    count: int,
+    model: str,
+    backend: str,
+    nlist: Optional[int],
+    database_url: str,
+    authkey: bytes,
+    vector_root: Optional[str] = None,
+    refresh_sec: float = SHARD_REFRESH_SEC,
+) -> None:
+    """Process entry point: load shard `shard` of `count` and answer on `address` forever."""
+    engine = create_engine(
+        database_url, connect_args={"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    )
+    segments = SegmentStore(model, root=vector_root)
+    server = _ShardServer(
+        lambda: EmbeddingIndex(model, backend=backend, nlist=nlist, segments=segments, shard=(shard, count)),
+        sessionmaker(bind=engine),
+        refresh_sec,
+    )
+    server.refresh(force=True)
+    os.makedirs(os.path.dirname(address), exist_ok=True)
+    if os.path.exists(address):
+        os.remove(address)  # left over by a previous incarnation of this shard
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, mp.AuthenticationError):
+                continue
+            threading.Thread(target=server.handle, args=(conn,), daemon=True).start()
+
+
+def reachable(address: str, authkey: bytes) -> bool:
+    try:
+        Client(address, family="AF_UNIX", authkey=authkey).close()
+        return True
+    except (OSError, EOFError, mp.AuthenticationError):
+        return False
+
+
+class ShardSupervisor:
+    """Owns one process per shard; each can be (re)started without touching the others."""
+
+    def __init__(
+        self,
+        model: str,
+        backend: str,
+        nlist: Optional[int],
+        addresses: List[str],
+        database_url: str,
+        vector_root: Optional[str] = None,
+        authkey: Optional[bytes] = None,
+    ):
+        self.model = model
+        self.backend = backend
+        self.nlist = nlist
+        self.addresses = addresses
+        self.database_url = database_url
+        self.vector_root = vector_root
+        self.authkey = authkey or shard_authkey(os.path.dirname(addresses[0]))
+        self._procs: Dict[int, mp.Process] = {}
+        self._ctx = mp.get_context("spawn")
+
+    def _spawn(self, i: int) -> None:
+        p = self._ctx.Process(
+            target=serve_shard,
+            args=(self.addresses[i], i, len(self.addresses), self.model, self.backend, self.nlist,
+                  self.database_url, self.authkey, self.vector_root),
+            name=f"rag-shard-{i}",
+            daemon=True,
+        )
+        p.start()
+        self._procs[i] = p
+
+    def _wait(self, indices: List[int], timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        for i in indices:
+            while not reachable(self.addresses[i], self.authkey):
+                if time.monotonic() > deadline or not self._procs[i].is_alive():
+                    raise ShardUnavailable(f"shard {i} of {self.model} did not start")
+                time.sleep(0.05)
+
+    def start(self, timeout: float = SHARD_TIMEOUT) -> "ShardSupervisor":
+        for i in range(len(self.addresses)):
+            self._spawn(i)
+        self._wait(list(range(len(self.addresses))), timeout)
+        return self
+
+    def ensure(self, i: int, timeout: float = SHARD_TIMEOUT) -> None:
+        """Start shard `i` if its process is gone (or was never started here)."""
+        p = self._procs.get(i)
+        if p is not None and p.is_alive():
+            return
+        self._spawn(i)
+        self._wait([i], timeout)
+
+    def restart(self, i: int, timeout: float = SHARD_TIMEOUT) -> None:
+        p = self._procs.get(i)
+        if p is not None and p.is_alive():
+            p.terminate()
+            p.join(5)
+        self._spawn(i)
+        self._wait([i], timeout)
+
+    def stop(self) -> None:
+        for p in self._procs.values():
+            if p.is_alive():
+                p.terminate()
+        for p in self._procs.values():
+            p.join(5)
+
+
+class ShardClient:
+    """Scatter-gather client: sends a query to every shard and merges the per-shard top-k.
+
+    Connections are pooled per shard, so concurrent callers each use their
+    own. A shard that drops a request (e.g. while restarting) is reconnected
+    and asked again until `timeout`; `on_failure(i)` is called before each
+    reconnect so a local supervisor can respawn it.
+    """
+
+    def __init__(
+        self,
+        addresses: List[str],
+        timeout: float = SHARD_TIMEOUT,
+        on_failure: Optional[Callable[[int], None]] = None,
+        authkey: Optional[bytes] = None,
+    ):
+        self.addresses = addresses
+        self.timeout = timeout
+        self.on_failure = on_failure
+        self.authkey = authkey or shard_authkey(os.path.dirname(addresses[0]))
+        self._idle: List[queue.LifoQueue] = [queue.LifoQueue() for _ in addresses]
+
+    def _connect(self, i: int, deadline: float) -> Connection:
+        while True:
+            try:
+                return Client(self.addresses[i], family="AF_UNIX", authkey=self.authkey)
+            except (OSError, EOFError, mp.AuthenticationError):
+                if time.monotonic() > deadline:
+                    raise ShardUnavailable(f"shard {i} unreachable at {self.addresses[i]}")
+                if self.on_failure is not None:
+                    self.on_failure(i)
+                time.sleep(0.05)
+
+    def _send(self, i: int, msg, deadline: float, conn: Optional[Connection] = None) -> Connection:
+        while True:
+            if conn is None:
+                try:
+                    conn = self._idle[i].get_nowait()
+                except queue.Empty:
+                    conn = self._connect(i, deadline)
+            try:
+                conn.send(msg)
+                return conn
+            except OSError:
+                conn.close()
+                conn = None
+
+    def _call(self, msg) -> List:
+        deadline = time.monotonic() + self.timeout
+        conns = [self._send(i, msg, deadline) for i in range(len(self.addresses))]
+        replies = []
+        for i, conn in enumerate(conns):
+            while True:
+                try:
+                    if not conn.poll(max(0.0, deadline - time.monotonic())):
+                        conn.close()
+                        raise ShardUnavailable(f"shard {i} timed out")
+                    reply = conn.recv()
+                    break
+                except (EOFError, OSError):  # shard died mid-request: ask its replacement
+                    conn.close()
+                    conn = self._send(i, msg, deadline)
+            self._idle[i].put(conn)
+            if reply[0] != "ok":
+                raise ShardError(f"shard {i}: {reply[1]}")
+            replies.append(reply[1])
+        return replies
+
+    def ping(self) -> List[int]:
+        """Rows held by each shard (also forces a refresh)."""
+        return self._call(("ping",))
+
+    def search_many(
+        self,
+        qvecs: np.ndarray,
+        top_k: int,
+        since_day: Optional[int] = None,
+        tickers: Optional[List[str]] = None,
+        **params,
+    ) -> List[List[Hit]]:
+        qs = np.atleast_2d(np.asarray(qvecs, dtype=np.float32))
+        per_shard = self._call(("search", qs, top_k, since_day, tickers, params))
+        return [
+            sorted((h for hits in per_shard for h in hits[j]), key=lambda h: -h[0])[:top_k]
+            for j in range(qs.shape[0])
+        ]
+
+
+_clients: Dict[Tuple[str, str, Optional[int]], ShardClient] = {}
+_supervisors: Dict[Tuple[str, str, Optional[int]], ShardSupervisor] = {}
+_registry_lock = threading.Lock()
+
+
+@contextmanager
+def _spawn_lock(addresses: List[str]):
+    """Cross-process lock so only one API worker starts a missing shard."""
+    base = os.path.dirname(addresses[0])
+    os.makedirs(base, exist_ok=True)
+    with open(os.path.join(base, ".spawn.lock"), "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def get_shard_client(
+    model: str,
+    backend: Optional[str] = None,
+    nlist: Optional[int] = None,
+    shards: int = SHARDS,
+    database_url: Optional[str] = None,
+    vector_root: Optional[str] = None,
+    shard_root: Optional[str] = None,
+) -> ShardClient:
+    """Client for the shard group of (model, backend, nlist), starting missing shards locally."""
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector backend: {backend}")
+    nlist = (nlist or DEFAULT_NLIST) if backend == "ivf" else None
+    key = (model, backend, nlist)
+    addresses = shard_addresses(model, backend, nlist, shards, root=shard_root)
+    with _registry_lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+        if database_url is None:
+            from ...db.session import DATABASE_URL as database_url
+        supervisor = _supervisors[key] = ShardSupervisor(model, backend, nlist, addresses, database_url, vector_root)
+
+        def ensure(i: int) -> None:
+            with _spawn_lock(addresses):
+                if not reachable(addresses[i], supervisor.authkey):
+                    supervisor.ensure(i)
+
+        for i in range(shards):
+            ensure(i)
+        client = _clients[key] = ShardClient(addresses, on_failure=ensure, authkey=supervisor.authkey)
+        return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run retrieval shard workers in the foreground")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--shards", type=int, default=max(1, SHARDS or os.cpu_count() or 1))
+    parser.add_argument("--backend", default=DEFAULT_BACKEND)
+    parser.add_argument("--nlist", type=int, default=None)
+    args = parser.parse_args()
+    from ...db.session import DATABASE_URL
+
+    backend = args.backend.lower()
+    nlist = (args.nlist or DEFAULT_NLIST) if backend == "ivf" else None
+    addresses = shard_addresses(args.model, backend, nlist, args.shards)
+    supervisor = ShardSupervisor(args.model, backend, nlist, addresses, DATABASE_URL).start()
+    try:
+        while True:  # restart any shard that exits, leaving the others alone
+            time.sleep(1.0)
+            for i in range(args.shards):
+                supervisor.ensure(i)
+    except KeyboardInterrupt:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
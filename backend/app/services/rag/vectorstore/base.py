@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from .quant import dequantize, scan
+
+
+# (score, embedding_id, document_id)
+Hit = Tuple[float, int, int]
+
+
+def normalize(mat: np.ndarray) -> np.ndarray:
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (mat / norms).astype(np.float32, copy=False)
+
+
+def top_hits(scores: np.ndarray, row_ids: np.ndarray, doc_ids: np.ndarray, top_k: int) -> List[Hit]:
+    """Select the `top_k` best scores with argpartition and return them sorted."""
+    n = scores.shape[0]
+    k = min(top_k, n)
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    top = top[np.argsort(-scores[top])]
+    return [(float(scores[i]), int(row_ids[i]), int(doc_ids[i])) for i in top]
+
+
+def top_hits_many(scores: np.ndarray, row_ids: np.ndarray, doc_ids: np.ndarray, top_k: int) -> List[List[Hit]]:
+    """`top_hits` for each column of an (n, m) score matrix."""
+    n, m = scores.shape
+    k = min(top_k, n)
+    if k <= 0:
+        return [[] for _ in range(m)]
+    top = np.argpartition(-scores, k - 1, axis=0)[:k] if k < n else np.tile(np.arange(n)[:, None], (1, m))
+    vals = np.take_along_axis(scores, top, axis=0)
+    order = np.argsort(-vals, axis=0)
+    top = np.take_along_axis(top, order, axis=0)
+    vals = np.take_along_axis(vals, order, axis=0)
+    rids, dids = row_ids[top], doc_ids[top]
+    return [
+        [(float(vals[i, j]), int(rids[i, j]), int(dids[i, j])) for i in range(k)]
+        for j in range(m)
+    ]
+
+
+class GrowableRows:
+    """Contiguous float32 matrix with id columns, grown by capacity doubling."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.size = 0
+        self.mat = np.zeros((0, dim), dtype=np.float32)
+        self.row_ids = np.zeros(0, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+
+    def append(self, vecs: np.ndarray, row_ids: np.ndarray, doc_ids: np.ndarray) -> None:
+        n = vecs.shape[0]
+        need = self.size + n
+        cap = self.mat.shape[0]
+        if need > cap:
+            new_cap = max(need, cap * 2, 256)
+            mat = np.zeros((new_cap, self.dim), dtype=np.float32)
+            mat[: self.size] = self.mat[: self.size]
+            rid = np.zeros(new_cap, dtype=np.int64)
+            rid[: self.size] = self.row_ids[: self.size]
+            did = np.zeros(new_cap, dtype=np.int64)
+            did[: self.size] = self.doc_ids[: self.size]
+            self.mat, self.row_ids, self.doc_ids = mat, rid, did
+        self.mat[self.size : need] = vecs
+        self.row_ids[self.size : need] = row_ids
+        self.doc_ids[self.size : need] = doc_ids
+        self.size = need
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Snapshot of the filled rows; safe to read while later appends happen."""
+        n = self.size
+        return self.mat[:n], self.row_ids[:n], self.doc_ids[:n]
+
+
+class Block:
+    """Rows of one attached matrix, possibly quantized.
+
+    `vectors` holds the codes that are scanned (float32, float16, or int8
+    with per-row `scales`). `exact`, when present, holds the float32
+    originals and is only read to re-rank the best `top_k * rerank`
+    candidates of a quantized scan.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        row_ids: np.ndarray,
+        doc_ids: np.ndarray,
+        scales: Optional[np.ndarray] = None,
+        exact: Optional[np.ndarray] = None,
+    ):
+        self.vectors = vectors
+        self.row_ids = row_ids
+        self.doc_ids = doc_ids
+        self.scales = scales
+        self.exact = exact
+
+    @property
+    def rows(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def quantized(self) -> bool:
+        return self.vectors.dtype != np.float32
+
+    def dense(self, start: int = 0) -> np.ndarray:
+        """float32 rows from `start` on (the originals when kept, else decoded)."""
+        if self.exact is not None:
+            return np.asarray(self.exact[start:])
+        if not self.quantized:
+            return np.asarray(self.vectors[start:])
+        return dequantize(self.vectors[start:], None if self.scales is None else self.scales[start:])
+
+    def top(self, q: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None, rerank: int = 0) -> List[Hit]:
+        """Best `top_k` hits over all rows, or over the sorted row indices `rows`."""
+        return self.top_many(q[None, :], top_k, rows=rows, rerank=rerank)[0]
+
+    def top_many(
+        self,
+        qs: np.ndarray,
+        top_k: int,
+        rows: Optional[np.ndarray] = None,
+        rerank: int = 0,
+        dead: Optional[np.ndarray] = None,
+    ) -> List[List[Hit]]:
+        """`top` for each row of `qs` (m, dim), scored with one matrix-matrix product.
+
+        `dead` (sorted row indices) are masked out of the scores before the
+        top-k selection, so they never take a slot.
+        """
+        if rows is None:
+            codes, scales, row_ids, doc_ids = self.vectors, self.scales, self.row_ids, self.doc_ids
+        else:
+            codes, row_ids, doc_ids = self.vectors[rows], self.row_ids[rows], self.doc_ids[rows]
+            scales = None if self.scales is None else self.scales[rows]
+        scores = scan(codes, qs.T, scales)
+        n = live = scores.shape[0]
+        if dead is not None and dead.size:
+            masked = np.isin(rows, dead, assume_unique=True) if rows is not None else dead[dead < n]
+            scores[masked] = -np.inf
+            live = n - (int(masked.sum()) if rows is not None else masked.size)
+            top_k = min(top_k, live)
+            if top_k <= 0:
+                return [[] for _ in range(qs.shape[0])]
+        if not self.quantized or self.exact is None or rerank <= 1:
+            return top_hits_many(scores, row_ids, doc_ids, top_k)
+        k = min(top_k * rerank, live)
+        if k < n:
+            cand = np.sort(np.argpartition(-scores, k - 1, axis=0)[:k], axis=0)
+        else:
+            cand = np.tile(np.arange(n)[:, None], (1, qs.shape[0]))
+        out: List[List[Hit]] = []
+        for j in range(qs.shape[0]):
+            c = cand[:, j]
+            src = c if rows is None else rows[c]
+            out.append(top_hits(np.asarray(self.exact[src]) @ qs[j], row_ids[c], doc_ids[c], top_k))
+        return out
+
+
+class VectorStore:
+    """Interface shared by the retrieval backends.
+
+    Vectors are unit-normalized on `add`, so scores are cosine similarities.
+    Backend-specific query knobs (e.g. `nprobe`) are passed to `search` as
+    keyword arguments and ignored by backends that do not use them.
+    """
+
+    name = "base"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._attached: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def add(self, row_ids: np.ndarray, doc_ids: np.ndarray, vecs: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def search(self, qvec: np.ndarray, top_k: int, **params) -> List[Hit]:
+        raise NotImplementedError
+
+    def search_many(self, qvecs: np.ndarray, top_k: int, **params) -> List[List[Hit]]:
+        """`search` for each row of `qvecs`; backends that can batch the scoring override this."""
+        return [self.search(q, top_k, **params) for q in np.atleast_2d(qvecs)]
+
+    def attach(self, key: str, block: Block) -> int:
+        """Register a read-only block of unit vectors (e.g. a memory-mapped segment).
+
+        `key` identifies the block; attaching it again with more rows replaces
+        it. The default copies the rows not seen yet into the store as
+        float32; backends that can score external memory directly override this.
+        """
+        seen = self._attached.get(key, 0)
+        if block.rows <= seen:
+            return 0
+        self.add(np.asarray(block.row_ids[seen:]), np.asarray(block.doc_ids[seen:]), block.dense(seen))
+        self._attached[key] = block.rows
+        return block.rows - seen
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+import numpy as np
+
+from .base import Block, GrowableRows, Hit, VectorStore, normalize
+
+# Cap on the (rows x queries) float32 score matrix of one batched scan.
+SCORE_BUDGET = 1 << 26
+
+
+class FlatStore(VectorStore):
+    """Exact brute-force search: one mat-vec over every stored vector.
+
+    Attached blocks (memory-mapped segments) are scored in place, without
+    copying them into process memory. Quantized blocks are scanned on their
+    codes and, with `rerank`, the best candidates are re-scored in float32.
+    """
+
+    name = "flat"
+
+    def __init__(self, dim: int, rerank: int = 0):
+        super().__init__(dim)
+        self.rerank = rerank
+        self._rows = GrowableRows(dim)
+        self._blocks: Dict[str, Block] = {}
+
+    def __len__(self) -> int:
+        return self._rows.size + sum(b.rows for b in list(self._blocks.values()))
+
+    def add(self, row_ids: np.ndarray, doc_ids: np.ndarray, vecs: np.ndarray) -> None:
+        self._rows.append(normalize(vecs), row_ids, doc_ids)
+
+    def attach(self, key: str, block: Block) -> int:
+        prev = self._blocks.get(key)
+        self._blocks[key] = block
+        return block.rows - (prev.rows if prev else 0)
+
+    def search(self, qvec: np.ndarray, top_k: int, rerank: Optional[int] = None, **params) -> List[Hit]:
+        return self.search_many(np.asarray(qvec)[None, :], top_k, rerank=rerank)[0]
+
+    def search_many(self, qvecs: np.ndarray, top_k: int, rerank: Optional[int] = None, **params) -> List[List[Hit]]:
+        """Score all queries against each block with one GEMM (in query chunks bounded by SCORE_BUDGET)."""
+        qs = normalize(np.atleast_2d(qvecs))
+        rerank = self.rerank if rerank is None else rerank
+        parts = [Block(*self._rows.view())] + list(self._blocks.values())
+        parts = [p for p in parts if p.rows]
+        out: List[List[Hit]] = [[] for _ in range(qs.shape[0])]
+        for p in parts:
+            step = max(1, SCORE_BUDGET // p.rows)
+            for start in range(0, qs.shape[0], step):
+                for j, hits in enumerate(p.top_many(qs[start : start + step], top_k, rerank=rerank), start):
+                    out[j].extend(hits)
+        if len(parts) > 1:
+            # each block contributed its own top-k; merge them
+            out = [sorted(hits, key=lambda h: -h[0])[:top_k] for hits in out]
+        return out
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from typing import List, Optional
+import threading
+import numpy as np
+
+from .base import GrowableRows, Hit, VectorStore, normalize, top_hits
+
+
+def kmeans(data: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns (k, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    n = data.shape[0]
+    k = min(k, n)
+    centroids = data[rng.choice(n, size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = assign_lists(data, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(data[order], starts[nonempty], axis=0)
+        empty = counts == 0
+        if empty.any():
+            # re-seed empty clusters with random points
+            sums[empty] = data[rng.choice(n, size=int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_lists(data: np.ndarray, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+    out = np.empty(data.shape[0], dtype=np.int64)
+    for i in range(0, data.shape[0], block):
+        out[i : i + block] = np.argmax(data[i : i + block] @ centroids.T, axis=1)
+    return out
+
+
+class IVFStore(VectorStore):
+    """Inverted-file approximate search (k-means coarse quantizer + probed lists).
+
+    Until `min_train` vectors have been added the store answers exactly by
+    brute force. Past that it trains `nlist` centroids on a sample and only
+    scores the `nprobe` lists closest to the query. The quantizer is
+    retrained when the store has grown `retrain_factor` times since the last
+    training, so list sizes stay balanced as the corpus grows.
+    """
+
+    name = "ivf"
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = 256,
+        nprobe: int = 8,
+        min_train: Optional[int] = None,
+        train_sample: int = 256,
+        retrain_factor: float = 4.0,
+    ):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train if min_train is not None else nlist * 39
+        self.train_sample = train_sample
+        self.retrain_factor = retrain_factor
+        self.centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._pending = GrowableRows(dim)
+        self._lists: List[GrowableRows] = []
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _all_rows(self):
+        parts = [self._pending.view()] + [lst.view() for lst in self._lists]
+        return (
+            np.concatenate([p[0] for p in parts]),
+            np.concatenate([p[1] for p in parts]),
+            np.concatenate([p[2] for p in parts]),
+        )
+
+    def train(self) -> None:
+        with self._lock:
+            mat, row_ids, doc_ids = self._all_rows()
+            if mat.shape[0] == 0:
+                return
+            rng = np.random.default_rng(0)
+            limit = self.nlist * self.train_sample
+            sample = mat if mat.shape[0] <= limit else mat[rng.choice(mat.shape[0], size=limit, replace=False)]
+            centroids = kmeans(sample, self.nlist)
+            lists = [GrowableRows(self.dim) for _ in range(centroids.shape[0])]
+            self._fill(lists, centroids, mat, row_ids, doc_ids)
+            self.centroids = centroids
+            self._lists = lists
+            self._pending = GrowableRows(self.dim)
+            self._trained_size = mat.shape[0]
+
+    @staticmethod
+    def _fill(lists: List[GrowableRows], centroids, mat, row_ids, doc_ids) -> None:
+        assign = assign_lists(mat, centroids)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(len(lists) + 1))
+        for li in range(len(lists)):
+            sel = order[bounds[li] : bounds[li + 1]]
+            if sel.size:
+                lists[li].append(mat[sel], row_ids[sel], doc_ids[sel])
+
+    def add(self, row_ids: np.ndarray, doc_ids: np.ndarray, vecs: np.ndarray) -> None:
+        vecs = normalize(vecs)
+        with self._lock:
+            if self.centroids is None:
+                self._pending.append(vecs, row_ids, doc_ids)
+            else:
+                self._fill(self._lists, self.centroids, vecs, np.asarray(row_ids), np.asarray(doc_ids))
+            self._size += vecs.shape[0]
+            need_train = (
+                self._size >= self.min_train
+                if self.centroids is None
+                else self._size >= self._trained_size * self.retrain_factor
+            )
+        if need_train:
+            self.train()
+
+    def search(
+        self, qvec: np.ndarray, top_k: int, nprobe: Optional[int] = None, exclude_ids: Optional[np.ndarray] = None, **params
+    ) -> List[Hit]:
+        """Best hits over the probed lists; `exclude_ids` (sorted) are dropped before the top-k cut."""
+        q = normalize(qvec)
+        with self._lock:
+            centroids = self.centroids
+            lists = list(self._lists)
+            pending = self._pending.view()
+        if centroids is None:
+            mat, row_ids, doc_ids = pending
+            if mat.shape[0] == 0:
+                return []
+            return self._top(mat @ q, row_ids, doc_ids, top_k, exclude_ids)
+        nprobe = max(1, min(nprobe or self.nprobe, centroids.shape[0]))
+        cscores = centroids @ q
+        probe = np.argpartition(-cscores, nprobe - 1)[:nprobe] if nprobe < len(cscores) else np.arange(len(cscores))
+        scores, rids, dids = [], [], []
+        for li in probe:
+            mat, row_ids, doc_ids = lists[li].view()
+            if mat.shape[0]:
+                scores.append(mat @ q)
+                rids.append(row_ids)
+                dids.append(doc_ids)
+        if not scores:
+            return []
+        return self._top(np.concatenate(scores), np.concatenate(rids), np.concatenate(dids), top_k, exclude_ids)
+
+    @staticmethod
+    def _top(scores, row_ids, doc_ids, top_k: int, exclude_ids: Optional[np.ndarray]) -> List[Hit]:
+        if exclude_ids is not None and exclude_ids.size:
+            keep = ~np.isin(row_ids, exclude_ids)
+            scores, row_ids, doc_ids = scores[keep], row_ids[keep], doc_ids[keep]
+        return top_hits(scores, row_ids, doc_ids, top_k)
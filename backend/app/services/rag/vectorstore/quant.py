@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import Optional, Tuple
+import numpy as np
+
+
+# Storage formats for unit vectors: bytes per component 4 / 2 / 1 (+4 per row for int8 scales).
+DTYPES = ("float32", "float16", "int8")
+# float32 scratch per chunk while scanning quantized codes: small enough to stay
+# in cache, so decoding and the BLAS product read it back from there.
+SCAN_BLOCK_BYTES = 1 << 21
+# float32 bit pattern of a float16 shifted left by 13 is its value * 2**-112.
+_F16_RESCALE = np.float32(2.0 ** 112)
+_F16_KEEP = np.uint32(0x8FFFFFFF).view(np.int32)  # sign + shifted exponent/mantissa
+
+
+def quantize(mat: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Encode float32 rows as `dtype`; int8 uses one symmetric scale per row.
+
+    Returns (codes, scales); `scales` is None unless `dtype` is int8.
+    """
+    mat = np.asarray(mat, dtype=np.float32)
+    if dtype == "float32":
+        return mat, None
+    if dtype == "float16":
+        return mat.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(mat).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(mat / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector dtype: {dtype}")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    out = np.asarray(codes).astype(np.float32)
+    if scales is not None:
+        out *= np.asarray(scales, dtype=np.float32)[:, None]
+    return out
+
+
+def scan(codes: np.ndarray, q: np.ndarray, scales: Optional[np.ndarray] = None, chunk: Optional[int] = None) -> np.ndarray:
+    """Dot products of every row of `codes` with `q` (dim,) or the columns of `q` (dim, m).
+
+    float32 codes go straight to BLAS; float16/int8 codes are decoded
+    `chunk` rows at a time into one reused, cache-sized float32 buffer, so
+    the resident (and streamed) matrix stays at 2 or 1 bytes per component.
+    float16 is decoded with integer bit operations (NumPy's float16 cast
+    is not vectorized), int8 with a plain cast; the per-row scale is
+    applied to the scores, not the codes.
+    """
+    if codes.dtype == np.float32:
+        return codes @ q
+    n, dim = codes.shape
+    chunk = chunk or max(1, SCAN_BLOCK_BYTES // (4 * max(1, dim)))
+    half = codes.dtype == np.float16
+    if half:
+        codes, q = codes.view(np.int16), q * _F16_RESCALE
+    buf = np.empty((min(chunk, n), dim), dtype=np.int32 if half else np.float32)
+    out = np.empty((n,) + q.shape[1:], dtype=np.float32)
+    for i in range(0, n, chunk):
+        b = buf[: min(chunk, n - i)]
+        np.copyto(b, codes[i : i + chunk], casting="unsafe")
+        if half:
+            # sign-extended int16 << 13 lands exponent and mantissa in place;
+            # clearing bits 28-30 leaves only the sign above them.
+            np.left_shift(b, 13, out=b)
+            np.bitwise_and(b, _F16_KEEP, out=b)
+            b = b.view(np.float32)
+        out[i : i + chunk] = b @ q
+    if scales is not None:
+        out *= np.asarray(scales[:n]).reshape((n,) + (1,) * (out.ndim - 1))
+    return out
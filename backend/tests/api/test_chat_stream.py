@@ -0,0 +1,63 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.v1 import chatbot
+from app.main import app
+
+
+class _FakeLLM:
+    provider = "openai"
+
+    async def astream(self, messages, max_tokens=512, use_cache=True):
+        assert "Apple results" in messages[1]["content"]
+        yield "AAPL "
+        yield "is up"
+
+
+def _events(text):
+    out = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        out.append((fields["event"], json.loads(fields["data"])))
+    return out
+
+
+def test_chat_stream_sends_sources_then_tokens(monkeypatch):
+    sources = [{"title": "Apple results", "url": "https://example.com/a"}]
+    monkeypatch.setattr(chatbot.LLMClient, "from_env", classmethod(lambda cls: _FakeLLM()))
+    monkeypatch.setattr(chatbot, "_chat_context", lambda req: sources)
+    with TestClient(app).stream("POST", "/api/v1/chat/stream", json={"message": "AAPL?"}) as r:
+        assert r.headers["content-type"].startswith("text/event-stream")
+        body = "".join(r.iter_text())
+    assert _events(body) == [("sources", sources), ("token", "AAPL "), ("token", "is up"), ("done", {})]
+
+
+def test_chat_stream_reports_failures_as_error_event(monkeypatch):
+    def boom(req):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(chatbot.LLMClient, "from_env", classmethod(lambda cls: _FakeLLM()))
+    monkeypatch.setattr(chatbot, "_chat_context", boom)
+    body = TestClient(app).post("/api/v1/chat/stream", json={"message": "AAPL?"}).text
+    assert _events(body) == [("error", {"detail": "index unavailable"})]
+
+
+def test_requests_keep_undated_documents_by_default():
+    # a date window would drop documents without published_at (NO_DAY)
+    assert chatbot.ChatRequest(message="q").days == 0
+    assert chatbot.RetrieveRequest(questions=["q"]).days == 0
+    assert chatbot._since_day(0) is None
+
+
+def test_invalid_embedding_model_is_a_400(monkeypatch):
+    monkeypatch.setattr(chatbot.LLMClient, "from_env", classmethod(lambda cls: _FakeLLM()))
+    client = TestClient(app)
+    for path, body in (
+        ("/api/v1/chat/stream", {"message": "AAPL?", "model": "hashing-0"}),
+        ("/api/v1/chat", {"message": "AAPL?", "model": "hashing-0"}),
+        ("/api/v1/chat/retrieve", {"questions": ["AAPL?"], "model": "hashing-0"}),
+        ("/api/v1/rag/index", {"model": "hashing-0"}),
+    ):
+        r = client.post(path, json=body)
+        assert r.status_code == 400 and "hashing dim" in r.json()["detail"]
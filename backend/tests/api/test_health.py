@@ -1,2 +1,29 @@
 def test_placeholder():
     assert True
+
+
+def _broken_loader():
+    raise OSError("download failed")
+
+
+def test_health_reports_model_readiness(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.api.v1 import health
+    from app.main import app
+    from app.services.nlp.registry import ModelRegistry
+
+    registry = ModelRegistry()
+    registry.register("sentiment", _broken_loader)
+    monkeypatch.setattr(health, "get_model_registry", lambda: registry)
+    client = TestClient(app)
+    assert client.get("/api/v1/health").json()["ready"] is False
+    assert client.get("/api/v1/health/ready").status_code == 503
+    registry.get("sentiment")
+    body = client.get("/api/v1/health").json()
+    assert body["status"] == "healthy" and body["models"]["sentiment"]["state"] == "failed"
+    assert "download failed" in body["models"]["sentiment"]["error"]
+    registry.slots["sentiment"].loader = lambda: None
+    registry.slots["sentiment"].retry_at = 0
+    registry.get("sentiment")
+    assert client.get("/api/v1/health/ready").status_code == 200
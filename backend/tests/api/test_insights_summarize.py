@@ -0,0 +1,68 @@
+import asyncio
+import time
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.insights import _run_summaries
+from app.db.models import Base
+from app.db.models.document import Document
+from app.db.models.insights import DailySummary
+from app.db.models.nlp_annotation import NLPAnnotation
+
+
+class _SlowLLM:
+    model = "fake"
+
+    def __init__(self):
+        self.prompts = []
+        self.active = self.peak = 0
+
+    async def asummarize(self, messages, max_tokens=512, use_cache=True):
+        self.prompts.append(messages[1]["content"])
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.1)
+        self.active -= 1
+        return "summary of " + messages[1]["content"].split("\n")[0]
+
+
+def _db():
+    # one shared connection: the job reads and writes from threadpool threads
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    tickers = [f"T{i}" for i in range(20)]
+    for i in range(60):
+        doc = Document(title=f"doc {i}", url=f"https://example.com/{i}", published_at=datetime(2024, 5, 2, 9, i % 60))
+        db.add(doc)
+        db.flush()
+        db.add(NLPAnnotation(document_id=doc.id, entities={"tickers": [tickers[i % 20], "SPY"]}))
+    db.commit()
+    return db, tickers
+
+
+def test_company_scope_gathers_once_and_runs_llm_calls_concurrently():
+    db, tickers = _db()
+    llm = _SlowLLM()
+    t0 = time.perf_counter()
+    used = asyncio.run(
+        _run_summaries(db, llm, date(2024, 5, 2), date(2024, 5, 2), "company", tickers + ["NONE"], 256, concurrency=10)
+    )
+    elapsed = time.perf_counter() - t0
+    assert used == 60
+    assert llm.peak == 10
+    assert elapsed < 1.0  # 20 calls of 0.1s, 10 at a time
+    rows = db.scalars(select(DailySummary).order_by(DailySummary.id)).all()
+    assert [r.scope_key for r in rows] == tickers  # no summary for a ticker without documents
+    assert all(len(r.sources) == 3 and r.summary == f"summary of Scope: company {r.scope_key}" for r in rows)
+
+
+def test_global_scope_writes_one_summary():
+    db, _ = _db()
+    llm = _SlowLLM()
+    assert asyncio.run(_run_summaries(db, llm, date(2024, 5, 2), date(2024, 5, 2), "global", None, 256)) == 60
+    (row,) = db.scalars(select(DailySummary)).all()
+    assert row.scope == "global" and row.scope_key is None and len(row.sources) == 20
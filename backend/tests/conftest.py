@@ -0,0 +1,9 @@
+import importlib
+import pkgutil
+
+import app.db.models
+
+
+# Register every model on Base.metadata, so tests can create_all() without importing FK targets themselves.
+for _mod in pkgutil.iter_modules(app.db.models.__path__):
+    importlib.import_module(f"app.db.models.{_mod.name}")
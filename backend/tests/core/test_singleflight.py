@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from app.core.singleflight import SingleFlight, request_key
+
+
+class _Body(BaseModel):
+    message: str
+    top_k: int = 4
+
+
+def test_request_key_ignores_whitespace_but_not_values():
+    assert request_key(_Body(message=" What  about\nAAPL? ")) == request_key(_Body(message="What about AAPL?"))
+    assert request_key(_Body(message="What about AAPL?", top_k=5)) != request_key(_Body(message="What about AAPL?"))
+
+
+def test_concurrent_calls_share_one_computation_then_cache():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"n": len(calls)}
+
+    async def main():
+        flight = SingleFlight("t", ttl=60)
+        first = await asyncio.gather(*[flight.do("k", compute) for _ in range(20)])
+        again = await flight.do("k", compute)
+        fresh = await flight.do("k", compute, fresh=True)
+        return first, again, fresh
+
+    first, again, fresh = asyncio.run(main())
+    assert first == [{"n": 1}] * 20 and again == {"n": 1}
+    assert fresh == {"n": 2} and len(calls) == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise LookupError("no data")
+
+    async def main():
+        flight = SingleFlight("t", ttl=60)
+        results = await asyncio.gather(*[flight.do("k", fail) for _ in range(5)], return_exceptions=True)
+        assert all(isinstance(r, LookupError) for r in results)
+        with pytest.raises(LookupError):
+            await flight.do("k", fail)
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_rejected_results_are_shared_but_not_cached():
+    replies = iter(["", "answer"])
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return next(replies)
+
+    async def main():
+        flight = SingleFlight("t", ttl=60, keep=bool)
+        assert await asyncio.gather(flight.do("k", compute), flight.do("k", compute)) == ["", ""]
+        assert await flight.do("k", compute) == "answer"  # the empty reply was not served again
+        assert await flight.do("k", compute) == "answer"
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight("t", ttl=0)
+        quitter = asyncio.ensure_future(flight.do("k", slow))
+        stayer = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        quitter.cancel()
+        return await stayer
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,32 @@
+import sqlite3
+
+from app.core.sqlite_lru import SQLiteLRU
+
+
+def _rows(path, table):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_row_counter_stays_exact_across_writers_and_overwrites(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    evicted = []
+    a = SQLiteLRU(path, "t", max_entries=3, on_evict=evicted.append)
+    b = SQLiteLRU(path, "t", max_entries=3, on_evict=evicted.append)  # another worker on the same file
+    a.put_many({"k1": b"1", "k2": b"2"})
+    b.put_many({"k2": b"two", "k3": b"3"})  # k2 overwritten, not counted twice
+    assert len(a) == len(b) == _rows(path, "t") == 3
+    a.get("k1")  # k2 is now the least recently used
+    b.put("k4", b"4")
+    assert len(a) == _rows(path, "t") == 3 and sum(evicted) == 1
+    assert set(a.get_many(["k1", "k2", "k3", "k4"])) == {"k1", "k3", "k4"}
+    assert a.get("k3") == b"3"
+
+
+def test_ttl_expires_on_read(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.sqlite_lru.time.time", lambda: now[0])
+    lru = SQLiteLRU(str(tmp_path / "c.sqlite"), "t", max_entries=10, ttl=60)
+    lru.put("a", b"A")
+    now[0] += 61
+    assert lru.get("a") is None and len(lru) == 0
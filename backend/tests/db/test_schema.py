@@ -0,0 +1,41 @@
+import numpy as np
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, ensure_columns, ensure_indexes
+from app.db.models.document import Document
+from app.services.rag import embeddings
+from app.services.rag.embed_cache import EmbeddingCache
+from app.services.rag.indexer import run_incremental
+from app.services.rag.segments import SegmentStore
+
+
+BASELINE_EMBEDDINGS = (
+    "CREATE TABLE embeddings (id INTEGER PRIMARY KEY, document_id INTEGER REFERENCES documents(id),"
+    " model VARCHAR(100), vector BLOB, content TEXT)"
+)
+
+
+def test_baseline_embeddings_table_is_upgraded_in_place(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.tables["documents"].create(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text(BASELINE_EMBEDDINGS))
+        conn.execute(text("INSERT INTO embeddings (model, content) VALUES ('m', 'legacy row')"))
+
+    Base.metadata.create_all(bind=engine)  # what startup did before: leaves the old table alone
+    ensure_columns(engine)
+    ensure_columns(engine)  # idempotent
+    ensure_indexes(engine)
+    cols = {c["name"] for c in inspect(engine).get_columns("embeddings")}
+    assert {"segment", "offset", "content_hash"} <= cols
+
+    monkeypatch.setattr(embeddings, "_embed_openai", lambda texts, model_name: np.ones((len(texts), 2), dtype=np.float32))
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: EmbeddingCache(str(tmp_path / "c.sqlite")))
+    db = sessionmaker(bind=engine)()
+    db.add(Document(url="http://x/1", content="story"))
+    db.commit()
+    res = run_incremental(db, "m", SegmentStore("m", root=str(tmp_path / "vectors")), limit=10)
+    assert res["created"] == 1
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT content FROM embeddings WHERE segment IS NULL")).scalars().all() == ["legacy row"]
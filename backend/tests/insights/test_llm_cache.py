@@ -0,0 +1,50 @@
+import asyncio
+
+from app.services.insights.llm_cache import LLMCache, response_key
+from app.services.insights.llm_client import LLMClient
+
+
+MESSAGES = [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "Scope: global\nSources:\n- a"}]
+
+
+class _CountingClient(LLMClient):
+    calls = 0
+
+    def complete(self, messages, max_tokens=512):
+        type(self).calls += 1
+        return f"answer {type(self).calls}"
+
+    async def acomplete(self, messages, max_tokens=512):
+        return self.complete(messages, max_tokens)
+
+
+def test_response_key_normalizes_whitespace_only():
+    spaced = [{"role": "System", "content": "Be  brief. "}, {"role": "user", "content": "Scope: global \nSources:\n - a"}]
+    assert response_key("openai", "m", spaced, 512) == response_key("openai", "m", MESSAGES, 512)
+    assert response_key("openai", "m", MESSAGES, 256) != response_key("openai", "m", MESSAGES, 512)
+    assert response_key("hf", "m", MESSAGES, 512) != response_key("openai", "m", MESSAGES, 512)
+
+
+def test_ttl_and_lru_bound(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "c.sqlite"), ttl=60, max_entries=2)
+    now = [1000.0]
+    monkeypatch.setattr("app.core.sqlite_lru.time.time", lambda: now[0])
+    cache.put("a", "A")
+    now[0] += 1
+    cache.put("b", "B")
+    now[0] += 1
+    assert cache.get("a") == "A"  # a is now the most recently used
+    cache.put("c", "C")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+    now[0] += 120
+    assert cache.get("a") is None and len(cache) == 1
+
+
+def test_summaries_hit_the_cache_unless_bypassed(tmp_path):
+    _CountingClient.calls = 0
+    client = _CountingClient("openai", "m", api_key="k", cache=LLMCache(str(tmp_path / "c.sqlite")))
+    assert client.summarize(MESSAGES) == "answer 1"
+    assert asyncio.run(client.asummarize(MESSAGES)) == "answer 1"
+    assert client.summarize(MESSAGES, use_cache=False) == "answer 2"  # refreshes the entry
+    assert client.summarize(MESSAGES) == "answer 2"
+    assert _CountingClient.calls == 2
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.insights.llm_cache import LLMCache
+from app.services.insights.llm_client import LLMClient
+
+
+class _CompletionStandIn(BaseHTTPRequestHandler):
+    """Keep-alive /chat/completions server; `script` gives the status of successive requests."""
+
+    protocol_version = "HTTP/1.1"
+    script = []
+    ports = []
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            cls.ports.append(self.client_address[1])
+            status = cls.script.pop(0) if cls.script else 200
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.active -= 1
+        out = json.dumps({"choices": [{"message": {"content": " ok "}}]} if status == 200 else {}).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _CompletionStandIn.script, _CompletionStandIn.ports = [], []
+    _CompletionStandIn.active = _CompletionStandIn.peak = 0
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionStandIn)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_retries_429_and_5xx_then_succeeds(server):
+    _CompletionStandIn.script = [429, 503]
+    client = LLMClient("openai", "m", api_key="k", base_url=server, backoff=0.01)
+    assert asyncio.run(client.acomplete(MESSAGES)) == "ok"
+    assert len(_CompletionStandIn.ports) == 3
+
+
+def test_gives_up_after_max_retries(server, tmp_path):
+    _CompletionStandIn.script = [500] * 10
+    client = LLMClient(
+        "openai", "m", api_key="k", base_url=server + "/v1", max_retries=2, backoff=0.01,
+        cache=LLMCache(str(tmp_path / "c.sqlite")),
+    )
+    assert client.summarize(MESSAGES) is None
+    assert asyncio.run(client.asummarize(MESSAGES)) is None
+    assert len(_CompletionStandIn.ports) == 6
+
+
+def test_pooled_connections_are_reused_and_bounded(server):
+    client = LLMClient("openai", "m", api_key="k", base_url=server + "/pool", concurrency=2)
+
+    async def burst():
+        for _ in range(2):  # the second round must reuse the kept-alive sockets
+            assert await asyncio.gather(*[client.acomplete(MESSAGES) for _ in range(6)]) == ["ok"] * 6
+
+    asyncio.run(burst())
+    assert _CompletionStandIn.peak <= 2
+    assert len(set(_CompletionStandIn.ports)) <= 2
+    assert client.complete(MESSAGES) == "ok" and client.complete(MESSAGES) == "ok"
+    assert len(set(_CompletionStandIn.ports[-2:])) == 1
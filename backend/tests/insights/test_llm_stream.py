@@ -0,0 +1,72 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.insights.llm_cache import LLMCache
+from app.services.insights.llm_client import LLMClient, sse_data
+
+
+class _StreamingStandIn(BaseHTTPRequestHandler):
+    """Local streaming LLM server: OpenAI chat completions and HF text-generation-inference."""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append((self.path, body))
+        if self.path.endswith("/chat/completions"):
+            events = [{"choices": [{"delta": {"role": "assistant"}}]}]
+            events += [{"choices": [{"delta": {"content": t}}]} for t in ("Hel", "lo", " world")]
+            lines = [f"data: {json.dumps(e)}" for e in events] + ["data: [DONE]"]
+        else:
+            toks = [{"text": "Bon", "special": False}, {"text": "jour", "special": False}, {"text": "</s>", "special": True}]
+            lines = [f"data:{json.dumps({'token': t})}" for t in toks]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for line in lines:  # one chunk per event, as a real server flushes them
+            chunk = (line + "\n\n").encode()
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _StreamingStandIn.requests = []
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _StreamingStandIn)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def test_sse_data_joins_multiline_events():
+    lines = ["event: x", "data: a", "data: b", "", ": comment", "data:c", ""]
+    assert list(sse_data(iter(lines))) == ["a\nb", "c"]
+
+
+async def _collect(stream):
+    return [piece async for piece in stream]
+
+
+def test_openai_stream_yields_deltas(server, tmp_path):
+    client = LLMClient("openai", "gpt-test", api_key="k", base_url=server, cache=LLMCache(str(tmp_path / "c.sqlite")))
+    pieces = asyncio.run(_collect(client.astream([{"role": "user", "content": "hi"}], max_tokens=5)))
+    assert pieces == ["Hel", "lo", " world"]
+    path, body = _StreamingStandIn.requests[0]
+    assert path == "/chat/completions" and body["stream"] is True and body["max_tokens"] == 5
+
+
+def test_hf_stream_skips_special_tokens(server, tmp_path):
+    client = LLMClient("hf", "org/model", hf_api_token="t", base_url=server, cache=LLMCache(str(tmp_path / "c.sqlite")))
+    assert "".join(asyncio.run(_collect(client.astream([{"role": "user", "content": "hi"}])))) == "Bonjour"
+    path, body = _StreamingStandIn.requests[0]
+    assert path == "/org/model" and body["stream"] is True
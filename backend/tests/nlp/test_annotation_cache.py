@@ -0,0 +1,53 @@
+from prometheus_client import REGISTRY
+
+from app.services.nlp.annotation_cache import AnnotationCache, annotation_key
+from app.services.nlp.pipeline import cached_stream
+
+
+def _counter(name):
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+def _annotator(calls):
+    def annotate(items):
+        for doc_id, text in items:
+            calls.append(text)
+            yield doc_id, {"entities": {}, "events": {}, "sentiment": {"text": text}}
+    return annotate
+
+
+def test_duplicates_are_annotated_once_and_reused_across_runs(tmp_path):
+    items = [(1, "Apple beats  estimates"), (2, "Tesla cuts jobs"), (3, "Apple beats estimates"), (4, "Tesla cuts jobs")]
+    calls = []
+    hits0, misses0 = _counter("nlp_annotation_cache_hits_total"), _counter("nlp_annotation_cache_misses_total")
+
+    out = dict(cached_stream(items, _annotator(calls), AnnotationCache(str(tmp_path / "c.sqlite"))))
+    assert sorted(out) == [1, 2, 3, 4]
+    assert calls == ["Apple beats  estimates", "Tesla cuts jobs"]  # whitespace-normalized duplicates reused
+    assert out[3] == out[1]
+
+    # a new cache object on the same file: a later run finds everything
+    out = dict(cached_stream(items, _annotator(calls), AnnotationCache(str(tmp_path / "c.sqlite"))))
+    assert len(calls) == 2 and sorted(out) == [1, 2, 3, 4]
+    assert _counter("nlp_annotation_cache_hits_total") - hits0 == 6
+    assert _counter("nlp_annotation_cache_misses_total") - misses0 == 2
+
+
+def test_model_config_change_invalidates(tmp_path, monkeypatch):
+    cache = AnnotationCache(str(tmp_path / "c.sqlite"))
+    calls = []
+    monkeypatch.setenv("FIN_SENTIMENT_MODEL", "")
+    list(cached_stream([(1, "Fed raises rates")], _annotator(calls), cache))
+    before = annotation_key("Fed raises rates")
+    monkeypatch.setenv("FIN_SENTIMENT_MODEL", "ProsusAI/finbert")
+    assert annotation_key("Fed raises rates") != before
+    list(cached_stream([(1, "Fed raises rates")], _annotator(calls), cache))
+    assert len(calls) == 2
+
+
+def test_lru_eviction(tmp_path):
+    cache = AnnotationCache(str(tmp_path / "c.sqlite"), max_entries=2)
+    cache.put_many({"a": {"x": 1}, "b": {"x": 2}})
+    cache.get_many(["a"])
+    cache.put_many({"c": {"x": 3}})
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
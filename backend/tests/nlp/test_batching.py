@@ -0,0 +1,48 @@
+from app.services.nlp import ner, sentiment
+from app.services.nlp.batching import length_batches
+from app.services.nlp.pipeline import annotate_text, annotate_texts
+
+
+class _FakeClassifier:
+    """Stands in for a transformers text-classification pipeline; records batch calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, inputs, top_k=None, batch_size=1):
+        self.calls.append((list(inputs), batch_size))
+        return [[{"label": "Positive" if "up" in t else "Negative", "score": 0.9}] for t in inputs]
+
+
+class _FakeNer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, inputs, batch_size=1):
+        self.calls.append(list(inputs))
+        return [[{"entity_group": "ORG", "word": t.split()[0]}] for t in inputs]
+
+
+def test_length_batches_sorts_and_skips_empty():
+    texts = ["ccc", "", "a", "bbbb", "dd"]
+    assert length_batches(texts, 2) == [[2, 4], [0, 3]]
+
+
+def test_batched_models_map_results_back(monkeypatch):
+    clf, tagger = _FakeClassifier(), _FakeNer()
+    monkeypatch.setattr(sentiment, "_finbert_pipeline", clf)
+    monkeypatch.setattr(ner, "_hf_ner", tagger)
+    texts = ["Apple shares up strongly today", "Tesla down", "", "Nvidia up", "Intel falls sharply on weak guidance"]
+    anns = annotate_texts(texts, batch_size=2)
+    assert [len(batch) for batch, _ in clf.calls] == [2, 2]
+    assert [b for _, b in clf.calls] == [2, 2]
+    assert tagger.calls == [["Nvidia up", "Tesla down"], ["Apple shares up strongly today", "Intel falls sharply on weak guidance"]]
+    assert [a["sentiment"]["label"] for a in anns] == ["positive", "negative", "neutral", "positive", "negative"]
+    assert [a["entities"]["orgs"] for a in anns] == [["Apple"], ["Tesla"], [], ["Nvidia"], ["Intel"]]
+    assert anns[2] == annotate_text("")
+
+
+def test_without_models_matches_per_text_annotation():
+    texts = ["Microsoft Corp reports Q3 earnings beat; MSFT up", "Layoffs at Meta as NASDAQ slips", ""]
+    assert annotate_texts(texts, batch_size=2) == [annotate_text(t) for t in texts]
+
@@ -0,0 +1,57 @@
+from app.services.etl.preprocess import simple_topic_filter
+from app.services.nlp.events import extract_events
+from app.services.nlp.keywords import KeywordMatcher
+from app.services.nlp.ner import _extract_entities_heuristic
+
+
+def test_matcher_finds_overlapping_whole_word_terms():
+    m = KeywordMatcher([("dow", "idx"), ("dow jones", "idx"), ("jones industrial", "other"), ("eps", "earn")])
+    text = "The Dow Jones Industrial average rose; EPS growth, not steps."
+    assert [(i, t) for i, t, _ in m.finditer(text)] == [(1, "dow"), (2, "dow jones"), (3, "jones industrial"), (7, "eps")]
+    assert m.hits(text) == {"idx": ["dow", "dow jones"], "other": ["jones industrial"], "earn": ["eps"]}
+    assert not m.search("windows and steps")
+
+
+def test_punctuated_terms_and_failure_links():
+    m = KeywordMatcher([("s&p 500", "spx"), ("m&a", "deal"), ("a b c d", "x"), ("b c", "y")])
+    assert m.hits("S&P 500 up after M&A news") == {"spx": ["s&p 500"], "deal": ["m&a"]}
+    assert m.hits("a b c x") == {"y": ["b c"]}  # fails out of the long term into the short one
+
+
+def test_events_and_indices_use_word_boundaries():
+    events = extract_events("Quarterly results: revenue and EPS beat; merger talks, job cuts ahead")["events"]
+    assert [(e["type"], e["triggers"]) for e in events] == [
+        ("merger_acquisition", ["merger"]),
+        ("earnings", ["quarterly results", "eps", "revenue"]),
+        ("layoffs", ["job cuts"]),
+    ]
+    assert extract_events("He steps through the window")["events"] == []
+    assert _extract_entities_heuristic("The Nasdaq and S&P500 rallied")["indices"] == ["Nasdaq", "S&P 500"]
+
+
+def test_plural_and_prefix_modes_match_the_last_word():
+    plural = KeywordMatcher([("merger", "m"), ("acquire", "a"), ("job cut", "l"), ("eps", "e")], match="plural")
+    assert plural.hits("Mergers: it acquires rivals, more job cuts") == {"m": ["merger"], "a": ["acquire"], "l": ["job cut"]}
+    assert not plural.search("windows and steps")
+    prefix = KeywordMatcher([("fed", "f"), ("interest rate", "r"), ("b c", "y")], match="prefix")
+    assert [(i, t) for i, t, _ in prefix.finditer("Federal interest rates; a b cat")] == [
+        (0, "fed"), (2, "interest rate"), (6, "b c"),
+    ]
+    assert not prefix.search("the unfed interest")
+
+
+def test_events_match_plurals():
+    text = "Mergers and acquisitions, takeovers, partnerships and collaborations; layoffs loom"
+    assert [(e["type"], e["triggers"]) for e in extract_events(text)["events"]] == [
+        ("merger_acquisition", ["merger", "acquisition", "takeover"]),
+        ("layoffs", ["layoff"]),
+        ("partnership", ["partnership", "collaboration"]),
+    ]
+
+
+def test_topic_filter_matches_word_prefixes():
+    item = {"title": "Federal Reserve holds rates", "summary": "", "content": "Inflation cools; cryptocurrency slips"}
+    assert simple_topic_filter(item, ["inflation"])
+    assert simple_topic_filter(item, ["fed"]) and simple_topic_filter(item, ["crypto"])
+    assert not simple_topic_filter(item, ["reserves", "ation"])
+    assert simple_topic_filter(item, [])
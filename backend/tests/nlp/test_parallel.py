@@ -0,0 +1,14 @@
+from app.services.nlp.parallel import AnnotationPool
+from app.services.nlp.pipeline import annotate_stream
+
+
+def test_process_pool_streams_same_annotations():
+    texts = [f"Apple (AAPL) reported Q{i % 4 + 1} earnings; Nasdaq up {i}" for i in range(50)] + ["", "Layoffs at Meta"]
+    items = list(enumerate(texts))
+    pool = AnnotationPool(2)
+    try:
+        parallel = dict(pool.annotate(iter(items), chunk_size=7))
+    finally:
+        pool.shutdown()
+    assert parallel == dict(annotate_stream(items))
+    assert len(parallel) == len(texts)
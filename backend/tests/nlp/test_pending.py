@@ -0,0 +1,73 @@
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, ensure_indexes
+from app.db.models.document import Document
+from app.db.models.nlp_annotation import NLPAnnotation
+from app.services.nlp import pipeline
+from app.services.nlp.annotation_cache import AnnotationCache
+
+
+def _factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nlp.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add_all([Document(title=f"Apple earnings {i}", url=f"https://example.com/{i}") for i in range(1, 11)])
+    db.add_all([NLPAnnotation(document_id=i) for i in (2, 3, 7)])
+    db.commit()
+    return engine, factory
+
+
+def test_pending_ids_page_with_keyset_cursor(tmp_path):
+    engine, factory = _factory(tmp_path)
+    db = factory()
+    assert pipeline.pending_ids(db, 3) == [1, 4, 5]
+    assert pipeline.pending_ids(db, 3, after_id=5) == [6, 8, 9]
+    assert pipeline.pending_ids(db, 3, after_id=9) == [10]
+    with engine.connect() as conn:
+        sql = select(Document.id).where(pipeline.pending_filter(0)).compile(engine, compile_kwargs={"literal_binds": True})
+        plan = " ".join(r[-1] for r in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert "ix_nlp_annotations_document_id" in plan
+
+
+def test_run_pipeline_resumes_from_cursor(tmp_path, monkeypatch):
+    _, factory = _factory(tmp_path)
+    monkeypatch.setattr(pipeline, "SessionLocal", factory)
+    monkeypatch.setattr(pipeline, "get_annotation_cache", lambda: AnnotationCache(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(pipeline, "ANNOTATE_CHUNK", 2)  # several keyset pages per run
+    first = pipeline.run_nlp_pipeline(limit=4, workers=0)
+    assert first == {"processed": 4, "created": 4, "next_cursor": 6}
+    rest = pipeline.run_nlp_pipeline(limit=4, workers=0, cursor=first["next_cursor"])
+    assert rest == {"processed": 3, "created": 3, "next_cursor": None}
+    db = factory()
+    annotated = db.scalars(select(NLPAnnotation.document_id).order_by(NLPAnnotation.document_id)).all()
+    assert annotated == list(range(1, 11))
+
+
+def test_cursor_stops_before_a_failed_write(tmp_path, monkeypatch):
+    _, factory = _factory(tmp_path)
+    monkeypatch.setattr(pipeline, "SessionLocal", factory)
+    real = pipeline.annotate_stream
+
+    def annotate(items, batch_size):
+        for doc_id, ann in real(items, batch_size):
+            yield doc_id, ({**ann, "events": [object()]} if doc_id == 5 else ann)  # 5 cannot be saved
+
+    monkeypatch.setattr(pipeline, "annotate_stream", annotate)
+    first = pipeline.run_nlp_pipeline(limit=10, workers=0, use_cache=False)
+    assert first == {"processed": 7, "created": 6, "next_cursor": 4}
+    monkeypatch.setattr(pipeline, "annotate_stream", real)
+    rest = pipeline.run_nlp_pipeline(limit=10, workers=0, use_cache=False, cursor=first["next_cursor"])
+    assert rest == {"processed": 1, "created": 1, "next_cursor": None}
+
+
+def test_ensure_indexes_adds_index_to_existing_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE nlp_annotations (id INTEGER PRIMARY KEY, document_id INTEGER)"))
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+    with engine.connect() as conn:
+        names = {r[1] for r in conn.execute(text("PRAGMA index_list('nlp_annotations')"))}
+    assert "ix_nlp_annotations_document_id" in names
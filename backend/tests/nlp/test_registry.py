@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+from app.services.nlp.registry import ModelRegistry, ModelSlot
+
+
+class _Loader:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        r = self.results.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+def test_failed_load_is_cached_with_backoff():
+    now = [0.0]
+    loader = _Loader([OSError("no weights"), OSError("still none"), "model"])
+    slot = ModelSlot("sentiment", loader, retry=10, retry_max=15, clock=lambda: now[0])
+    assert slot.get() is None and slot.state == "failed"
+    now[0] = 9
+    assert slot.get() is None and loader.calls == 1  # within the backoff: no new attempt
+    now[0] = 10
+    assert slot.get() is None and loader.calls == 2
+    assert slot.status()["retry_in_sec"] == 15  # doubled, capped at retry_max
+    now[0] = 25
+    assert slot.get() == "model" and slot.state == "ready"
+    assert slot.get() == "model" and loader.calls == 3
+
+
+def test_warm_up_loads_in_background_and_reports_readiness():
+    registry = ModelRegistry()
+    registry.register("vader", _Loader(["vader"]))
+    registry.register("ner", _Loader([None]))  # FIN_NER_MODEL not set
+    assert not registry.ready
+    registry.warm_up().join(5)
+    assert registry.ready
+    assert registry.status() == {"vader": {"state": "ready", "load_sec": 0.0}, "ner": {"state": "disabled", "load_sec": 0.0}}
+
+
+def test_app_import_leaves_models_and_parsers_unloaded():
+    code = (
+        "import sys, app.main; "
+        "print(sorted(m for m in ('vaderSentiment', 'transformers', 'feedparser', 'bs4') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,63 @@
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.models.nlp_annotation import NLPAnnotation
+from app.services.nlp.writer import AnnotationWriter
+
+
+ANN = {"entities": [{"text": "Apple", "label": "ORG"}], "sentiment": {"label": "positive"}, "events": []}
+
+
+def _session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nlp.db'}")
+    Base.metadata.create_all(bind=engine)
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+    return sessionmaker(bind=engine)(), commits
+
+
+def test_flushes_every_n_rows_in_one_transaction(tmp_path):
+    db, commits = _session(tmp_path)
+    with AnnotationWriter(db, batch_rows=4, flush_ms=60_000) as writer:
+        for i in range(10):
+            writer.add(i + 1, ANN)
+        assert writer.written == 8
+    assert (writer.written, writer.flushes, len(commits)) == (10, 3, 3)
+    rows = db.scalars(select(NLPAnnotation).order_by(NLPAnnotation.document_id)).all()
+    assert [r.document_id for r in rows] == list(range(1, 11))
+    assert rows[0].entities == ANN["entities"] and rows[0].sentiment == ANN["sentiment"]
+
+
+def test_flushes_when_oldest_row_is_due(tmp_path):
+    db, _ = _session(tmp_path)
+    now = [0.0]
+    writer = AnnotationWriter(db, batch_rows=100, flush_ms=50, clock=lambda: now[0])
+    writer.add(1, ANN)
+    now[0] = 0.02
+    writer.add(2, ANN)
+    assert writer.written == 0
+    now[0] = 0.06
+    writer.add(3, ANN)
+    assert writer.written == 3
+
+
+def test_flush_if_due_without_new_rows(tmp_path):
+    db, _ = _session(tmp_path)
+    now = [0.0]
+    writer = AnnotationWriter(db, batch_rows=100, flush_ms=50, clock=lambda: now[0])
+    writer.add(1, ANN)
+    assert writer.flush_if_due() == 0
+    now[0] = 0.06
+    assert writer.flush_if_due() == 1 and writer.written == 1
+    assert writer.flush_if_due() == 0
+
+
+def test_failed_batch_falls_back_to_row_inserts(tmp_path):
+    db, _ = _session(tmp_path)
+    with AnnotationWriter(db, batch_rows=3) as writer:
+        writer.add(1, ANN)
+        writer.add(2, {**ANN, "events": [object()]})  # not JSON serializable: fails the batch and its row
+        writer.add(3, ANN)
+    assert (writer.written, writer.failed, writer.failed_ids) == (2, 1, [2])
+    assert db.scalars(select(NLPAnnotation.document_id).order_by(NLPAnnotation.document_id)).all() == [1, 3]
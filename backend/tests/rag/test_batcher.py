@@ -0,0 +1,90 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.models.document import Document
+from app.db.models.embedding import Embedding
+from app.services.rag import embeddings
+from app.services.rag.batcher import EmbeddingClient, plan_batches
+from app.services.rag.embed_cache import EmbeddingCache
+from app.services.rag.indexer import index_documents
+from app.services.rag.segments import SegmentStore
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    """Local OpenAI-compatible /embeddings server; fails every 3rd request with 429."""
+
+    requests = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            self.requests.append(body["input"])
+            n = len(self.requests)
+        if n % 3 == 0:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        data = [{"index": i, "embedding": [float(len(t)), 1.0]} for i, t in enumerate(body["input"])]
+        data.reverse()  # order must come from "index", not position
+        out = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _StandIn.requests = []
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def test_plan_batches_respects_item_and_token_budgets():
+    texts = ["x" * 40] * 5  # ~10 tokens each
+    assert plan_batches(texts, max_items=2, max_tokens=1000) == [[0, 1], [2, 3], [4]]
+    assert plan_batches(texts, max_items=10, max_tokens=25) == [[0, 1], [2, 3], [4]]
+
+
+def test_client_batches_concurrently_and_retries(server):
+    client = EmbeddingClient(base_url=server, concurrency=3, max_items=4, backoff=0)
+    texts = [f"t{'x' * i}" for i in range(10)]
+    vecs = client.embed(texts, "m")
+    client.close()
+    assert vecs[:, 0].tolist() == [float(len(t)) for t in texts]
+    assert len(_StandIn.requests) == 4  # batches of 4+4+2, plus one retried 429
+
+
+def test_index_documents_bulk_inserts_across_documents(server, tmp_path, monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([Document(url=f"http://x/{i}", content=f"doc {i} " * (i + 1)) for i in range(5)])
+    db.commit()
+    client = EmbeddingClient(base_url=server, concurrency=2, max_items=3, backoff=0)
+    monkeypatch.setattr(embeddings, "get_embedding_client", lambda: client)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: EmbeddingCache(str(tmp_path / "c.sqlite")))
+    store = SegmentStore("m", root=str(tmp_path))
+
+    docs = db.execute(select(Document)).scalars().all()
+    assert index_documents(db, docs, "m", store) == 5
+    rows = db.execute(select(Embedding).order_by(Embedding.id)).scalars().all()
+    assert [(r.segment, r.offset) for r in rows] == [("seg-000000", i) for i in range(5)]
+    assert sorted(map(len, _StandIn.requests)) == [2, 3]  # one request per batch, not per document
+    seg = store.open_segments()[0]
+    assert seg.row_ids.tolist() == [r.id for r in rows]
+    assert seg.doc_ids.tolist() == [r.document_id for r in rows]
@@ -0,0 +1,107 @@
+import fcntl
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.models.document import Document
+from app.db.models.embedding import Embedding
+from app.services.rag.compactor import compact_model
+from app.services.rag.retriever import EmbeddingIndex
+from app.services.rag.segments import SegmentStore
+
+
+def _fill(tmp_path, n=10, dtype=None):
+    store = SegmentStore("m", root=str(tmp_path), segment_rows=4, dtype=dtype)
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(n, 8)).astype(np.float32)
+    ids = list(range(1, n + 1))
+    days = [100 if i % 2 else 110 for i in range(n)]  # two 7-day partitions, interleaved
+    store.append(ids, ids, vecs, days=days)
+    return store, vecs, days
+
+
+def test_compact_partitions_sealed_segments_and_drops_dead_rows(tmp_path):
+    store, _, _ = _fill(tmp_path, dtype="int8")
+    before = store.read_manifest()
+    assert [s["rows"] for s in before["segments"]] == [4, 4, 2]
+    live = np.array([1, 2, 3, 5, 6, 7, 8, 9, 10])  # 4 was deleted
+    store.tombstone([4, 9])  # 9 sits in the head, which is not rewritten
+
+    stats = store.compact(live, min_rows=10, partition_days=7)
+    assert (stats["segments_in"], stats["rows_in"], stats["rows_out"]) == (2, 8, 7)
+    after = store.read_manifest()
+    assert after["generation"] == 1
+    head = after["segments"][-1]
+    assert head["name"] == "seg-000002" and head["rows"] == 2  # the head is never rewritten
+    parts = after["segments"][:-1]
+    assert [(s["min_day"], s["max_day"], s["rows"]) for s in parts] == [(100, 100, 3), (110, 110, 4)]
+    assert all(s["sealed"] for s in parts)
+    assert not os.path.exists(os.path.join(store.dir, "seg-000000.i8"))
+    kept = sorted(r for seg in store.open_segments() for r in seg.row_ids.tolist())
+    assert kept == [1, 2, 3, 5, 6, 7, 8, 9, 10]
+    assert sorted(r for r, _, _ in stats["moves"]) == [1, 2, 3, 5, 6, 7, 8]
+    assert store.read_tombstones().tolist() == [9]  # 4's row is gone, so is its tombstone
+
+    # a second pass has nothing to merge; new rows keep filling the head
+    assert store.compact(live, min_rows=10, partition_days=7)["segments_in"] == 0
+    store.append([11], [11], np.ones((1, 8), dtype=np.float32), days=[120])
+    assert store.read_manifest()["segments"][-1]["rows"] == 3
+
+
+def test_index_goes_stale_on_compaction_and_window_skips_blocks(tmp_path):
+    store, vecs, days = _fill(tmp_path)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    idx = EmbeddingIndex("m", segments=store)
+    idx.refresh(db)
+    q = np.ones(8, dtype=np.float32)
+    in_window = [i for i, d in enumerate(days) if d >= 110]
+    unit = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    expected = [in_window[i] + 1 for i in np.argsort(-(unit[in_window] @ q))[:3]]
+    assert [r for _, r, _ in idx.search(q, 3, since_day=110)] == expected
+
+    store.compact(None, min_rows=10, partition_days=7)
+    idx.refresh(db)
+    assert idx.stale
+    assert [r for _, r, _ in idx.search(q, 3, since_day=110)] == expected  # old maps still valid
+    idx.meta.add_doc_tickers(2, ["ACME"])
+    fresh = idx.successor()
+    fresh.refresh(db)
+    assert [r for _, r, _ in fresh.search(q, 3, since_day=110)] == expected
+    assert sorted(fresh._block_span) == [(100, 100), (100, 110), (110, 110)]
+    assert [r for _, r, _ in fresh.search(q, 3, tickers=["acme"])] == [2]  # carried over, not re-read
+
+
+def test_live_ids_are_read_under_the_store_lock(tmp_path):
+    store, _, _ = _fill(tmp_path)
+
+    def live():
+        with open(os.path.join(store.dir, ".lock"), "a") as fh:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return np.arange(1, 11)
+
+    assert store.compact(live=live, min_rows=10, partition_days=7)["segments_in"] == 2
+
+
+def test_compact_model_drops_deleted_documents_and_updates_offsets(tmp_path):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([Document(id=i, source="t", url=f"u{i}", title="t") for i in range(1, 11) if i != 3])
+    db.add_all([Embedding(id=i, document_id=i, model="m", content="c") for i in range(1, 11)])
+    db.commit()
+    store, _, _ = _fill(tmp_path)
+
+    stats = compact_model(db, "m", segments=store)
+    assert stats["rows_in"] - stats["rows_out"] == 1  # row of document 3
+    rows = {e.id: (e.segment, e.offset) for e in db.query(Embedding).all()}
+    for seg in store.open_segments():
+        for off, rid in enumerate(seg.row_ids.tolist()):
+            if seg.name != "seg-000002":
+                assert rows[rid] == (seg.name, off)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.services.rag import embeddings
+from app.services.rag.embed_cache import EmbeddingCache, text_hash
+
+
+def test_text_hash_ignores_whitespace_layout():
+    assert text_hash("Fed  holds\nrates ") == text_hash("Fed holds rates")
+    assert text_hash("Fed holds rates") != text_hash("fed holds rates")
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite"), max_entries=2)
+    cache.put_many("m", {"a": np.ones(3), "b": np.ones(3)})
+    cache.get_many("m", ["a"])  # touch a, so b is the LRU entry
+    cache.put_many("m", {"c": np.ones(3)})
+    assert set(cache.get_many("m", ["a", "b", "c"])) == {"a", "c"}
+
+
+def test_embed_texts_only_embeds_misses(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_provider(texts, model_name):
+        calls.append(list(texts))
+        return np.asarray([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(embeddings, "_embed_openai", fake_provider)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: EmbeddingCache(str(tmp_path / "c.sqlite")))
+    first = embeddings.embed_texts(["a b", "cc", "a  b"], model_name="m")
+    assert calls == [["a b", "cc"]]
+    again = embeddings.embed_texts(["cc", "a b"], model_name="m")
+    assert len(calls) == 1
+    np.testing.assert_array_equal(again, first[[1, 0]])
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.models.document import Document
+from app.db.models.embedding import Embedding
+from app.services.rag import embeddings
+from app.services.rag.embed_cache import EmbeddingCache
+from app.services.rag.indexer import changed_documents, get_watermark, pending_documents, run_incremental
+from app.services.rag.segments import SegmentStore
+
+
+def _setup(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_provider(texts, model_name):
+        calls.append(len(texts))
+        return np.asarray([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(embeddings, "_embed_openai", fake_provider)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: EmbeddingCache(str(tmp_path / "c.sqlite")))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([Document(url=f"http://x/{i}", content=f"story {i}") for i in range(1, 6)])
+    db.commit()
+    return db, SegmentStore("m", root=str(tmp_path)), calls
+
+
+def _count(db):
+    return db.scalar(select(func.count()).select_from(Embedding))
+
+
+def test_incremental_run_only_touches_new_documents(tmp_path, monkeypatch):
+    db, store, calls = _setup(tmp_path, monkeypatch)
+    first = run_incremental(db, "m", store, limit=3, page_size=2)
+    assert (first["processed"], first["created"], first["cursor"]) == (3, 3, 3)
+    assert get_watermark(db, "m") == 3
+    assert [d.id for d in pending_documents(db, "m")] == [4, 5]
+
+    second = run_incremental(db, "m", store, limit=100)
+    assert (second["processed"], second["cursor"]) == (2, 5)
+    assert run_incremental(db, "m", store, limit=100)["processed"] == 0
+    assert _count(db) == 5
+    assert sum(calls) == 5
+
+
+def test_reembed_changed_replaces_stale_embeddings(tmp_path, monkeypatch):
+    db, store, calls = _setup(tmp_path, monkeypatch)
+    run_incremental(db, "m", store, limit=100)
+    doc = db.get(Document, 2)
+    doc.content = "story 2, updated"
+    db.commit()
+    res = run_incremental(db, "m", store, limit=100, reembed_changed=True)
+    assert res["reembedded"] == 1
+    assert _count(db) == 5
+    contents = db.scalars(select(Embedding.content).where(Embedding.document_id == 2)).all()
+    assert contents == ["story 2, updated"]
+
+
+def test_reembedded_rows_do_not_take_top_k_slots(tmp_path, monkeypatch):
+    from app.services.rag.retriever import EmbeddingIndex
+
+    db, store, _ = _setup(tmp_path, monkeypatch)
+    run_incremental(db, "m", store, limit=100)
+    index = EmbeddingIndex("m", segments=store)
+    index.refresh(db)
+    db.get(Document, 2).content = "story 2, updated"
+    db.commit()
+    run_incremental(db, "m", store, limit=100, reembed_changed=True)
+
+    index.refresh(db)  # the old row is still in the segment file, now tombstoned
+    assert len(index) == 6
+    live = set(db.scalars(select(Embedding.id)).all())
+    q = np.asarray([7.0, 1.0], dtype=np.float32)
+    assert {r for _, r, _ in index.search(q, 5)} == live
+    assert [{r for _, r, _ in hits} for hits in index.search_many(q[None, :], 5)] == [live]
+    fresh = EmbeddingIndex("m", segments=store)  # another process loading from scratch
+    fresh.refresh(db)
+    assert {r for _, r, _ in fresh.search(q, 5)} == live
+    ivf = EmbeddingIndex("m", backend="ivf", segments=store)
+    ivf.refresh(db)
+    assert {r for _, r, _ in ivf.search(q, 5)} == live
+    index.enable_lexical(db)
+    for mode in ("lexical", "hybrid", "two_stage"):
+        assert {r for _, r, _ in index.search(q, 5, mode=mode, query="story")} == live
+
+
+def test_failed_reembed_keeps_old_rows_and_retries(tmp_path, monkeypatch):
+    db, store, _ = _setup(tmp_path, monkeypatch)
+    run_incremental(db, "m", store, limit=100)
+    db.get(Document, 2).content = "story 2, updated"
+    db.commit()
+
+    def broken(texts, model_name):
+        raise RuntimeError("provider down")
+
+    good = embeddings._embed_openai
+    monkeypatch.setattr(embeddings, "_embed_openai", broken)
+    with pytest.raises(RuntimeError):
+        run_incremental(db, "m", store, limit=100, reembed_changed=True)
+    db.rollback()
+    assert db.scalars(select(Embedding.content).where(Embedding.document_id == 2)).all() == ["story 2"]
+    assert [d.id for d in changed_documents(db, "m")] == [2]
+
+    monkeypatch.setattr(embeddings, "_embed_openai", good)
+    assert run_incremental(db, "m", store, limit=100, reembed_changed=True)["reembedded"] == 1
+    assert db.scalars(select(Embedding.content).where(Embedding.document_id == 2)).all() == ["story 2, updated"]
+    assert changed_documents(db, "m") == []
+
+
+def test_change_scan_has_its_own_budget(tmp_path, monkeypatch):
+    db, store, _ = _setup(tmp_path, monkeypatch)
+    run_incremental(db, "m", store, limit=3)
+    db.get(Document, 1).content = "story 1, updated"
+    db.commit()
+    res = run_incremental(db, "m", store, limit=2, reembed_changed=True)
+    assert (res["processed"], res["reembedded"]) == (3, 1)
@@ -0,0 +1,60 @@
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.models.embedding import Embedding
+from app.services.rag.embeddings import to_bytes
+from app.services.rag.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+from app.services.rag.retriever import EmbeddingIndex
+from app.services.rag.segments import SegmentStore
+
+
+def test_tokenize_keeps_financial_tokens():
+    assert tokenize("AAPL files its 10-K; S&P up 3.5% (US0378331005)") == [
+        "aapl", "files", "10-k", "s&p", "up", "3.5%", "us0378331005",
+    ]
+
+
+def test_bm25_ranks_rare_terms_and_respects_allowed_ids():
+    idx = BM25Index()
+    idx.add([10, 11, 12], ["apple earnings beat", "market rally today", "apple apple supplier earnings"])
+    assert [r for _, r in idx.search("apple supplier", 3)] == [12, 10]
+    assert [r for _, r in idx.search("apple", 3, allowed_ids=np.array([10, 11]))] == [10]
+    assert idx.search("unknown", 3) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]])
+    assert [r for _, r in fused] == [1, 3, 2]
+
+
+def test_hybrid_and_two_stage_search(tmp_path):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    rows = [
+        ([1, 0], "tesla recall announced"),
+        ([0.9, 0.1], "carmaker shares fall"),
+        ([0, 1], "nvidia guidance raised"),
+    ]
+    db.add_all([
+        Embedding(document_id=i + 1, model="m", vector=to_bytes(np.array(v, dtype=np.float32)), content=c)
+        for i, (v, c) in enumerate(rows)
+    ])
+    db.commit()
+    idx = EmbeddingIndex("m", segments=SegmentStore("m", root=str(tmp_path)))
+    idx.enable_lexical(db)
+    idx.refresh(db)
+    q = np.array([1, 0], dtype=np.float32)
+
+    assert [d for _, _, d in idx.search(q, 2, mode="lexical", query="nvidia")] == [3]
+    # only the lexical candidate is re-scored densely
+    assert [d for _, _, d in idx.search(q, 2, mode="two_stage", query="recall")] == [1]
+    hybrid = idx.search(q, 3, mode="hybrid", query="nvidia guidance")
+    assert {d for _, _, d in hybrid} == {1, 2, 3}
+
+    db.add(Embedding(document_id=4, model="m", vector=to_bytes(np.array([0, 1], dtype=np.float32)), content="nvidia chips"))
+    db.commit()
+    idx.refresh(db)
+    assert [d for _, _, d in idx.search(q, 2, mode="lexical", query="chips")] == [4]
@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.rag import embeddings, local_embed
+from app.services.rag.local_embed import HashingEmbedder, check_model_name, get_local_embedder, is_local_model
+
+
+def test_model_names_dispatch_to_local_backends():
+    assert is_local_model("hashing-128") and is_local_model("local/hashing")
+    assert is_local_model("sentence-transformers/all-MiniLM-L6-v2")
+    assert not is_local_model("text-embedding-3-small")
+    assert get_local_embedder("text-embedding-3-small") is None
+    emb = get_local_embedder("hashing-128")
+    assert isinstance(emb, HashingEmbedder) and emb.dim == 128
+    assert get_local_embedder("hashing-128") is emb
+
+
+def test_zero_dim_hashing_model_is_rejected():
+    check_model_name("hashing-1")
+    for name in ("hashing-0", "local/hashing-00"):
+        with pytest.raises(ValueError):
+            check_model_name(name)
+        with pytest.raises(ValueError):
+            get_local_embedder(name)
+
+
+def test_hashing_embedder_is_deterministic_and_batched():
+    texts = [f"apple earnings beat estimates {i}" for i in range(10)] + ["oil prices slump", ""]
+    pooled = HashingEmbedder(dim=256, batch_size=3, workers=4).embed(texts)
+    single = HashingEmbedder(dim=256, batch_size=100, workers=1).embed(texts)
+    np.testing.assert_array_equal(pooled, single)
+    assert pooled.shape == (12, 256) and pooled.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(pooled[:-1], axis=1), 1.0, rtol=1e-5)
+    assert not pooled[-1].any()
+    assert pooled[0] @ pooled[1] > pooled[0] @ pooled[10]
+
+
+def test_embed_texts_runs_hashing_models_offline(monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("provider must not be called")
+
+    monkeypatch.setattr(embeddings, "_embed_openai", no_network)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", no_network)
+    vecs = embeddings.embed_texts(["fed holds rates", "fed  holds rates"], model_name="hashing-64")
+    assert vecs.shape == (2, 64)
+    np.testing.assert_array_equal(vecs[0], vecs[1])
+
+
+def test_slow_model_load_does_not_block_other_models(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    class SlowModel(HashingEmbedder):
+        def __init__(self, model_name):
+            started.set()
+            release.wait(10)
+            super().__init__(8)
+
+    monkeypatch.setattr(local_embed, "_embedders", {})
+    monkeypatch.setattr(local_embed, "_model_locks", {})
+    monkeypatch.setattr(local_embed, "SentenceTransformerEmbedder", SlowModel)
+    loader = threading.Thread(target=get_local_embedder, args=("local/slow",))
+    loader.start()
+    assert started.wait(10)
+    assert isinstance(get_local_embedder("hashing-16"), HashingEmbedder)  # not stuck behind the load
+    release.set()
+    loader.join(10)
+    assert get_local_embedder("local/slow") is get_local_embedder("local/slow")
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.models.nlp_annotation import NLPAnnotation
+from app.services.rag.metadata import MetadataIndex, epoch_day
+from app.services.rag.retriever import EmbeddingIndex
+from app.services.rag.segments import SegmentStore
+
+
+def test_candidates_intersect_day_and_ticker_filters():
+    meta = MetadataIndex()
+    meta.add_rows(
+        positions=np.array([10, 11, 12, 13]),
+        doc_ids=np.array([1, 1, 2, 3]),
+        days=np.array([100, 100, 105, 107]),
+        row_ids=np.array([5, 6, 7, 8]),
+    )
+    meta.add_doc_tickers(1, ["AAPL"])
+    meta.add_doc_tickers(3, ["AAPL", "MSFT"])
+    assert meta.candidates() is None
+    assert meta.candidates(since_day=105).tolist() == [12, 13]
+    assert meta.candidates(tickers=["aapl"]).tolist() == [10, 11, 13]
+    assert meta.candidates(since_day=105, tickers=["AAPL"]).tolist() == [13]
+    assert meta.candidates(tickers=["TSLA"]).tolist() == []
+    assert meta.candidate_ids(since_day=105).tolist() == [7, 8]
+    assert meta.positions_for_ids(np.array([8, 99, 5])).tolist() == [13, 10]
+
+
+def test_epoch_day():
+    assert epoch_day(datetime(1970, 1, 2, 23, 59)) == 1
+    assert epoch_day(None) == -1
+
+
+def test_filtered_search_scores_only_the_slice(tmp_path):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([NLPAnnotation(document_id=2, entities={"tickers": ["NVDA"]})])
+    db.commit()
+
+    store = SegmentStore("m", root=str(tmp_path), segment_rows=2)
+    vecs = np.array([[1, 0], [0.9, 0.1], [0.8, 0.2], [0, 1]], dtype=np.float32)
+    store.append([1, 2, 3, 4], [1, 2, 2, 3], vecs, days=[10, 10, 20, 20])
+    idx = EmbeddingIndex("m", segments=store)
+    idx.refresh(db)
+
+    q = np.array([1, 0], dtype=np.float32)
+    assert [r for _, r, _ in idx.search(q, 1)] == [1]
+    assert [r for _, r, _ in idx.search(q, 4, since_day=15)] == [3, 4]
+    assert [r for _, r, _ in idx.search(q, 4, tickers=["NVDA"])] == [2, 3]
+    assert [r for _, r, _ in idx.search(q, 4, since_day=15, tickers=["NVDA"])] == [3]
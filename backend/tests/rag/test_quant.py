@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.services.rag.retriever import EmbeddingIndex
+from app.services.rag.segments import SegmentStore
+from app.services.rag.vectorstore.base import Block, normalize
+from app.services.rag.vectorstore.quant import dequantize, quantize, scan
+
+
+def _data(n=2000, dim=64):
+    rng = np.random.default_rng(0)
+    return normalize(rng.normal(size=(n, dim))), normalize(rng.normal(size=dim))
+
+
+@pytest.mark.parametrize("dtype,tol", [("float16", 1e-3), ("int8", 2e-2)])
+def test_quantized_scan_is_close_to_float32(dtype, tol):
+    mat, q = _data()
+    codes, scales = quantize(mat, dtype)
+    assert codes.nbytes <= mat.nbytes // 2
+    np.testing.assert_allclose(dequantize(codes, scales), mat, atol=tol)
+    np.testing.assert_allclose(scan(codes, q, scales, chunk=300), mat @ q, atol=tol * 4)
+
+
+def test_float16_scan_decodes_exactly():
+    mat, q = _data(n=700)
+    mat[0] = 0.0
+    mat[1, :8] = 1e-6  # float16 subnormals
+    mat[2] = -mat[2]
+    codes, _ = quantize(mat, "float16")
+    expected = codes.astype(np.float32) @ np.stack([q, -q], axis=1)
+    np.testing.assert_allclose(scan(codes, np.stack([q, -q], axis=1), chunk=256), expected, rtol=1e-6, atol=1e-9)
+
+
+def test_rerank_restores_exact_order():
+    mat, q = _data()
+    codes, scales = quantize(mat, "int8")
+    ids = np.arange(mat.shape[0], dtype=np.int64)
+    block = Block(codes, ids, ids, scales=scales, exact=mat)
+    expected = list(np.argsort(-(mat @ q))[:10])
+    got = block.top(q, 10, rerank=4)
+    assert [r for _, r, _ in got] == expected
+    assert abs(got[0][0] - float((mat @ q).max())) < 1e-6
+    rows = np.arange(0, mat.shape[0], 2)
+    assert [r for _, r, _ in block.top(q, 3, rows=rows, rerank=4)] == [r for r in expected if r % 2 == 0][:3]
+
+
+def test_int8_segments_roundtrip_through_index(tmp_path):
+    mat, q = _data(n=300)
+    store = SegmentStore("m", root=str(tmp_path), segment_rows=128, dtype="int8", keep_float32=True)
+    ids = list(range(1, 301))
+    store.append(ids, ids, mat)
+    assert store.stored_dtype() == "int8"
+    seg = store.open_segments()[0]
+    assert seg.vectors.dtype == np.int8 and seg.scales.shape == (128,) and seg.exact.dtype == np.float32
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    idx = EmbeddingIndex("m", segments=store)
+    assert idx.refresh(sessionmaker(bind=engine)()) == 300
+    assert [r for _, r, _ in idx.search(q, 5)] == list(np.argsort(-(mat @ q))[:5] + 1)
+
+    with pytest.raises(ValueError):
+        SegmentStore("m", root=str(tmp_path), dtype="float16").append([301], [1], mat[:1])
+
+
+def test_quantized_segments_without_float32_copy(tmp_path):
+    mat, q = _data(n=50)
+    store = SegmentStore("m", root=str(tmp_path), dtype="float16", keep_float32=False)
+    store.append(list(range(50)), list(range(50)), mat)
+    seg = store.open_segments()[0]
+    assert seg.exact is None and not (tmp_path / "m" / "seg-000000.f32").exists()
+    assert seg.block().top(q, 1, rerank=4)[0][1] == int(np.argmax(mat @ q))
@@ -0,0 +1,63 @@
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.models.embedding import Embedding
+from app.services.rag.embeddings import to_bytes
+from app.services.rag.retriever import EmbeddingIndex
+from app.services.rag.segments import SegmentStore
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_search_matches_bruteforce_cosine(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(500, 16)).astype(np.float32)
+    idx = EmbeddingIndex("m", segments=SegmentStore("m", root=str(tmp_path)))
+    idx.add(list(range(1, 501)), list(range(1, 501)), list(vecs))
+    q = rng.normal(size=16).astype(np.float32)
+    expected = (vecs @ q) / (np.linalg.norm(vecs, axis=1) * np.linalg.norm(q))
+    got = idx.search(q, 5)
+    assert [r for _, r, _ in got] == list(np.argsort(-expected)[:5] + 1)
+    assert abs(got[0][0] - expected.max()) < 1e-5
+
+
+def test_refresh_only_reads_new_rows_for_model(tmp_path):
+    db = _session()
+    db.add_all([
+        Embedding(document_id=1, model="m", vector=to_bytes(np.array([1, 0], dtype=np.float32)), content="a"),
+        Embedding(document_id=2, model="other", vector=to_bytes(np.array([0, 1], dtype=np.float32)), content="b"),
+    ])
+    db.commit()
+    idx = EmbeddingIndex("m", segments=SegmentStore("m", root=str(tmp_path)))
+    assert idx.refresh(db) == 1
+    assert idx.refresh(db) == 0
+    db.add(Embedding(document_id=3, model="m", vector=to_bytes(np.array([0, 1], dtype=np.float32)), content="c"))
+    db.commit()
+    assert idx.refresh(db) == 1
+    assert [d for _, _, d in idx.search(np.array([0, 1], dtype=np.float32), 1)] == [3]
+
+
+def test_search_many_matches_single_queries(tmp_path):
+    rng = np.random.default_rng(1)
+    store = SegmentStore("m", root=str(tmp_path), segment_rows=150, dtype="int8")
+    vecs = rng.normal(size=(400, 16)).astype(np.float32)
+    ids = list(range(1, 401))
+    store.append(ids, ids, vecs, days=[100 + i % 10 for i in range(400)])
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    idx = EmbeddingIndex("m", segments=store)
+    idx.refresh(sessionmaker(bind=engine)())
+    idx.add([1000], [1000], [rng.normal(size=16).astype(np.float32)])  # plus a legacy block
+    qs = rng.normal(size=(7, 16)).astype(np.float32)
+    for kw in ({}, {"since_day": 108}):
+        batched = idx.search_many(qs, 5, **kw)
+        single = [idx.search(q, 5, **kw) for q in qs]
+        assert [[r for _, r, _ in hits] for hits in batched] == [[r for _, r, _ in hits] for hits in single]
+        np.testing.assert_allclose([[s for s, _, _ in h] for h in batched], [[s for s, _, _ in h] for h in single], atol=1e-6)
+    assert idx.search_many(qs[:0], 5) == []
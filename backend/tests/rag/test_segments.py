@@ -0,0 +1,35 @@
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.services.rag.retriever import EmbeddingIndex
+from app.services.rag.segments import SegmentStore
+
+
+def test_append_rolls_segments_and_maps_offsets(tmp_path):
+    store = SegmentStore("org/model", root=str(tmp_path), segment_rows=4)
+    vecs = np.eye(6, dtype=np.float32) * 3
+    offsets = store.append(list(range(10, 16)), [1, 1, 2, 2, 3, 3], vecs)
+    assert offsets == [("seg-000000", 0), ("seg-000000", 1), ("seg-000000", 2),
+                       ("seg-000000", 3), ("seg-000001", 0), ("seg-000001", 1)]
+    segs = store.open_segments()
+    assert [s.rows for s in segs] == [4, 2]
+    assert isinstance(segs[0].vectors, np.memmap)
+    assert list(segs[1].row_ids) == [14, 15] and list(segs[1].doc_ids) == [3, 3]
+    np.testing.assert_allclose(segs[1].vectors[0], np.eye(6)[4])  # stored unit-normalized
+
+
+def test_index_attaches_growing_segments(tmp_path):
+    store = SegmentStore("m", root=str(tmp_path), segment_rows=100)
+    store.append([1, 2], [1, 2], np.array([[1, 0], [0, 1]], dtype=np.float32))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    idx = EmbeddingIndex("m", segments=store)
+    assert idx.refresh(db) == 2
+    store.append([3], [3], np.array([[1, 1]], dtype=np.float32))
+    assert idx.refresh(db) == 1
+    assert len(idx) == 3
+    assert [r for _, r, _ in idx.search(np.array([1, 1], dtype=np.float32), 1)] == [3]
+
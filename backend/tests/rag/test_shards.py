@@ -0,0 +1,74 @@
+import os
+import stat
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.services.rag.retriever import EmbeddingIndex, shard_of
+from app.services.rag.segments import SegmentStore
+from app.services.rag.shards import ShardClient, ShardError, ShardSupervisor, ShardUnavailable, shard_addresses, shard_authkey
+
+
+def _corpus(tmp_path, n=400):
+    rng = np.random.default_rng(3)
+    store = SegmentStore("m", root=str(tmp_path / "vectors"), segment_rows=60)
+    ids = list(range(1, n + 1))
+    store.append(ids, ids, rng.normal(size=(n, 16)).astype(np.float32), days=[100 + i % 10 for i in range(n)])
+    url = f"sqlite:///{tmp_path / 'db.sqlite'}"
+    Base.metadata.create_all(bind=create_engine(url))
+    return store, url, rng.normal(size=(5, 16)).astype(np.float32)
+
+
+def test_shard_of_round_robins_segments():
+    names = [f"seg-{i:06d}" for i in range(12)]
+    assert [shard_of(n, 3) for n in names] == [i % 3 for i in range(12)]
+    assert 0 <= shard_of("odd-name", 3) < 3
+
+
+def test_shard_indexes_partition_the_full_index(tmp_path):
+    store, url, qs = _corpus(tmp_path)
+    db = sessionmaker(bind=create_engine(url))()
+    full = EmbeddingIndex("m", segments=store)
+    full.refresh(db)
+    parts = [EmbeddingIndex("m", segments=store, shard=(i, 3)) for i in range(3)]
+    for p in parts:
+        p.refresh(db)
+    assert sum(len(p) for p in parts) == len(full) == 400
+    for kw in ({}, {"since_day": 107}):
+        expected = full.search_many(qs, 5, **kw)
+        merged = [
+            sorted((h for p in parts for h in p.search_many(qs, 5, **kw)[j]), key=lambda h: -h[0])[:5]
+            for j in range(len(qs))
+        ]
+        assert [[r for _, r, _ in hits] for hits in merged] == [[r for _, r, _ in hits] for hits in expected]
+
+
+def test_scatter_gather_survives_shard_restart(tmp_path):
+    store, url, qs = _corpus(tmp_path)
+    full = EmbeddingIndex("m", segments=store)
+    full.refresh(sessionmaker(bind=create_engine(url))())
+    expected = [[r for _, r, _ in hits] for hits in full.search_many(qs, 5)]
+    addresses = shard_addresses("m", "flat", None, 2, root=str(tmp_path / "shards"))
+    supervisor = ShardSupervisor("m", "flat", None, addresses, url, vector_root=str(tmp_path / "vectors")).start()
+    try:
+        client = ShardClient(addresses, timeout=20, on_failure=supervisor.ensure)
+        assert sum(client.ping()) == 400
+        assert [[r for _, r, _ in hits] for hits in client.search_many(qs, 5)] == expected
+        supervisor.restart(1)
+        assert [[r for _, r, _ in hits] for hits in client.search_many(qs, 5)] == expected
+        with pytest.raises(ShardError):  # error replies map to the 503 path, not a bare RuntimeError
+            client._call(("bogus",))
+        with pytest.raises(ShardUnavailable):
+            ShardClient(addresses, timeout=0.2, authkey=b"wrong").ping()
+    finally:
+        supervisor.stop()
+
+
+def test_authkey_is_random_private_and_stable(tmp_path):
+    a = shard_authkey(str(tmp_path / "g1"))
+    assert len(a) == 32 and shard_authkey(str(tmp_path / "g1")) == a
+    assert stat.S_IMODE(os.stat(tmp_path / "g1" / ".authkey").st_mode) == 0o600
+    assert shard_authkey(str(tmp_path / "g2")) != a
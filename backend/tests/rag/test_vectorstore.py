@@ -0,0 +1,54 @@
+import numpy as np
+
+from app.services.rag.vectorstore.flat import FlatStore
+from app.services.rag.vectorstore.ivf import IVFStore
+
+
+def _data(n=2000, dim=24, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_ivf_untrained_is_exact():
+    data = _data(100)
+    ids = np.arange(1, 101)
+    flat, ivf = FlatStore(24), IVFStore(24, nlist=16)
+    flat.add(ids, ids, data)
+    ivf.add(ids, ids, data)
+    assert not ivf.trained
+    q = _data(1, seed=1)[0]
+    assert [r for _, r, _ in ivf.search(q, 5)] == [r for _, r, _ in flat.search(q, 5)]
+
+
+def test_ivf_probing_all_lists_matches_flat():
+    data = _data()
+    ids = np.arange(1, len(data) + 1)
+    flat, ivf = FlatStore(24), IVFStore(24, nlist=16, min_train=500)
+    flat.add(ids, ids, data)
+    for i in range(0, len(data), 400):  # incremental adds cross the training threshold
+        ivf.add(ids[i:i + 400], ids[i:i + 400], data[i:i + 400])
+    assert ivf.trained and len(ivf) == len(data)
+    for q in _data(10, seed=2):
+        exact = [r for _, r, _ in flat.search(q, 10)]
+        assert [r for _, r, _ in ivf.search(q, 10, nprobe=16)] == exact
+        assert len(ivf.search(q, 10, nprobe=2)) == 10
+
+
+def test_dead_rows_are_masked_before_the_top_k_cut():
+    from app.services.rag.vectorstore.base import Block
+    from app.services.rag.vectorstore.quant import quantize
+
+    rng = np.random.default_rng(5)
+    vecs = rng.normal(size=(50, 8)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    ids = np.arange(1, 51, dtype=np.int64)
+    q = vecs[:1]
+    best = [int(r) for r in np.argsort(-(vecs @ q[0]))[:6]]
+    dead = np.asarray(sorted(best[:3]), dtype=np.int64)
+    codes, scales = quantize(vecs, "int8")
+    for block, rerank in ((Block(vecs, ids, ids), 0), (Block(codes, ids, ids, scales=scales, exact=vecs), 4)):
+        hits = block.top_many(q, 3, rerank=rerank, dead=dead)[0]
+        assert [r - 1 for _, r, _ in hits] == best[3:6]
+        rows = np.arange(10, dtype=np.int64)
+        assert all(r - 1 not in dead for _, r, _ in block.top_many(q, 10, rows=rows, dead=dead)[0])
+    assert block.top_many(q, 3, rows=dead, dead=dead) == [[]]
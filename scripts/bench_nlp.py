@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from backend.app.services.nlp.keywords import KeywordMatcher
+from backend.app.services.nlp.parallel import AnnotationPool
+from backend.app.services.nlp.annotation_cache import AnnotationCache
+from backend.app.services.nlp.pipeline import annotate_stream, annotate_text, annotate_texts, cached_stream
+
+
+COMPANIES = ["Apple Inc", "Microsoft Corp", "Tesla", "Nvidia Corporation", "JPMorgan Chase", "Exxon Mobil", "Meta"]
+TICKERS = ["AAPL", "MSFT", "TSLA", "NVDA", "JPM", "XOM", "META", "SPX"]
+PHRASES = [
+    "reported quarterly results above guidance", "announced a strategic alliance with", "shares fell after layoffs at",
+    "completed the acquisition of", "EPS beat consensus while revenue missed", "the Nasdaq and the Dow Jones closed higher",
+    "the S&P 500 slipped as EUR/USD rallied", "announced job cuts across divisions", "raised its full-year outlook",
+]
+
+
+def synthetic_news(n: int, seed: int = 0) -> List[str]:
+    """Financial-news-like texts from one sentence to a few paragraphs long."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        sentences = []
+        for _ in range(rng.choice([1, 2, 4, 8, 16, 32])):
+            sentences.append(f"{rng.choice(COMPANIES)} ({rng.choice(TICKERS)}) {rng.choice(PHRASES)} {rng.choice(COMPANIES)}.")
+        out.append(" ".join(sentences))
+    return out
+
+
+def bench_batch(n: int, batch_sizes: List[int]) -> List[Dict]:
+    """Documents/sec of per-document `annotate_text` versus batched `annotate_texts`."""
+    texts = synthetic_news(n)
+    models = {"ner": os.getenv("FIN_NER_MODEL", ""), "sentiment": os.getenv("FIN_SENTIMENT_MODEL", "")}
+    annotate_texts(texts[:8], batch_size=8)  # load models outside the timings
+    t0 = time.perf_counter()
+    for t in texts:
+        annotate_text(t)
+    single = n / (time.perf_counter() - t0)
+    report = [{"mode": "per_document", "n": n, **models, "docs_per_sec": round(single, 1)}]
+    for bs in batch_sizes:
+        t0 = time.perf_counter()
+        annotate_texts(texts, batch_size=bs)
+        dps = n / (time.perf_counter() - t0)
+        report.append({
+            "mode": "batched", "batch_size": bs, "n": n, **models,
+            "docs_per_sec": round(dps, 1), "speedup": round(dps / single, 2),
+        })
+    return report
+
+
+def bench_parallel(n: int, workers: List[int], chunk_size: int) -> List[Dict]:
+    """Documents/sec of in-process annotation versus a pool of `workers` processes."""
+    items = list(enumerate(synthetic_news(n)))
+    t0 = time.perf_counter()
+    for _ in annotate_stream(items):
+        pass
+    base = n / (time.perf_counter() - t0)
+    report = [{"workers": 0, "n": n, "cpus": os.cpu_count(), "docs_per_sec": round(base, 1)}]
+    for w in workers:
+        pool = AnnotationPool(w)
+        try:
+            list(pool.annotate(items[: w * chunk_size], chunk_size))  # workers started, models loaded
+            t0 = time.perf_counter()
+            for _ in pool.annotate(items, chunk_size):
+                pass
+            dps = n / (time.perf_counter() - t0)
+        finally:
+            pool.shutdown()
+        report.append({
+            "workers": w, "n": n, "cpus": os.cpu_count(), "chunk": chunk_size,
+            "docs_per_sec": round(dps, 1), "speedup": round(dps / base, 2),
+        })
+    return report
+
+
+def bench_keywords(n: int, sizes: List[int]) -> List[Dict]:
+    """µs/document of one substring scan per keyword versus the single-pass matcher, by vocabulary size."""
+    texts = synthetic_news(n)
+    rng = random.Random(1)
+    report = []
+    for size in sizes:
+        vocab = [" ".join(f"kw{rng.randrange(10 ** 6)}" for _ in range(rng.choice([1, 1, 2]))) for _ in range(size)]
+        vocab[: len(PHRASES)] = [p.split()[0] for p in PHRASES][:size]
+        t0 = time.perf_counter()
+        for t in texts:
+            low = t.lower()
+            [kw for kw in vocab if kw in low]
+        scan_us = (time.perf_counter() - t0) / n * 1e6
+        t0 = time.perf_counter()
+        matcher = KeywordMatcher((kw, kw) for kw in vocab)
+        build_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        for t in texts:
+            matcher.hits(t)
+        match_us = (time.perf_counter() - t0) / n * 1e6
+        report.append({
+            "keywords": size, "n": n, "substring_us_per_doc": round(scan_us, 1),
+            "matcher_us_per_doc": round(match_us, 1), "matcher_build_ms": round(build_ms, 1),
+        })
+    return report
+
+
+def bench_write(n: int, batches: List[int]) -> List[Dict]:
+    """Annotation rows/sec (temporary SQLite file) committed one per transaction versus `AnnotationWriter` batches."""
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    from backend.app.db.models import Base
+    from backend.app.db.models.nlp_annotation import NLPAnnotation
+    from backend.app.services.nlp.writer import AnnotationWriter
+
+    ann = annotate_text(synthetic_news(1)[0])
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            t0 = time.perf_counter()
+            for i in range(n):
+                db.execute(insert(NLPAnnotation), [{"document_id": i, **ann}])
+                db.commit()
+            base = n / (time.perf_counter() - t0)
+            report.append({"mode": "per_row", "n": n, "dialect": engine.dialect.name, "rows_per_sec": round(base, 1)})
+            for size in batches:
+                t0 = time.perf_counter()
+                with AnnotationWriter(db, batch_rows=size, flush_ms=10 ** 9) as writer:
+                    for i in range(n):
+                        writer.add(i, ann)
+                rps = n / (time.perf_counter() - t0)
+                report.append({
+                    "mode": "batched", "batch_rows": size, "n": n, "dialect": engine.dialect.name,
+                    "rows_per_sec": round(rps, 1), "speedup": round(rps / base, 2),
+                })
+        finally:
+            db.close()
+    return report
+
+
+def bench_cache(n: int, dup_ratios: List[float]) -> List[Dict]:
+    """Documents/sec through the annotation cache by share of duplicate texts (first run, then a re-run)."""
+    report = []
+    for ratio in dup_ratios:
+        uniq = synthetic_news(max(1, int(n * (1 - ratio))), seed=int(ratio * 100))
+        items = list(enumerate(uniq + random.Random(2).choices(uniq, k=n - len(uniq))))
+        t0 = time.perf_counter()
+        for _ in annotate_stream(items):
+            pass
+        base = n / (time.perf_counter() - t0)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = AnnotationCache(os.path.join(tmp, "cache.sqlite"))
+            row = {"dup_ratio": ratio, "n": n, "uncached_docs_per_sec": round(base, 1)}
+            for run in ("first_run", "rerun"):
+                t0 = time.perf_counter()
+                for _ in cached_stream(items, annotate_stream, cache):
+                    pass
+                row[f"{run}_docs_per_sec"] = round(n / (time.perf_counter() - t0), 1)
+        report.append(row)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NLP annotation benchmarks on synthetic news")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    batch = sub.add_parser("batch", help="docs/sec with and without batched HF inference (set FIN_*_MODEL)")
+    batch.add_argument("--n", type=int, default=512)
+    batch.add_argument("--batch-size", default="8,16,32")
+
+    parallel = sub.add_parser("parallel", help="docs/sec of process-pool annotation by worker count")
+    parallel.add_argument("--n", type=int, default=20_000)
+    parallel.add_argument("--workers", default="2,4")
+    parallel.add_argument("--chunk", type=int, default=64)
+
+    keywords = sub.add_parser("keywords", help="keyword scan cost as the vocabulary grows")
+    keywords.add_argument("--n", type=int, default=2000)
+    keywords.add_argument("--sizes", default="30,300,3000,30000")
+
+    write = sub.add_parser("write", help="annotation rows/sec, per-row commits versus batched writes")
+    write.add_argument("--n", type=int, default=5000)
+    write.add_argument("--batch-rows", default="100,500,2000")
+
+    cache = sub.add_parser("cache", help="docs/sec through the annotation cache by duplicate share")
+    cache.add_argument("--n", type=int, default=5000)
+    cache.add_argument("--dup", default="0,0.3,0.7")
+
+    args = parser.parse_args()
+    if args.cmd == "batch":
+        rows = bench_batch(args.n, [int(x) for x in args.batch_size.split(",")])
+    elif args.cmd == "keywords":
+        rows = bench_keywords(args.n, [int(x) for x in args.sizes.split(",")])
+    elif args.cmd == "parallel":
+        rows = bench_parallel(args.n, [int(x) for x in args.workers.split(",")], args.chunk)
+    elif args.cmd == "cache":
+        rows = bench_cache(args.n, [float(x) for x in args.dup.split(",")])
+    elif args.cmd == "write":
+        rows = bench_write(args.n, [int(x) for x in args.batch_rows.split(",")])
+    for row in rows:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from backend.app.services.rag.vectorstore.base import Block, normalize
+from backend.app.services.rag.vectorstore.flat import FlatStore
+from backend.app.services.rag.vectorstore.ivf import IVFStore
+from backend.app.services.rag.vectorstore.quant import DTYPES, quantize
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Gaussian mixture on the unit sphere; closer to real embeddings than iid noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def _timed(store, queries: np.ndarray, top_k: int, **params):
+    hits, lat = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits.append({r for _, r, _ in store.search(q, top_k, **params)})
+        lat.append((time.perf_counter() - t0) * 1000)
+    return hits, np.asarray(lat)
+
+
+def bench_ann(n: int, dim: int, queries: int, top_k: int, nlist: int, nprobes: List[int]) -> List[Dict]:
+    data = synthetic_corpus(n, dim)
+    ids = np.arange(1, n + 1, dtype=np.int64)
+    qs = synthetic_corpus(queries, dim, seed=1)
+
+    flat = FlatStore(dim)
+    flat.add(ids, ids, data)
+    truth, flat_lat = _timed(flat, qs, top_k)
+
+    ivf = IVFStore(dim, nlist=nlist, min_train=0)
+    t0 = time.perf_counter()
+    ivf.add(ids, ids, data)  # min_train=0 trains on the first add
+    build = time.perf_counter() - t0
+
+    report = [{
+        "backend": "flat", "n": n, "dim": dim, "recall": 1.0,
+        "p50_ms": round(float(np.percentile(flat_lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(flat_lat, 95)), 3),
+    }]
+    for nprobe in nprobes:
+        got, lat = _timed(ivf, qs, top_k, nprobe=nprobe)
+        recall = float(np.mean([len(g & t) / max(1, len(t)) for g, t in zip(got, truth)]))
+        report.append({
+            "backend": "ivf", "nlist": nlist, "nprobe": nprobe, "recall": round(recall, 4),
+            "p50_ms": round(float(np.percentile(lat, 50)), 3),
+            "p95_ms": round(float(np.percentile(lat, 95)), 3),
+            "speedup": round(float(np.median(flat_lat) / max(np.median(lat), 1e-9)), 2),
+            "build_sec": round(build, 2),
+        })
+    return report
+
+
+def bench_quant(n: int, dim: int, queries: int, top_k: int, reranks: List[int]) -> List[Dict]:
+    """Recall@k, latency and memory of float16/int8 scans against the float32 scan.
+
+    `bytes_per_vector` is what a scan streams; `disk_bytes_per_vector` adds
+    the float32 originals a quantized model must keep to re-rank.
+    """
+    data = normalize(synthetic_corpus(n, dim))
+    ids = np.arange(1, n + 1, dtype=np.int64)
+    qs = synthetic_corpus(queries, dim, seed=1)
+    report, truth, base = [], None, None
+    for dtype in DTYPES:
+        codes, scales = quantize(data, dtype)
+        store = FlatStore(dim)
+        store.attach("seg", Block(codes, ids, ids, scales=scales, exact=None if dtype == "float32" else data))
+        bytes_per_vec = codes.nbytes / n + (4 if scales is not None else 0)
+        for rerank in ([0] if dtype == "float32" else reranks):
+            got, lat = _timed(store, qs, top_k, rerank=rerank)
+            if truth is None:
+                truth, base = got, lat
+            recall = float(np.mean([len(g & t) / max(1, len(t)) for g, t in zip(got, truth)]))
+            disk = bytes_per_vec + (dim * 4 if dtype != "float32" and rerank > 1 else 0)
+            report.append({
+                "dtype": dtype, "rerank": rerank, "n": n, "dim": dim, "recall": round(recall, 4),
+                "p50_ms": round(float(np.percentile(lat, 50)), 3),
+                "p95_ms": round(float(np.percentile(lat, 95)), 3),
+                "vs_float32": round(float(np.median(base) / max(np.median(lat), 1e-9)), 2),
+                "bytes_per_vector": round(bytes_per_vec, 1),
+                "memory_ratio": round(dim * 4 / bytes_per_vec, 2),
+                "disk_bytes_per_vector": round(disk, 1),
+            })
+    return report
+
+
+def bench_batch(n: int, dim: int, questions: int, top_k: int, batch_sizes: List[int]) -> List[Dict]:
+    """Questions/sec of per-question scans versus batched GEMM scans (`search_many`)."""
+    data = synthetic_corpus(n, dim)
+    ids = np.arange(1, n + 1, dtype=np.int64)
+    qs = synthetic_corpus(questions, dim, seed=1)
+    store = FlatStore(dim)
+    store.add(ids, ids, data)
+    report = []
+    t0 = time.perf_counter()
+    for q in qs:
+        store.search(q, top_k)
+    single = questions / (time.perf_counter() - t0)
+    report.append({"mode": "single", "n": n, "dim": dim, "questions_per_sec": round(single, 1)})
+    for bs in batch_sizes:
+        t0 = time.perf_counter()
+        for start in range(0, questions, bs):
+            store.search_many(qs[start : start + bs], top_k)
+        qps = questions / (time.perf_counter() - t0)
+        report.append({
+            "mode": "batch", "batch_size": bs, "n": n, "dim": dim,
+            "questions_per_sec": round(qps, 1), "speedup": round(qps / single, 2),
+        })
+    return report
+
+
+def bench_shards(n: int, dim: int, questions: int, top_k: int, clients: int, shard_counts: List[int]) -> List[Dict]:
+    """Questions/sec from `clients` concurrent callers, in-process (0 shards) versus scatter-gather."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend.app.db.models import Base
+    from backend.app.services.rag.retriever import EmbeddingIndex
+    from backend.app.services.rag.segments import SegmentStore
+    from backend.app.services.rag.shards import ShardClient, ShardSupervisor, shard_addresses
+
+    data = synthetic_corpus(n, dim)
+    qs = synthetic_corpus(questions, dim, seed=1)
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "vectors")
+        store = SegmentStore("bench", root=root, segment_rows=max(1, n // 32))
+        ids = list(range(1, n + 1))
+        store.append(ids, ids, data)
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        Base.metadata.create_all(bind=create_engine(url))
+
+        def run(search) -> float:
+            search(qs[:1])  # warm up
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                list(pool.map(lambda i: search(qs[i : i + 1]), range(questions)))
+            return questions / (time.perf_counter() - t0)
+
+        base = None
+        for count in shard_counts:
+            if count == 0:
+                index = EmbeddingIndex("bench", segments=store)
+                index.refresh(sessionmaker(bind=create_engine(url))())
+                qps = run(lambda q: index.search_many(q, top_k))
+            else:
+                addresses = shard_addresses("bench", "flat", None, count, root=os.path.join(tmp, "shards"))
+                supervisor = ShardSupervisor("bench", "flat", None, addresses, url, vector_root=root).start()
+                try:
+                    client = ShardClient(addresses)
+                    qps = run(lambda q: client.search_many(q, top_k))
+                finally:
+                    supervisor.stop()
+            base = base or qps
+            report.append({
+                "shards": count, "n": n, "dim": dim, "clients": clients,
+                "questions_per_sec": round(qps, 1), "speedup": round(qps / base, 2),
+            })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval benchmarks on synthetic embeddings")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    ann = sub.add_parser("ann", help="IVF recall@k and latency against brute force")
+    ann.add_argument("--n", type=int, default=200_000)
+    ann.add_argument("--dim", type=int, default=384)
+    ann.add_argument("--queries", type=int, default=200)
+    ann.add_argument("--top-k", type=int, default=10)
+    ann.add_argument("--nlist", type=int, default=512)
+    ann.add_argument("--nprobe", default="1,4,8,16,32,64")
+
+    quant = sub.add_parser("quant", help="float16/int8 recall@k, memory and latency against float32")
+    quant.add_argument("--n", type=int, default=200_000)
+    quant.add_argument("--dim", type=int, default=384)
+    quant.add_argument("--queries", type=int, default=200)
+    quant.add_argument("--top-k", type=int, default=10)
+    quant.add_argument("--rerank", default="0,2,4", help="float32 re-rank factors to try (0 = off)")
+
+    batch = sub.add_parser("batch", help="questions/sec of batched retrieval (one GEMM per batch)")
+    batch.add_argument("--n", type=int, default=200_000)
+    batch.add_argument("--dim", type=int, default=384)
+    batch.add_argument("--questions", type=int, default=512)
+    batch.add_argument("--top-k", type=int, default=10)
+    batch.add_argument("--batch-size", default="16,64,256")
+
+    shards = sub.add_parser("shards", help="questions/sec of multi-process scatter-gather retrieval")
+    shards.add_argument("--n", type=int, default=200_000)
+    shards.add_argument("--dim", type=int, default=384)
+    shards.add_argument("--questions", type=int, default=512)
+    shards.add_argument("--top-k", type=int, default=10)
+    shards.add_argument("--clients", type=int, default=8, help="concurrent callers")
+    shards.add_argument("--shards", default="0,2,4", help="shard counts to try (0 = in-process)")
+
+    args = parser.parse_args()
+    if args.cmd == "ann":
+        rows = bench_ann(args.n, args.dim, args.queries, args.top_k, args.nlist,
+                         [int(x) for x in args.nprobe.split(",")])
+    elif args.cmd == "quant":
+        rows = bench_quant(args.n, args.dim, args.queries, args.top_k, [int(x) for x in args.rerank.split(",")])
+    elif args.cmd == "batch":
+        rows = bench_batch(args.n, args.dim, args.questions, args.top_k, [int(x) for x in args.batch_size.split(",")])
+    elif args.cmd == "shards":
+        rows = bench_shards(args.n, args.dim, args.questions, args.top_k, args.clients,
+                            [int(x) for x in args.shards.split(",")])
+    for row in rows:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()